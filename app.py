@@ -1,25 +1,64 @@
+import logging
+import os
+import time
+
+# Первым из модулей приложения: отметка времени до импорта Litestar и остального кода
+from src.startup import IMPORT_STARTED
 from litestar import Litestar
 from litestar.channels import ChannelsPlugin
 from litestar.channels.backends.memory import MemoryChannelsBackend
 from litestar.config.cors import CORSConfig
-from litestar.contrib.sqlalchemy.base import UUIDBase
 from litestar.contrib.sqlalchemy.plugins import SQLAlchemyPlugin
 from litestar.di import Provide
 from litestar.static_files import create_static_files_router
 from src.auth import jwt_auth
-# from src.channels.notifications import notifications_handler
-from src.db import db_config
-from src.dependencies import provide_transaction, limitoffsetpagination
+from src.channels.notifications import (REVIEW_CHANNEL, SECURITY_CHANNEL, notifications_handler,
+                                        notifications_sse_handler)
+from src.db import db_config, replica_config
+from src.dependencies import provide_read_session, provide_transaction, limitoffsetpagination, keysetpagination
 from src.endpoints.auth import register_handler, login_handler, new_password_handler, recovery_password_handler
+from src.endpoints.metrics import metrics_handler
+from src.endpoints.qr import get_qr_handler
 from src.endpoints.requests import RequestsController
 from src.endpoints.roles import assign_role_handler, remove_role_handler
-from src.endpoints.users import (create_user_handler, get_list_users, get_user_id)
+from src.endpoints.schedule import get_schedule_handler
+from src.endpoints.stats import get_stats_handler
+from src.endpoints.users import (create_user_handler, create_users_csv_handler, get_list_users, get_user_id)
+from src.metrics import instrument_engine, on_app_init as metrics_on_app_init, startup_duration
+from src.outbox import outbox_worker
+from src.qr import shutdown_executor
+from src.replica import on_app_init as replica_on_app_init, replica_router
+from src.settings import settings
+from src.stats import stats_reconciler
+
+
+logger = logging.getLogger(__name__)
 
 
 async def start() -> None:
-    async with db_config.get_engine().begin() as conn:
-        await conn.run_sync(UUIDBase.metadata.create_all)
+    # Схема создаётся и обновляется миграциями: alembic upgrade head
+    started = time.perf_counter()
+    os.makedirs(settings.qr_directory, exist_ok=True)
+    await outbox_worker.start()
+    await replica_router.start()
+    await stats_reconciler.start()
+    now = time.perf_counter()
+    startup_duration.set(started - IMPORT_STARTED, 'import')
+    startup_duration.set(now - started, 'hooks')
+    logger.info("Startup finished in %.3fs (import %.3fs, hooks %.3fs)", now - IMPORT_STARTED,
+                started - IMPORT_STARTED, now - started)
+
+
+async def stop() -> None:
+    await outbox_worker.stop()
+    await stats_reconciler.stop()
+    await replica_router.stop()
+    shutdown_executor()
+
 
+instrument_engine(db_config.get_engine())
+if replica_config is not None:
+    instrument_engine(replica_config.get_engine())
 
 cors_config = CORSConfig(
     allow_origins=["*"],  # Разрешает запросы от всех источников
@@ -29,15 +68,22 @@ cors_config = CORSConfig(
 )
 
 app = Litestar(
-    [register_handler, login_handler, assign_role_handler, remove_role_handler, RequestsController,
-     create_user_handler, get_list_users, get_user_id, recovery_password_handler, new_password_handler,
-     create_static_files_router(path='/static', directories=['qr'], send_as_attachment=True)],
-    on_app_init=[jwt_auth.on_app_init],
+    [register_handler, login_handler, new_password_handler, recovery_password_handler,
+     assign_role_handler, remove_role_handler,
+     create_user_handler, create_users_csv_handler, get_list_users, get_user_id,
+     RequestsController, get_qr_handler, get_schedule_handler, get_stats_handler,
+     notifications_handler, notifications_sse_handler, metrics_handler,
+     create_static_files_router(path='/static', directories=[settings.qr_directory], send_as_attachment=True)],
+    on_app_init=[jwt_auth.on_app_init, metrics_on_app_init, replica_on_app_init],
     on_startup=[start],
+    on_shutdown=[stop],
     dependencies={"transaction": Provide(provide_transaction),
-                  "limit_offset": Provide(limitoffsetpagination, sync_to_thread=False)},
+                  "read_session": Provide(provide_read_session),
+                  "limit_offset": Provide(limitoffsetpagination, sync_to_thread=False),
+                  "keyset": Provide(keysetpagination, sync_to_thread=False)},
     plugins=[SQLAlchemyPlugin(db_config),
-             ChannelsPlugin(backend=MemoryChannelsBackend(), channels=['sec', 'applicant'],
-                            arbitrary_channels_allowed=True)],
+             ChannelsPlugin(backend=MemoryChannelsBackend(), channels=[SECURITY_CHANNEL, REVIEW_CHANNEL],
+                            arbitrary_channels_allowed=True, subscriber_max_backlog=settings.channels_max_backlog,
+                            subscriber_backlog_strategy='dropleft')],
     cors_config=cors_config,
 )
@@ -0,0 +1,53 @@
+"""Throughput of one-by-one POST /requests/create against a single POST /requests/bulk call.
+
+    python -m benchmarks.bulk_requests --requests 500 --guests 5
+"""
+import argparse
+import asyncio
+import time
+
+from faker import Faker
+
+from benchmarks.common import app_client, create_schema, ensure_admin, login
+
+
+def make_payload(fake: Faker, guests: int) -> dict:
+    return {
+        'visit_purpose': fake.sentence(),
+        'place_of_visit': fake.address(),
+        'datetime_of_visit': fake.future_datetime(tzinfo=fake.pytimezone()).isoformat(),
+        'guests': [{'full_name': fake.name(), 'email': fake.email(), 'phone_number': '+79123456789',
+                    'is_foreign': False} for _ in range(guests)],
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--guests', type=int, default=5)
+    args = parser.parse_args()
+    fake = Faker('ru_RU')
+    payloads = [make_payload(fake, args.guests) for _ in range(args.requests)]
+
+    await create_schema()
+    await ensure_admin()
+    async with app_client() as client:
+        headers = await login(client)
+
+        started = time.perf_counter()
+        for payload in payloads:
+            (await client.post('/requests/create', json=payload, headers=headers)).raise_for_status()
+        one_by_one = time.perf_counter() - started
+
+        started = time.perf_counter()
+        response = await client.post('/requests/bulk', json=payloads, headers=headers)
+        response.raise_for_status()
+        bulk = time.perf_counter() - started
+
+    guests = args.requests * args.guests
+    print(f'one-by-one: {one_by_one:7.2f} s, {guests / one_by_one:9.0f} guests/s')
+    print(f'      bulk: {bulk:7.2f} s, {guests / bulk:9.0f} guests/s ({one_by_one / bulk:.1f}x)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
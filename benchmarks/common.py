@@ -0,0 +1,93 @@
+"""Helpers shared by the benchmark scripts: schema setup, a seeded admin account and an in-process client."""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator
+from uuid import UUID, uuid4
+
+import httpx
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, select
+
+from src.db import db_config
+from src.endpoints.roles import RolesEnum
+from src.models.users import Roles, UserRoles, Users
+from src.passwords import get_hasher
+
+ADMIN_EMAIL = 'benchmark-admin@example.com'
+ADMIN_PASSWORD = 'benchmark'
+
+
+ALEMBIC_CONFIG = Path(__file__).resolve().parent.parent / 'alembic.ini'
+
+
+async def create_schema() -> None:
+    # env.py запускает свой цикл событий, поэтому миграции идут в отдельном потоке
+    await asyncio.to_thread(command.upgrade, Config(str(ALEMBIC_CONFIG)), 'head')
+
+
+async def ensure_admin() -> UUID:
+    async with db_config.get_session() as session:
+        existing_roles = set((await session.execute(select(Roles.id))).scalars())
+        for role in RolesEnum:
+            if role.value not in existing_roles:
+                session.add(Roles(id=role.value, name=role.name))
+        user_id = (await session.execute(select(Users.id).where(Users.email == ADMIN_EMAIL))).scalar_one_or_none()
+        if user_id is None:
+            user_id = uuid4()
+            session.add(Users(id=user_id, full_name='Benchmark Admin', email=ADMIN_EMAIL,
+                              password=get_hasher().hash(ADMIN_PASSWORD), updated_at=datetime.now(timezone.utc)))
+            await session.flush()
+            for role in RolesEnum:
+                session.add(UserRoles(user_id=user_id, role_id=role.value))
+        await session.commit()
+    return user_id
+
+
+async def login(client: httpx.AsyncClient, email: str = ADMIN_EMAIL, password: str = ADMIN_PASSWORD) -> dict[str, str]:
+    response = await client.post('/login', json={'email': email, 'password': password})
+    response.raise_for_status()
+    return {'Authorization': f"Bearer {response.json()['token']}"}
+
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Run the app's lifespan and talk to it through httpx's ASGI transport on the current event loop.
+
+    Litestar's AsyncTestClient serves requests through a blocking portal, which serializes concurrent calls.
+    """
+    from app import app
+
+    async with app.lifespan():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://testserver') as client:
+            yield client
+
+
+class QueryCounter:
+    """Counts statements issued from tasks that called ``activate``, so the outbox worker does not skew the numbers."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._active: ContextVar[bool] = ContextVar('query_counter_active', default=False)
+        event.listen(db_config.get_engine().sync_engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *_) -> None:
+        if self._active.get():
+            self.count += 1
+
+    def activate(self) -> None:
+        self._active.set(True)
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Return the worst delay, in seconds, by which the event loop overshot a short sleep until ``stop`` is set."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
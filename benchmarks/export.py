@@ -0,0 +1,95 @@
+"""Memory and throughput of GET /requests/export over a large request history.
+
+    DB_URL=postgresql+asyncpg://... python -m benchmarks.export --requests 3000000 --format csv
+
+Seeding tops the tables up like benchmarks/suite.py does. The export is driven through the raw ASGI interface, so
+nothing on the client side holds the body, and the process RSS is sampled on every chunk sent. With a server-side
+cursor the peak should stay close to the RSS after the first chunk whatever the row count.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import app_client, create_schema, ensure_admin, login
+from benchmarks.suite import seed
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # macOS: только пиковое значение, в байтах
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 20
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--requests', type=int, default=1_000_000)
+    parser.add_argument('--guests-per-request', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    args = parser.parse_args()
+
+    await create_schema()
+    await ensure_admin()
+    started = time.perf_counter()
+    await seed(args)
+    print(f'seeded in {time.perf_counter() - started:.1f} s')
+
+    from app import app
+
+    async with app_client() as client:
+        headers = await login(client)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/requests/export', 'raw_path': b'/requests/export', 'root_path': '',
+            'query_string': urlencode({'format': args.format}).encode(),
+            'headers': [(b'host', b'testserver'), (b'authorization', headers['Authorization'].encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        status, chunks, sent, lines = 0, 0, 0, 0
+        first_chunk_rss = peak_rss = 0.0
+
+        requested, finished = False, asyncio.Event()
+
+        async def receive() -> dict:
+            # Как ASGI-сервер: после пустого тела запроса сообщает об отключении, когда ответ отдан целиком
+            nonlocal requested
+            if requested:
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message: dict) -> None:
+            nonlocal status, chunks, sent, lines, first_chunk_rss, peak_rss
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+            if message['type'] == 'http.response.body' and message.get('body'):
+                chunks += 1
+                sent += len(message['body'])
+                lines += message['body'].count(b'\n')
+                rss = rss_mb()
+                first_chunk_rss = first_chunk_rss or rss
+                peak_rss = max(peak_rss, rss)
+
+        before = rss_mb()
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        elapsed = time.perf_counter() - started
+
+    print(f'status {status}, {lines} lines, {sent / 2 ** 20:.1f} MB in {chunks} chunks, {elapsed:.1f} s '
+          f'({lines / elapsed:.0f} lines/s)')
+    print(f'RSS before {before:.1f} MB, after first chunk {first_chunk_rss:.1f} MB, peak {peak_rss:.1f} MB '
+          f'(+{peak_rss - first_chunk_rss:.1f} MB while streaming)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
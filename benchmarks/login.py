@@ -0,0 +1,46 @@
+"""Login throughput and event-loop responsiveness while passwords are being verified.
+
+    python -m benchmarks.login --logins 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import app_client, ADMIN_EMAIL, ADMIN_PASSWORD, create_schema, ensure_admin, watch_loop
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    await create_schema()
+    await ensure_admin()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+
+    async with app_client() as client:
+        async def login_once() -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post('/login', json={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_loop(stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(login_once() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        stall = await watcher
+
+    latencies.sort()
+    print(f'{args.logins / elapsed:8.1f} logins/s, p50 {statistics.median(latencies) * 1000:7.1f} ms, '
+          f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms, worst loop stall {stall * 1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
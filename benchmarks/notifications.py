@@ -0,0 +1,99 @@
+"""Hold many idle WebSocket subscribers against a running server and measure how fast an event fans out to them.
+
+    uvicorn app:app --port 8000 &
+    python -m benchmarks.notifications --url http://127.0.0.1:8000 --subscribers 5000
+
+Every subscriber logs in as the benchmark admin, so all of them receive the ``request_created`` event published on
+the review channel. Raise ``ulimit -n`` on both sides for more than ~1000 connections.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import websockets
+
+from benchmarks.common import create_schema, ensure_admin, login
+
+
+async def subscribe(url: str, headers: dict[str, str], connected: list, received: dict[str, list[float]],
+                    opened: asyncio.Semaphore) -> None:
+    async with opened:
+        socket = await websockets.connect(url, extra_headers=headers, open_timeout=60, ping_interval=None)
+    connected.append(socket)
+    seen: set[str] = set()
+    async for message in socket:
+        event = json.loads(message)
+        # Админ подписан на несколько каналов и получает событие по разу из каждого - считаем первое
+        if event['id'] not in seen:
+            seen.add(event['id'])
+            received.setdefault(event['id'], []).append(time.perf_counter())
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--connect-concurrency', type=int, default=200)
+    parser.add_argument('--idle', type=float, default=10, help='seconds to hold idle connections before publishing')
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(max(soft, args.subscribers + 256), hard), hard))
+
+    await create_schema()
+    await ensure_admin()
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        headers = await login(client)
+        ws_url = args.url.replace('http', 'ws', 1) + '/notifications'
+
+        connected: list = []
+        received: dict[str, list[float]] = {}
+        opened = asyncio.Semaphore(args.connect_concurrency)
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(subscribe(ws_url, headers, connected, received, opened))
+                 for _ in range(args.subscribers)]
+        while len(connected) < args.subscribers:
+            failed = [task for task in tasks if task.done() and task.exception()]
+            if failed:
+                raise failed[0].exception()
+            await asyncio.sleep(0.1)
+        print(f'{args.subscribers} subscribers connected in {time.perf_counter() - started:.1f} s, '
+              f'idling {args.idle:.0f} s')
+        await asyncio.sleep(args.idle)
+
+        published = time.perf_counter()
+        response = await client.post('/requests/create', headers=headers, json={
+            'visit_purpose': 'Notifications benchmark', 'place_of_visit': 'Lobby',
+            'datetime_of_visit': (datetime.now() + timedelta(days=1)).isoformat(), 'guests': [],
+        })
+        response.raise_for_status()
+
+        deadline = published + 30
+        while time.perf_counter() < deadline:
+            deliveries = max((len(times) for times in received.values()), default=0)
+            if deliveries >= args.subscribers:
+                break
+            await asyncio.sleep(0.01)
+
+        for socket in connected:
+            await socket.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    times = sorted(max(received.values(), key=len, default=[]))
+    if not times:
+        print('no events received')
+        return
+    latencies = [t - published for t in times]
+    print(f'delivered to {len(times)}/{args.subscribers}: first {latencies[0] * 1000:.1f} ms, '
+          f'p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, '
+          f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms, last {latencies[-1] * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
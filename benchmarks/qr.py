@@ -0,0 +1,53 @@
+"""Micro-benchmark of QR rendering modes and how much each one stalls the event loop.
+
+    python -m benchmarks.qr --codes 200 --workers 4
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from uuid import uuid4
+
+from benchmarks.common import watch_loop
+from src.qr import QRFormatEnum, render_qr
+
+
+async def run_mode(name: str, executor, image_format: QRFormatEnum, urls: list[str]) -> None:
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    if executor is False:
+        sizes = []
+        for url in urls:
+            sizes.append(len(render_qr(url, image_format)))
+            await asyncio.sleep(0)
+    else:
+        sizes = [len(content) for content in await asyncio.gather(
+            *(loop.run_in_executor(executor, render_qr, url, image_format) for url in urls))]
+    elapsed = time.perf_counter() - started
+    stop.set()
+    stall = await watcher
+    print(f'{name:>16}: {len(urls) / elapsed:8.1f} codes/s, avg {sum(sizes) / len(sizes):7.0f} B, '
+          f'worst loop stall {stall * 1000:7.1f} ms')
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--codes', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    urls = [f'https://example.com/requests/{uuid4()}' for _ in range(args.codes)]
+
+    with ThreadPoolExecutor(args.workers) as threads, ProcessPoolExecutor(args.workers) as processes:
+        await asyncio.get_running_loop().run_in_executor(processes, render_qr, urls[0])
+        await run_mode('inline png', False, QRFormatEnum.PNG, urls)
+        await run_mode('inline svg', False, QRFormatEnum.SVG, urls)
+        await run_mode('thread png', threads, QRFormatEnum.PNG, urls)
+        await run_mode('process png', processes, QRFormatEnum.PNG, urls)
+        await run_mode('process svg', processes, QRFormatEnum.SVG, urls)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""Compare the legacy JOIN + DISTINCT guest-name filter with the EXISTS/trigram search.
+
+Usage (against the database configured in .env / DB_URL):
+
+    python -m benchmarks.search --guests 1000000 --term petr
+
+The schema is migrated to head first. Rows are only seeded when the guests table holds fewer rows than
+requested.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from faker import Faker
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import create_schema
+from src.db import db_config
+from src.models.requests import Guests, RequestsDto
+from src.models.users import Users
+from src.search import name_matches
+
+BATCH = 10_000
+
+
+async def seed(conn, guests: int, per_request: int) -> None:
+    existing = (await conn.execute(select(func.count()).select_from(Guests))).scalar_one()
+    if existing >= guests:
+        return
+    fake = Faker('ru_RU')
+    first_names = [fake.first_name() for _ in range(500)]
+    last_names = [fake.last_name() for _ in range(2000)]
+    user_id = uuid4()
+    await conn.execute(insert(Users).values(id=user_id, full_name=fake.name(), email=f'{user_id}@example.com'))
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    to_insert = guests - existing
+    while to_insert > 0:
+        requests, guest_rows = [], []
+        for _ in range(min(BATCH, to_insert) // per_request or 1):
+            request_id = uuid4()
+            moment = start + timedelta(minutes=random.randint(0, 525_600))
+            requests.append({'id': request_id, 'visit_purpose': 'benchmark', 'place_of_visit': 'benchmark',
+                             'datetime_of_visit': moment, 'appellant_id': user_id,
+                             'datetime': moment.replace(tzinfo=None), 'status': 1})
+            for _ in range(per_request):
+                guest_rows.append({'id': uuid4(), 'request_id': request_id,
+                                   'full_name': f'{random.choice(last_names)} {random.choice(first_names)}',
+                                   'email': 'guest@example.com', 'phone_number': '+79000000000',
+                                   'is_foreign': False, 'visit_status': 1})
+        await conn.execute(insert(RequestsDto), requests)
+        await conn.execute(insert(Guests), guest_rows)
+        to_insert -= len(guest_rows)
+    if conn.dialect.name == 'postgresql':
+        await conn.exec_driver_sql('ANALYZE guests')
+        await conn.exec_driver_sql('ANALYZE requests')
+
+
+def legacy_query(term: str, limit: int):
+    return (select(RequestsDto)
+            .join(Guests, RequestsDto.guests)
+            .where(Guests.full_name.like(f'%{term}%'))
+            .distinct()
+            .order_by(RequestsDto.datetime.desc(), RequestsDto.id.desc())
+            .limit(limit))
+
+
+def search_query(term: str, limit: int):
+    return (select(RequestsDto)
+            .where(RequestsDto.guests.any(name_matches(Guests.full_name, term)))
+            .order_by(RequestsDto.datetime.desc(), RequestsDto.id.desc())
+            .limit(limit))
+
+
+async def measure(conn, query, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        (await conn.execute(query)).all()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--guests', type=int, default=1_000_000)
+    parser.add_argument('--guests-per-request', type=int, default=3)
+    parser.add_argument('--term', default='петр')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    await create_schema()
+    engine = db_config.get_engine()
+    async with engine.begin() as conn:
+        await seed(conn, args.guests, args.guests_per_request)
+    async with engine.connect() as conn:
+        for name, query in (('join+distinct', legacy_query(args.term, args.limit)),
+                            ('exists+index', search_query(args.term, args.limit))):
+            timings = await measure(conn, query, args.repeat)
+            print(f'{name:>14}: median {statistics.median(timings) * 1000:8.2f} ms, '
+                  f'min {min(timings) * 1000:8.2f} ms over {args.repeat} runs')
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
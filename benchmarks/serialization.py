@@ -0,0 +1,119 @@
+"""Per-row cost of turning loaded requests into JSON: the former pydantic ``from_orm`` path against msgspec Structs.
+
+    python -m benchmarks.serialization --requests 1000 --guests 5
+
+Runs on in-memory ORM objects, so only serialization is measured.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+from uuid import UUID, uuid4
+
+import msgspec
+from pydantic import BaseModel, EmailStr
+from pydantic_extra_types.phone_numbers import PhoneNumber
+
+from src.models.requests import Guests, RequestsDto
+from src.models.users import Roles, Users
+from src.schemas.requests import Requests, StatusEnum
+
+
+class LegacyRole(BaseModel):
+    name: str
+
+    class Config:
+        from_attributes = True
+
+
+class LegacyUser(BaseModel):
+    id: UUID
+    full_name: str
+    email: EmailStr
+    created_at: datetime
+    updated_at: datetime
+    roles: List[LegacyRole]
+
+    class Config:
+        from_attributes = True
+
+
+class LegacyGuest(BaseModel):
+    id: UUID
+    full_name: str
+    email: EmailStr
+    phone_number: PhoneNumber
+    is_foreign: bool
+    visit_status: int
+
+    class Config:
+        from_attributes = True
+
+
+class LegacyRequests(BaseModel):
+    id: UUID
+    visit_purpose: str
+    place_of_visit: str
+    datetime_of_visit: datetime
+    guests: list[LegacyGuest]
+    appellant_id: UUID
+    appellant: LegacyUser
+    datetime: datetime
+    status: StatusEnum
+    confirming_id: Optional[UUID]
+    confirming: Optional[LegacyUser]
+
+    class Config:
+        from_attributes = True
+
+
+def make_requests(count: int, guests: int) -> list[RequestsDto]:
+    now = datetime.now(timezone.utc)
+    roles = [Roles(id=1, name='employee'), Roles(id=3, name='confirming')]
+    appellant = Users(id=uuid4(), full_name='Ivan Petrov', email='ivan@example.com', created_at=now, updated_at=now,
+                      roles=roles[:1])
+    confirming = Users(id=uuid4(), full_name='Anna Sidorova', email='anna@example.com', created_at=now,
+                       updated_at=now, roles=roles)
+    requests = []
+    for i in range(count):
+        request = RequestsDto(id=uuid4(), visit_purpose='Meeting', place_of_visit='Room 101', datetime_of_visit=now,
+                              appellant_id=appellant.id, appellant=appellant, datetime=now, status=2,
+                              confirming_id=confirming.id, confirming=confirming)
+        request.guests = [Guests(id=uuid4(), request_id=request.id, full_name=f'Guest {i} {j}',
+                                 email=f'guest{i}.{j}@example.com', phone_number='+79991234567', is_foreign=False,
+                                 visit_status=1) for j in range(guests)]
+        requests.append(request)
+    return requests
+
+
+def measure(label: str, rows: list[RequestsDto], serialize, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serialize(rows)
+        best = min(best, time.perf_counter() - started)
+    print(f'{label:10} {best * 1000:8.1f} ms total, {best / len(rows) * 1e6:8.1f} us/row')
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--guests', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_requests(args.requests, args.guests)
+    encoder = msgspec.json.Encoder()
+    # Litestar сериализует pydantic-модели через model_dump(mode='json') и msgspec
+    before = measure('pydantic', rows,
+                     lambda items: encoder.encode([LegacyRequests.model_validate(r).model_dump(mode='json')
+                                                   for r in items]), args.repeat)
+    after = measure('msgspec', rows, lambda items: encoder.encode([Requests.from_orm(r) for r in items]), args.repeat)
+    print(f'speedup x{before / after:.1f}')
+
+
+if __name__ == '__main__':
+    main()
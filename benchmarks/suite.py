@@ -0,0 +1,447 @@
+"""Endpoint benchmark suite: seed synthetic data, drive every route in-process, save and compare JSON results.
+
+    DB_URL=sqlite+aiosqlite:///bench.sqlite3 python -m benchmarks.suite --reset --output results/base.json
+    python -m benchmarks.suite --output results/new.json --compare results/base.json
+
+The database comes from DB_URL / .env, so the same run works against SQLite or a local PostgreSQL. Seeded names and
+distributions follow ``--seed``, and seeding only tops the tables up to the requested volumes. Every route is
+called ``--iterations`` times with ``--concurrency`` requests in flight. The report gives p50/p95/p99 latency,
+throughput, SQL statements per call and non-2xx responses. ``--compare`` exits non-zero when a route's p95
+grows by more than ``--threshold`` or it issues more queries than in the baseline. The outbox worker is stopped,
+so SMTP traffic does not skew the numbers. The SSE scenario times opening a stream; event fan-out to many
+WebSocket subscribers is covered by benchmarks/notifications.py.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+import httpx
+from faker import Faker
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import QueryCounter, app_client, create_schema, ensure_admin, login
+from src.db import db_config
+from src.endpoints.requests import StatusEnum, VisitStatusEnum
+from src.endpoints.requests import get_request_etag
+from src.endpoints.roles import RolesEnum
+from src.endpoints.users import user_etag
+from src.models import Base
+from src.models.requests import Guests, RequestsDto
+from src.models.users import Tokens, UserRoles, Users
+from src.outbox import outbox_worker
+from src.passwords import get_hasher
+from src.schedule import today
+from src.stats import rebuild_stats
+
+SEED_PASSWORD = 'benchmark'
+BATCH = 5_000
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable[[int], str]
+    options: Callable[[int], dict[str, Any]] = lambda _: {}
+    collect: Callable[[int, httpx.Response], None] | None = None
+    # Вместо запроса через httpx: для ответов, которые не заканчиваются
+    run: Callable[[dict[str, str]], Awaitable[httpx.Response]] | None = None
+
+
+@dataclass
+class Fixtures:
+    admin_id: Any
+    user_ids: list = field(default_factory=list)
+    user_emails: list = field(default_factory=list)
+    user_etags: list = field(default_factory=list)
+    request_ids: list = field(default_factory=list)
+    request_etags: dict = field(default_factory=dict)
+    new_request_ids: list = field(default_factory=list)
+    accepted_request_ids: list = field(default_factory=list)
+    guest_ids: list = field(default_factory=list)
+    register_tokens: list = field(default_factory=list)
+    recovery_tokens: dict = field(default_factory=dict)
+
+
+async def reset_schema() -> None:
+    async with db_config.get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+
+
+async def seed(args: argparse.Namespace) -> None:
+    """Top users, requests and guests up to the requested volumes with multi-row inserts, then rebuild the stats."""
+    fake = Faker('ru_RU')
+    fake.seed_instance(args.seed)
+    rng = random.Random(args.seed)
+    password = get_hasher().hash(SEED_PASSWORD)
+    now = datetime.now(timezone.utc)
+
+    async with db_config.get_session() as session:
+        existing_users = (await session.execute(
+            select(func.count()).select_from(Users).where(Users.email.like('seed-%')))).scalar_one()
+        users = []
+        for i in range(existing_users, args.users):
+            users.append({'id': uuid4(), 'full_name': fake.name(), 'email': f'seed-{i}@example.com',
+                          'password': password, 'created_at': now.replace(tzinfo=None) - timedelta(minutes=i),
+                          'updated_at': now})
+        for start in range(0, len(users), BATCH):
+            chunk = users[start:start + BATCH]
+            await session.execute(insert(Users), chunk)
+            roles = [{'user_id': user['id'], 'role_id': RolesEnum.employee.value} for user in chunk]
+            roles += [{'user_id': user['id'], 'role_id': rng.choice([RolesEnum.security.value,
+                                                                     RolesEnum.confirming.value])}
+                      for user in chunk if rng.random() < 0.1]
+            await session.execute(insert(UserRoles), roles)
+
+        appellants = list((await session.execute(
+            select(Users.id).where(Users.email.like('seed-%')).limit(500))).scalars())
+        existing_requests = (await session.execute(
+            select(func.count()).select_from(RequestsDto).where(RequestsDto.visit_purpose == 'seed'))).scalar_one()
+        statuses = [StatusEnum.NEW.value] * 4 + [StatusEnum.ACCEPTED.value] * 4 + [StatusEnum.REJECTED.value] * 2
+        remaining = args.requests - existing_requests
+        while remaining > 0:
+            requests, guests = [], []
+            for _ in range(min(BATCH, remaining)):
+                request_id = uuid4()
+                moment = now - timedelta(minutes=rng.randint(0, 525_600))
+                requests.append({'id': request_id, 'visit_purpose': 'seed', 'place_of_visit': fake.street_address(),
+                                 'datetime_of_visit': moment + timedelta(days=rng.randint(0, 30)),
+                                 'appellant_id': rng.choice(appellants), 'datetime': moment.replace(tzinfo=None),
+                                 'status': rng.choice(statuses), 'confirming_id': None})
+                for _ in range(args.guests_per_request):
+                    guests.append({'id': uuid4(), 'request_id': request_id, 'full_name': fake.name(),
+                                   'email': fake.email(), 'phone_number': '+79991234567', 'is_foreign': False,
+                                   'visit_status': VisitStatusEnum.PENDING.value})
+            await session.execute(insert(RequestsDto), requests)
+            if guests:
+                await session.execute(insert(Guests), guests)
+            remaining -= len(requests)
+        # Заявки вставлены в обход обработчиков, счётчики GET /stats пересчитываются по ним целиком
+        await rebuild_stats(session)
+        await session.commit()
+
+    if db_config.get_engine().dialect.name == 'postgresql':
+        async with db_config.get_engine().connect() as conn:
+            for table in ('users', 'user_roles', 'requests', 'guests', 'request_stats'):
+                await conn.exec_driver_sql(f'ANALYZE {table}')
+
+
+async def prepare_fixtures(admin_id, iterations: int) -> Fixtures:
+    """Pick ids the scenarios work on and create single-use registration tokens for this run."""
+    fixtures = Fixtures(admin_id=admin_id)
+    async with db_config.get_session() as session:
+        rows = (await session.execute(
+            select(Users.id, Users.email, Users.role_version, Users.updated_at)
+            .where(Users.email.like('seed-%')).limit(iterations))).all()
+        fixtures.user_ids = [row[0] for row in rows]
+        fixtures.user_emails = [row[1] for row in rows]
+        # Теги текущих версий для условных GET: ответы 304 без тела
+        fixtures.user_etags = [user_etag(row[2], row[3]) for row in rows]
+        fixtures.request_ids = list((await session.execute(select(RequestsDto.id).limit(1000))).scalars())
+        for request_id in fixtures.request_ids[:iterations]:
+            fixtures.request_etags[request_id] = await get_request_etag(session, request_id)
+        fixtures.new_request_ids = list((await session.execute(
+            select(RequestsDto.id).where(RequestsDto.status == StatusEnum.NEW.value).limit(iterations))).scalars())
+        fixtures.accepted_request_ids = list((await session.execute(
+            select(RequestsDto.id).where(RequestsDto.status == StatusEnum.ACCEPTED.value).limit(100))).scalars())
+        fixtures.guest_ids = list((await session.execute(select(Guests.id).limit(1000))).scalars())
+
+        pending = [{'id': uuid4(), 'full_name': 'Pending registration', 'email': f'pending-{uuid4()}@example.com',
+                    'password': None} for _ in range(iterations)]
+        await session.execute(insert(Users), pending)
+        fixtures.register_tokens = [secrets.token_hex(16) for _ in pending]
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        await session.execute(insert(Tokens), [
+            {'id': uuid4(), 'user_id': user['id'], 'token': token, 'created_by': admin_id, 'status': 0,
+             'expires_at': expires_at}
+            for user, token in zip(pending, fixtures.register_tokens)])
+        await session.commit()
+
+    if len(fixtures.new_request_ids) < iterations or len(fixtures.user_ids) < iterations:
+        sys.exit(f'Not enough seeded rows for {iterations} iterations: raise --requests/--users or rerun with --seed')
+    return fixtures
+
+
+def request_payload(i: int, guests: int) -> dict[str, Any]:
+    return {
+        'visit_purpose': f'Benchmark {i}', 'place_of_visit': 'Lobby',
+        'datetime_of_visit': (datetime.now(timezone.utc) + timedelta(days=1)).isoformat(),
+        'guests': [{'full_name': f'Guest {i} {j}', 'email': f'guest{i}.{j}@example.com',
+                    'phone_number': '+79991234567', 'is_foreign': False} for j in range(guests)],
+    }
+
+
+def csv_payload(i: int, requests: int, guests: int) -> bytes:
+    lines = ['request,visit_purpose,place_of_visit,datetime_of_visit,full_name,email,phone_number,is_foreign']
+    moment = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    for r in range(requests):
+        for g in range(guests):
+            lines.append(f'{r},Benchmark {i},Lobby,{moment},Guest {r} {g},guest{i}.{r}.{g}@example.com,'
+                         f'+79991234567,false')
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def users_csv_payload(prefix: str, users: int) -> bytes:
+    lines = ['full_name,email,roles']
+    lines += [f'Benchmark User {u},suite-csv-{prefix}-{u}@example.com,employee' for u in range(users)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+async def open_sse(headers: dict[str, str]) -> httpx.Response:
+    """Open ``/notifications/sse`` in-process and disconnect as soon as the stream starts.
+
+    httpx's ASGI transport waits for the whole body, which for an event stream never ends.
+    """
+    from app import app
+
+    started, disconnected = asyncio.Event(), asyncio.Event()
+    status = 500
+    requested = False
+
+    async def receive() -> dict[str, Any]:
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            started.set()
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': '/notifications/sse', 'raw_path': b'/notifications/sse', 'root_path': '', 'query_string': b'',
+             'headers': [(b'host', b'testserver'), *((k.lower().encode(), v.encode()) for k, v in headers.items())],
+             'client': ('127.0.0.1', 1), 'server': ('testserver', 80)}
+    task = asyncio.create_task(app(scope, receive, send))
+    waiter = asyncio.create_task(started.wait())
+    await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+    disconnected.set()
+    await task
+    return httpx.Response(status)
+
+
+def build_scenarios(fixtures: Fixtures, run_id: str, guests: int) -> list[Scenario]:
+    pick = random.Random(0)
+    requests, users, accepted = fixtures.request_ids, fixtures.user_ids, fixtures.accepted_request_ids
+
+    def remember_recovery(i: int, response: httpx.Response) -> None:
+        if response.is_success:
+            fixtures.recovery_tokens[i] = response.json()['token']
+
+    return [
+        Scenario('login', 'POST', lambda _: '/login',
+                 lambda i: {'json': {'email': fixtures.user_emails[i], 'password': SEED_PASSWORD}}),
+        Scenario('register', 'POST', lambda i: f'/register/{fixtures.register_tokens[i]}',
+                 lambda _: {'json': {'password': 'benchmark-new'}}),
+        Scenario('requests_list', 'GET', lambda _: '/requests'),
+        Scenario('requests_list_status', 'GET', lambda _: '/requests',
+                 lambda _: {'params': {'status': StatusEnum.ACCEPTED.value}}),
+        Scenario('requests_search', 'GET', lambda _: '/requests',
+                 lambda i: {'params': {'full_name': ['ан', 'ов', 'ий'][i % 3]}}),
+        Scenario('requests_search_relevance', 'GET', lambda _: '/requests',
+                 lambda i: {'params': {'full_name': ['ан', 'ов', 'ий'][i % 3], 'sort': 'relevance'}}),
+        Scenario('request_detail', 'GET', lambda _: f'/requests/{pick.choice(requests)}'),
+        Scenario('request_detail_not_modified', 'GET', lambda i: f'/requests/{requests[i]}',
+                 lambda i: {'headers': {'If-None-Match': fixtures.request_etags[requests[i]]}}),
+        Scenario('requests_export', 'GET', lambda _: '/requests/export',
+                 lambda i: {'params': {'format': ['ndjson', 'csv'][i % 2],
+                                       'from': (datetime.now(timezone.utc) - timedelta(days=7)).isoformat(),
+                                       'to': datetime.now(timezone.utc).isoformat()}}),
+        Scenario('request_create', 'POST', lambda _: '/requests/create',
+                 lambda i: {'json': request_payload(i, guests)}),
+        Scenario('requests_bulk', 'POST', lambda _: '/requests/bulk',
+                 lambda i: {'json': [request_payload(i, guests) for _ in range(10)]}),
+        Scenario('requests_bulk_csv', 'POST', lambda _: '/requests/bulk/csv',
+                 lambda i: {'content': csv_payload(i, 10, guests), 'headers': {'Content-Type': 'text/csv'}}),
+        Scenario('request_review', 'POST', lambda _: '/requests/review',
+                 lambda i: {'json': {'request_id': str(fixtures.new_request_ids[i]),
+                                     'status': StatusEnum.ACCEPTED.value if i % 2 else StatusEnum.REJECTED.value,
+                                     'comment': None}}),
+        Scenario('guest_action', 'POST', lambda _: '/requests/guests/actions',
+                 lambda i: {'json': {'guest_id': str(pick.choice(fixtures.guest_ids)),
+                                     'status': VisitStatusEnum.ENTERED.value}}),
+        Scenario('guest_action_batch', 'POST', lambda _: '/requests/guests/actions/batch',
+                 lambda _: {'json': {'guest_ids': [str(g) for g in pick.sample(fixtures.guest_ids, 20)],
+                                     'status': VisitStatusEnum.ENTERED.value}}),
+        Scenario('qr', 'GET', lambda i: f'/qr/{accepted[i % len(accepted)]}'),
+        Scenario('schedule', 'GET', lambda _: '/schedule'),
+        Scenario('stats', 'GET', lambda _: '/stats',
+                 lambda i: {'params': {'day': (today() - timedelta(days=i % 30)).isoformat()}}),
+        Scenario('user_create', 'POST', lambda _: '/users/create',
+                 lambda i: {'json': {'full_name': 'Benchmark User', 'email': f'suite-{run_id}-{i}@example.com',
+                                     'roles': [RolesEnum.employee.value]}}),
+        Scenario('users_bulk_csv', 'POST', lambda _: '/users/bulk/csv',
+                 lambda i: {'content': users_csv_payload(f'{run_id}-{i}', 50),
+                            'headers': {'Content-Type': 'text/csv'}}),
+        Scenario('users_list', 'GET', lambda _: '/users'),
+        Scenario('users_list_role', 'GET', lambda _: '/users',
+                 lambda _: {'params': {'role': RolesEnum.security.value}}),
+        Scenario('user_detail', 'GET', lambda _: f'/users/{pick.choice(users)}'),
+        Scenario('user_detail_not_modified', 'GET', lambda i: f'/users/{users[i]}',
+                 lambda i: {'headers': {'If-None-Match': fixtures.user_etags[i]}}),
+        Scenario('role_assign', 'POST', lambda _: '/role/assign',
+                 lambda i: {'json': {'user_id': str(users[i]), 'role_id': RolesEnum.admin.value}}),
+        Scenario('role_remove', 'POST', lambda _: '/role/remove',
+                 lambda i: {'json': {'user_id': str(users[i]), 'role_id': RolesEnum.admin.value}}),
+        Scenario('recovery_password', 'POST', lambda _: '/recovery_password',
+                 lambda i: {'params': {'email': fixtures.user_emails[i]}}, collect=remember_recovery),
+        Scenario('metrics', 'GET', lambda _: '/metrics'),
+        Scenario('notifications_sse', 'GET', lambda _: '/notifications/sse', run=open_sse),
+        Scenario('new_password', 'PUT', lambda i: f'/new_password/{fixtures.recovery_tokens.get(i, "missing")}',
+                 lambda _: {'params': {'new_password': SEED_PASSWORD}}),
+    ]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    # Ближайший ранг: без интерполяции, чтобы значения совпадали с реально измеренными
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, headers: dict[str, str], counter: QueryCounter,
+                       scenario: Scenario, iterations: int, concurrency: int) -> dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+
+    async def call(i: int) -> None:
+        options = scenario.options(i)
+        request_headers = {**headers, **options.pop('headers', {})}
+        async with semaphore:
+            started = time.perf_counter()
+            if scenario.run is not None:
+                response = await scenario.run(request_headers)
+            else:
+                response = await client.request(scenario.method, scenario.path(i), headers=request_headers,
+                                                **options)
+            latencies.append(time.perf_counter() - started)
+        # 304 - ожидаемый ответ условных GET
+        if not response.is_success and response.status_code != 304:
+            errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+        if scenario.collect is not None:
+            scenario.collect(i, response)
+
+    counter.count = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(iterations)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'throughput_rps': round(iterations / elapsed, 1),
+        'queries_per_call': round(counter.count / iterations, 2),
+        'errors': errors,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> bool:
+    """Print per-route deltas against ``baseline``; return True when any route regressed."""
+    regressed = False
+    print(f"\nagainst {baseline['meta'].get('commit')} ({baseline['meta'].get('created_at')}):")
+    for name, current in results['routes'].items():
+        previous = baseline['routes'].get(name)
+        if previous is None:
+            continue
+        ratio = current['p95_ms'] / previous['p95_ms'] if previous['p95_ms'] else 1.0
+        slower = ratio > 1 + threshold
+        more_queries = current['queries_per_call'] > previous['queries_per_call']
+        regressed = regressed or slower or more_queries
+        flags = ' '.join(flag for flag, on in (('SLOWER', slower), ('MORE-QUERIES', more_queries)) if on)
+        print(f"{name:28} p95 {previous['p95_ms']:9.2f} -> {current['p95_ms']:9.2f} ms (x{ratio:4.2f})  "
+              f"queries {previous['queries_per_call']:5.2f} -> {current['queries_per_call']:5.2f}  {flags}")
+    return regressed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--requests', type=int, default=5_000)
+    parser.add_argument('--guests-per-request', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='*', help='run only these scenarios')
+    parser.add_argument('--reset', action='store_true', help='drop and recreate all tables before seeding')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', help='baseline JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative p95 growth')
+    args = parser.parse_args()
+
+    if args.reset:
+        await reset_schema()
+    await create_schema()
+    admin_id = await ensure_admin()
+    started = time.perf_counter()
+    await seed(args)
+    print(f'seeded in {time.perf_counter() - started:.1f} s')
+    fixtures = await prepare_fixtures(admin_id, args.iterations)
+    counter = QueryCounter()
+    results: dict[str, Any] = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'dialect': db_config.get_engine().dialect.name,
+            'python': platform.python_version(),
+            'volumes': {'users': args.users, 'requests': args.requests,
+                        'guests_per_request': args.guests_per_request},
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+        },
+        'routes': {},
+    }
+
+    async with app_client() as client:
+        await outbox_worker.stop()
+        headers = await login(client)
+        counter.activate()
+        for scenario in build_scenarios(fixtures, uuid4().hex[:8], args.guests_per_request):
+            if args.only and scenario.name not in args.only:
+                continue
+            stats = await run_scenario(client, headers, counter, scenario, args.iterations, args.concurrency)
+            results['routes'][scenario.name] = stats
+            print(f"{scenario.name:28} p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f}  "
+                  f"p99 {stats['p99_ms']:8.2f} ms  {stats['throughput_rps']:8.1f} req/s  "
+                  f"{stats['queries_per_call']:5.2f} q/call  errors {stats['errors'] or '-'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
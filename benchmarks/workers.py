@@ -0,0 +1,121 @@
+"""Throughput of the production server (python -m src.serve) for different worker counts.
+
+    DB_URL=postgresql+asyncpg://... python -m benchmarks.workers --workers 1 2 4 --duration 20 --concurrency 64
+
+Each worker count gets a fresh server on a real socket. The client keeps ``--concurrency`` requests in flight for
+``--duration`` seconds, round-robin over ``--paths``. The run ends with SIGTERM while requests are in flight: those
+that fail anyway are dropped by the graceful shutdown, while requests sent after the listener closed or still unread
+on a keep-alive connection are not accepted at all and are safe to retry.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import create_schema, ensure_admin, login
+from benchmarks.suite import percentile, seed
+
+
+async def wait_ready(client: httpx.AsyncClient, process: asyncio.subprocess.Process, timeout: float = 60) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.returncode is not None:
+            raise RuntimeError(f'server exited with {process.returncode}')
+        try:
+            await client.get('/metrics')
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+async def run(workers: int, args: argparse.Namespace) -> dict[str, float]:
+    env = {**os.environ, 'WORKERS': str(workers), 'PORT': str(args.port), 'HOST': '127.0.0.1'}
+    process = await asyncio.create_subprocess_exec(sys.executable, '-m', 'src.serve', env=env,
+                                                   stdout=asyncio.subprocess.DEVNULL,
+                                                   stderr=asyncio.subprocess.DEVNULL)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{args.port}', limits=limits, timeout=60) as client:
+        try:
+            await wait_ready(client, process)
+            headers = await login(client)
+            latencies: list[float] = []
+            errors = dropped = closed = 0
+            terminated = False
+
+            async def worker(n: int) -> None:
+                nonlocal errors, dropped, closed
+                i = n
+                while not terminated:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get(args.paths[i % len(args.paths)], headers=headers)
+                        failed = response.status_code >= 500
+                    except (httpx.ConnectError, httpx.ReadError, httpx.RemoteProtocolError):
+                        # После SIGTERM новые соединения не принимаются, а keep-alive соединения, запрос в которых
+                        # ещё не начал обрабатываться, закрываются (с непрочитанными данными ядро шлёт RST)
+                        if terminated:
+                            closed += 1
+                            return
+                        failed = True
+                    except httpx.TransportError:
+                        failed = True
+                    if terminated:
+                        # Запрос был принят до SIGTERM и должен был завершиться
+                        dropped += failed
+                    elif failed:
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - started)
+                    i += args.concurrency
+
+            started = time.perf_counter()
+            tasks = [asyncio.create_task(worker(n)) for n in range(args.concurrency)]
+            await asyncio.sleep(args.duration)
+            elapsed = time.perf_counter() - started
+            terminated = True
+            process.send_signal(signal.SIGTERM)
+            await asyncio.gather(*tasks)
+        finally:
+            if process.returncode is None:
+                process.send_signal(signal.SIGTERM)
+            await process.wait()
+
+    latencies.sort()
+    return {'workers': workers, 'rps': len(latencies) / elapsed, 'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000, 'errors': errors, 'dropped': dropped,
+            'closed': closed}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--port', type=int, default=3100)
+    parser.add_argument('--paths', nargs='+', default=['/requests', '/users', '/schedule'])
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--requests', type=int, default=5_000)
+    parser.add_argument('--guests-per-request', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    await create_schema()
+    await ensure_admin()
+    await seed(args)
+
+    baseline = None
+    for workers in args.workers:
+        stats = await run(workers, args)
+        baseline = baseline or stats['rps']
+        print(f"{workers:3} workers  {stats['rps']:8.1f} req/s (x{stats['rps'] / baseline:.2f})  "
+              f"p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f} ms  errors {stats['errors'] or '-'}  "
+              f"on SIGTERM: dropped {stats['dropped'] or '-'}, not accepted {stats['closed'] or '-'}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
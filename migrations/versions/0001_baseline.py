@@ -0,0 +1,102 @@
+"""baseline: schema as created by create_all before migrations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+Databases created by create_all already have these tables, so only the missing ones are created and
+``alembic upgrade head`` works on them as on an empty database.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    def create_table(name: str, *elements) -> None:
+        if name not in existing:
+            op.create_table(name, *elements)
+
+    create_table(
+        'roles',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    create_table(
+        'users',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    create_table(
+        'requests',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('visit_purpose', sa.String(), nullable=False),
+        sa.Column('place_of_visit', sa.String(), nullable=False),
+        sa.Column('datetime_of_visit', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('appellant_id', sa.Uuid(), nullable=False),
+        sa.Column('datetime', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.Integer(), nullable=False),
+        sa.Column('confirming_id', sa.Uuid(), nullable=True),
+        sa.Column('comment', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['appellant_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['confirming_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    create_table(
+        'tokens',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('user_id', sa.Uuid(), nullable=False),
+        sa.Column('token', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('created_by', sa.Uuid(), nullable=False),
+        sa.Column('status', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token'),
+    )
+    create_table(
+        'user_roles',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Uuid(), nullable=False),
+        sa.Column('role_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['role_id'], ['roles.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    create_table(
+        'guests',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('request_id', sa.Uuid(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('phone_number', sa.String(), nullable=False),
+        sa.Column('is_foreign', sa.Boolean(), nullable=False),
+        sa.Column('visit_status', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['request_id'], ['requests.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('guests')
+    op.drop_table('user_roles')
+    op.drop_table('tokens')
+    op.drop_table('requests')
+    op.drop_table('users')
+    op.drop_table('roles')
@@ -0,0 +1,91 @@
+"""indexes for the hot queries, outbox table, users.role_version
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:10:00
+
+Databases created by create_all may already have some of these objects, so every step checks before creating.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя, таблица, колонки)
+INDEXES = [
+    # списки заявок: сортировка по datetime, фильтры по заявителю и статусу, keyset по (datetime, id)
+    ('ix_requests_datetime_id', 'requests', ['datetime', 'id']),
+    ('ix_requests_appellant_id_datetime_id', 'requests', ['appellant_id', 'datetime', 'id']),
+    ('ix_requests_status_datetime_id', 'requests', ['status', 'datetime', 'id']),
+    # selectinload гостей и обновление статусов гостей по заявке
+    ('ix_guests_request_id', 'guests', ['request_id']),
+    # роли пользователя при аутентификации и фильтр списка пользователей по роли
+    ('ix_user_roles_user_id', 'user_roles', ['user_id']),
+    ('ix_user_roles_role_id_user_id', 'user_roles', ['role_id', 'user_id']),
+    ('ix_tokens_user_id', 'tokens', ['user_id']),
+    # keyset-пагинация GET /users
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+]
+
+TRGM_INDEXES = [
+    ('ix_users_full_name_trgm', 'users'),
+    ('ix_guests_full_name_trgm', 'guests'),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'role_version' not in {column['name'] for column in inspector.get_columns('users')}:
+        op.add_column('users', sa.Column('role_version', sa.Integer(), server_default='0', nullable=False))
+    if not inspector.has_table('outbox'):
+        create_outbox()
+
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    if not postgres:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+        return
+
+    # На больших таблицах индексы строятся CONCURRENTLY, без блокировки записи; это нельзя делать в транзакции
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table in TRGM_INDEXES:
+            op.create_index(name, table, ['full_name'], postgresql_using='gin',
+                            postgresql_ops={'full_name': 'gin_trgm_ops'}, postgresql_concurrently=True,
+                            if_not_exists=True)
+
+
+def create_outbox() -> None:
+    op.create_table(
+        'outbox',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('recipient', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('body', sa.String(), nullable=False),
+        sa.Column('status', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_outbox_status_next_attempt_at', 'outbox', ['status', 'next_attempt_at'])
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, table in TRGM_INDEXES:
+            op.drop_index(name, table_name=table)
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_index('ix_outbox_status_next_attempt_at', table_name='outbox')
+    op.drop_table('outbox')
+    op.drop_column('users', 'role_version')
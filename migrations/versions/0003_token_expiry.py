@@ -0,0 +1,41 @@
+"""tokens.expires_at and a partial index over unused tokens
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 14:00:00
+
+Unused tokens issued before this revision get a fresh week (the registration_token_ttl default at the time), so
+outstanding links keep working.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Зафиксировано в ревизии, чтобы её результат не зависел от настроек приложения
+EXISTING_TOKEN_TTL = timedelta(days=7)
+
+
+def upgrade() -> None:
+    op.add_column('tokens', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    tokens = sa.table('tokens', sa.column('expires_at', sa.DateTime(timezone=True)), sa.column('status', sa.Integer))
+    now = datetime.now(timezone.utc)
+    op.execute(tokens.update().where(tokens.c.status == 0)
+               .values(expires_at=now + EXISTING_TOKEN_TTL))
+    op.execute(tokens.update().where(tokens.c.status != 0).values(expires_at=now))
+    with op.batch_alter_table('tokens') as batch:
+        batch.alter_column('expires_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+    op.create_index('ix_tokens_active_token', 'tokens', ['token', 'expires_at'],
+                    postgresql_where=sa.text('status = 0'), sqlite_where=sa.text('status = 0'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tokens_active_token', table_name='tokens')
+    with op.batch_alter_table('tokens') as batch:
+        batch.drop_column('expires_at')
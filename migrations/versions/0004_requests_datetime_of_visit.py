@@ -0,0 +1,27 @@
+"""index on requests.datetime_of_visit for the day schedule
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index('ix_requests_datetime_of_visit', 'requests', ['datetime_of_visit'])
+        return
+    with op.get_context().autocommit_block():
+        op.create_index('ix_requests_datetime_of_visit', 'requests', ['datetime_of_visit'],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_datetime_of_visit', table_name='requests')
@@ -0,0 +1,28 @@
+"""version counters on requests and guests for ETags
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 19:00:00
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Постоянное значение по умолчанию: на PostgreSQL 11+ столбец добавляется без перезаписи таблицы
+    op.add_column('requests', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('guests', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('guests') as batch:
+        batch.drop_column('version')
+    with op.batch_alter_table('requests') as batch:
+        batch.drop_column('version')
@@ -0,0 +1,61 @@
+"""request and guest counters per visit day and status
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 21:00:00
+
+The backfill groups visits by day in ``settings.schedule_timezone``, loaded from the environment and ``.env`` like the
+app does; with the timezone changed later, rebuild the counters with ``python -m src.stats``.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+from zoneinfo import ZoneInfo
+
+import sqlalchemy as sa
+from alembic import op
+
+# Только настройки: зона и границы дней должны совпадать с теми, по которым считает StatsDelta
+from src.settings import settings
+
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL = """
+INSERT INTO request_stats (day, status, requests, guests_pending, guests_inside, guests_exited)
+SELECT day, status, count(DISTINCT id),
+       coalesce(sum(CASE WHEN visit_status = 1 THEN 1 ELSE 0 END), 0),
+       coalesce(sum(CASE WHEN visit_status = 2 THEN 1 ELSE 0 END), 0),
+       coalesce(sum(CASE WHEN visit_status = 3 THEN 1 ELSE 0 END), 0)
+FROM (SELECT {day} AS day, requests.id, requests.status, guests.visit_status
+      FROM requests LEFT OUTER JOIN guests ON guests.request_id = requests.id) AS visits
+GROUP BY day, status
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'request_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.Integer(), nullable=False),
+        sa.Column('requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('guests_pending', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('guests_inside', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('guests_exited', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'status'),
+    )
+    # Счётчики по уже накопленным заявкам, дальше их поддерживают обработчики
+    timezone = settings.schedule_timezone
+    if op.get_bind().dialect.name == 'postgresql':
+        day = 'CAST(timezone(:timezone, requests.datetime_of_visit) AS DATE)'
+        op.execute(sa.text(BACKFILL.format(day=day)).bindparams(timezone=timezone))
+    else:
+        # SQLite хранит время в UTC без зоны: сдвиг на текущее смещение зоны
+        offset = int(datetime.now(ZoneInfo(timezone)).utcoffset().total_seconds())
+        day = 'date(requests.datetime_of_visit, :offset)'
+        op.execute(sa.text(BACKFILL.format(day=day)).bindparams(offset=f'{offset:+d} seconds'))
+
+
+def downgrade() -> None:
+    op.drop_table('request_stats')
@@ -0,0 +1,62 @@
+"""guest phone numbers stored before E.164 normalization rewritten to E.164
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 23:00:00
+
+Earlier rows hold the RFC 3966 form (``tel:+7-999-123-45-67``); new ones are stored as ``+79991234567``. Values that do
+not parse as a phone number are left as they are. The old form cannot be restored, so downgrade keeps the data.
+"""
+from typing import Sequence, Union
+
+import phonenumbers
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def to_e164(value: str) -> str:
+    try:
+        number = phonenumbers.parse(value)
+    except phonenumbers.NumberParseException:
+        return value
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    guests = sa.table('guests', sa.column('id', sa.Uuid()), sa.column('phone_number', sa.String()),
+                      sa.column('version', sa.Integer()))
+    # Всё, что не похоже на E.164: префикс tel:, дефисы, пробелы
+    legacy = sa.or_(guests.c.phone_number.not_like('+%'), guests.c.phone_number.like('%-%'),
+                    guests.c.phone_number.like('% %'))
+    update = (guests.update().where(guests.c.id == sa.bindparam('guest_id'))
+              # Новая версия меняет ETag заявки, иначе клиенты получат 304 со старым форматом
+              .values(phone_number=sa.bindparam('normalized'), version=guests.c.version + 1))
+    last_id = None
+    while True:
+        # Идём по id: строки, которые не удалось разобрать, подходят под фильтр и после обновления
+        query = sa.select(guests.c.id, guests.c.phone_number).where(legacy).order_by(guests.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(guests.c.id > last_id)
+        rows = connection.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changed = []
+        for guest_id, phone_number in rows:
+            normalized = to_e164(phone_number)
+            if normalized != phone_number:
+                changed.append({'guest_id': guest_id, 'normalized': normalized})
+        if changed:
+            connection.execute(update, changed)
+
+
+def downgrade() -> None:
+    pass
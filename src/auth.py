@@ -1,47 +1,87 @@
-import base64
 from datetime import timedelta
 from typing import Any
+from uuid import UUID
 
-from cryptography.fernet import Fernet
 from litestar.connection import ASGIConnection
-from litestar.security.jwt import JWTAuth, Token
+from litestar.middleware import AuthenticationResult
+from litestar.security.jwt import JWTAuth, JWTAuthenticationMiddleware, Token
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.cache import TTLCache
 from src.db import db_config
-from src.models.users import Users
+from src.metrics import observe_phase, register_cache
+from src.models.loaders import USER_PRINCIPAL
+from src.models.users import UserRoles, Users
+from src.replica import replica_router
 from src.settings import settings
+from src.transactions import on_commit
 
 
-def decrypt(enc_token: str):
-    key = base64.urlsafe_b64encode(settings.crypt_token.encode("utf-8").ljust(32)[:32])
-    fernet = Fernet(key)
-    return fernet.decrypt(enc_token.encode("utf-8")).decode('utf-8')
+principal_cache: TTLCache[str, Users] = TTLCache(maxsize=settings.principal_cache_size,
+                                                 ttl=settings.principal_cache_ttl)
 
 
-def encrypt(password: str):
-    key = base64.urlsafe_b64encode(settings.crypt_token.encode("utf-8").ljust(32)[:32])
-    fernet = Fernet(key)
-    return fernet.encrypt(password.encode("utf-8")).decode('utf-8')
+# Роли кэшируются по (id, role_version): смена ролей увеличивает версию, и старая запись больше не читается
+role_cache: TTLCache[tuple[UUID, int], frozenset[int]] = TTLCache(maxsize=settings.principal_cache_size,
+                                                                  ttl=settings.principal_cache_ttl)
+
+
+register_cache('principal', principal_cache)
+register_cache('role', role_cache)
+
+
+def invalidate_principal(session: AsyncSession, user_id: UUID) -> None:
+    """Drop the cached principal once the session's transaction commits.
+
+    Dropping it earlier would let a concurrent request cache the old password hash or role version again.
+    """
+    on_commit(session, lambda: principal_cache.pop_where(lambda user: user.id == user_id))
+
+
+async def load_role_ids(session: AsyncSession, user_id: UUID) -> frozenset[int]:
+    result = await session.execute(select(UserRoles.role_id).where(UserRoles.user_id == user_id))
+    return frozenset(result.scalars())
 
 
 async def retrieve_user_handler(
         token: Token,
-        _: "ASGIConnection[Any]",
+        connection: "ASGIConnection[Any]",
 ) -> Users | None:
-    async with db_config.get_session() as session:
-        result = await session.execute(
-            select(Users)
-            .where(
-                Users.email == token.sub
-            )
-        )
-        result = result.scalar_one()
+    cached = principal_cache.get(token.sub)
+    if cached is not None:
+        return cached
+    query = select(Users).options(*USER_PRINCIPAL).where(Users.email == token.sub)
+    with observe_phase('auth_lookup'):
+        async with replica_router.session(connection) as session:
+            result = (await session.execute(query)).scalar_one_or_none()
+        if result is None:
+            # Только что созданного пользователя на реплике может ещё не быть
+            async with db_config.get_session() as session:
+                result = (await session.execute(query)).scalar_one()
+    principal_cache.set(token.sub, result)
     return result
 
 
+# Браузерные WebSocket и EventSource не умеют задавать заголовки, поэтому подписки принимают и ?token=
+QUERY_TOKEN_PATHS = frozenset({'/notifications', '/notifications/sse'})
+
+
+class JWTQueryAuthenticationMiddleware(JWTAuthenticationMiddleware):
+    """Falls back to the ``token`` query parameter on ``QUERY_TOKEN_PATHS`` when there is no ``Authorization`` header."""
+
+    async def authenticate_request(self, connection: ASGIConnection[Any, Any, Any, Any]) -> AuthenticationResult:
+        encoded_token = connection.query_params.get('token')
+        if (encoded_token and not connection.headers.get(self.auth_header)
+                and connection.scope['path'] in QUERY_TOKEN_PATHS):
+            return await self.authenticate_token(encoded_token=encoded_token, connection=connection)
+        return await super().authenticate_request(connection)
+
+
 jwt_auth = JWTAuth[Users](
     retrieve_user_handler=retrieve_user_handler,
+    authentication_middleware_class=JWTQueryAuthenticationMiddleware,
     token_secret=settings.jwt_secret,
-    exclude=["/register/*", "/login", "/schema", "/static/*"],
+    exclude=["/register/*", "/login", "/schema", "/static/*", "/qr/*", "/metrics"],
     default_token_expiration=timedelta(hours=12),
 )
@@ -1,26 +1,70 @@
-# @websocket("/notifications")
-# async def notifications_handler(
-#         socket: WebSocket,
-#         channels: ChannelsPlugin,
-#         request: "Request[Users, Token, Any]",
-#         transaction: AsyncSession
-# ) -> None:
-#     await socket.accept()
-#
-#     if RolesEnum.security.value in get_roles(transaction, request.user.id):
-#         subscriber = await channels.subscribe(['sec', 'applicant'])
-#     else:
-#         subscriber = await channels.subscribe(['applicant'])
-#     async for message in subscriber.iter_events():
-#         await socket.send_text(message)
-#     await subscriber.stop()
-#
-
-# @websocket("/ws/applicant/{applicant_id: uuid}")
-# async def applicant_handler(socket: WebSocket, channels: ChannelsPlugin, applicant_id: UUID) -> None:
-#     await socket.accept()
-#     channel_name = f"applicant_{applicant_id}"
-#     subscriber = await channels.subscribe([channel_name])
-#     async for message in subscriber.iter_events():
-#         await socket.send_text(message)
-#     await subscriber.stop()
+import contextlib
+from typing import Any, AsyncGenerator, Iterable
+from uuid import UUID, uuid4
+
+from litestar import Request, WebSocket, get, websocket
+from litestar.channels import ChannelsPlugin
+from litestar.connection import ASGIConnection
+from litestar.exceptions import WebSocketDisconnect
+from litestar.response import ServerSentEvent
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.endpoints.roles import RolesEnum
+from src.guards import resolve_roles
+from src.transactions import on_commit
+
+SECURITY_CHANNEL = 'sec'
+REVIEW_CHANNEL = 'review'
+
+
+def applicant_channel(user_id: UUID) -> str:
+    return f'applicant_{user_id}'
+
+
+async def subscriber_channels(connection: "ASGIConnection[Any, Any, Any, Any]") -> list[str]:
+    roles = await resolve_roles(connection)
+    channels = [applicant_channel(connection.user.id)]
+    if RolesEnum.security.value in roles:
+        channels.append(SECURITY_CHANNEL)
+    if RolesEnum.confirming.value in roles:
+        channels.append(REVIEW_CHANNEL)
+    return channels
+
+
+def publish_after_commit(
+        session: AsyncSession,
+        channels: ChannelsPlugin,
+        event_type: str,
+        payload: dict[str, Any],
+        targets: Iterable[str],
+) -> None:
+    """Queue an event for ``targets``; it is published only once the session's transaction commits.
+
+    A subscriber on several of the targets receives the event once per channel, ``id`` lets clients drop repeats.
+    """
+    data = {'id': str(uuid4()), 'event': event_type, **payload}
+    targets = list(dict.fromkeys(targets))
+    on_commit(session, lambda: channels.publish(data, targets))
+
+
+@websocket('/notifications')
+async def notifications_handler(socket: WebSocket, channels: ChannelsPlugin) -> None:
+    await socket.accept()
+    # Очередь подписчика ограничена (settings.channels_max_backlog), медленный клиент теряет старые события
+    async with channels.start_subscription(await subscriber_channels(socket)) as subscriber:
+        async with subscriber.run_in_background(socket.send_data):
+            with contextlib.suppress(WebSocketDisconnect):
+                while True:
+                    await socket.receive_data(mode='text')
+
+
+@get('/notifications/sse')
+async def notifications_sse_handler(request: Request, channels: ChannelsPlugin) -> ServerSentEvent:
+    names = await subscriber_channels(request)
+
+    async def events() -> AsyncGenerator[str, None]:
+        async with channels.start_subscription(names) as subscriber:
+            async for data in subscriber.iter_events():
+                yield data.decode('utf-8')
+
+    return ServerSentEvent(events())
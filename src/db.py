@@ -1,12 +1,43 @@
 from advanced_alchemy.extensions.litestar.plugins.init.config.asyncio import autocommit_before_send_handler
-from litestar.contrib.sqlalchemy.plugins import SQLAlchemyAsyncConfig
+from litestar.contrib.sqlalchemy.plugins import EngineConfig, SQLAlchemyAsyncConfig
 
 from src.models import Base
 from src.settings import settings
 
+
+def make_engine_config(connection_string: str) -> EngineConfig:
+    engine_config = EngineConfig(pool_recycle=settings.db_pool_recycle, pool_pre_ping=settings.db_pool_pre_ping)
+    # aiosqlite работает без пула (NullPool), размеры пула ему не передаются
+    if not connection_string.startswith('sqlite'):
+        engine_config.pool_size = settings.db_pool_size
+        engine_config.max_overflow = settings.db_max_overflow
+        engine_config.pool_timeout = settings.db_pool_timeout
+    if connection_string.startswith('postgresql+asyncpg'):
+        engine_config.connect_args = {'statement_cache_size': settings.db_statement_cache_size}
+    return engine_config
+
+
+connection_string = settings.db_url or f"postgresql+asyncpg://{settings.db_username}:{settings.db_password}@{settings.db_ip}:{settings.db_port}/{settings.db_name}"
+
 db_config = SQLAlchemyAsyncConfig(
-    connection_string=f"postgresql+asyncpg://{settings.db_username}:{settings.db_password}@{settings.db_ip}:{settings.db_port}/{settings.db_name}",
+    connection_string=connection_string,
     metadata=Base.metadata,
-    create_all=True,
+    create_all=False,
     before_send_handler=autocommit_before_send_handler,
+    engine_config=make_engine_config(connection_string),
 )
+# get_engine()/get_session() создают новый движок с пулом на каждый вызов, если экземпляр не задан
+db_config.engine_instance = db_config.get_engine()
+db_config.session_maker = db_config.create_session_maker()
+
+# Реплика только для чтения; не подключается как плагин, сессии к ней выдаёт src.replica
+replica_config: SQLAlchemyAsyncConfig | None = None
+if settings.db_replica_url:
+    replica_config = SQLAlchemyAsyncConfig(
+        connection_string=settings.db_replica_url,
+        metadata=Base.metadata,
+        create_all=False,
+        engine_config=make_engine_config(settings.db_replica_url),
+    )
+    replica_config.engine_instance = replica_config.get_engine()
+    replica_config.session_maker = replica_config.create_session_maker()
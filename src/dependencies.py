@@ -1,5 +1,7 @@
-from typing import AsyncGenerator
+import time
+from typing import AsyncGenerator, Optional
 
+from litestar import Request
 from litestar.exceptions import ClientException
 from litestar.status_codes import HTTP_409_CONFLICT
 from sqlalchemy.exc import IntegrityError
@@ -7,10 +9,19 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from litestar.params import Parameter
 from litestar.repository.filters import LimitOffset
 
+from src.metrics import record_pool_wait
+from src.pagination import KeysetPagination
+from src.replica import replica_router
+from src.settings import settings
+
 
 async def provide_transaction(db_session: AsyncSession) -> AsyncGenerator[AsyncSession, None]:
     try:
         async with db_session.begin():
+            # Соединение берётся из пула сразу, чтобы отдельно измерить ожидание свободного соединения
+            started = time.perf_counter()
+            await db_session.connection()
+            record_pool_wait(time.perf_counter() - started)
             yield db_session
     except IntegrityError as exc:
         raise ClientException(
@@ -19,6 +30,12 @@ async def provide_transaction(db_session: AsyncSession) -> AsyncGenerator[AsyncS
         ) from exc
 
 
+async def provide_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    # Для обработчиков, которые только читают: без транзакции и коммита, с реплики, если она успевает за основной базой
+    async with replica_router.session(request) as session:
+        yield session
+
+
 def limitoffsetpagination(
     current_page: int = Parameter(ge=1, query="currentPage", default=1, required=False),
     page_size: int = Parameter(
@@ -28,4 +45,17 @@ def limitoffsetpagination(
         required=False,
     ),
 ) -> LimitOffset:
-    return LimitOffset(page_size, page_size * (current_page - 1))
\ No newline at end of file
+    return LimitOffset(page_size, page_size * (current_page - 1))
+
+
+def keysetpagination(
+    cursor: Optional[str] = Parameter(query="cursor", default=None, required=False),
+    page_size: int = Parameter(
+        query="pageSize",
+        ge=1,
+        le=settings.requests_max_page_size,
+        default=settings.requests_page_size,
+        required=False,
+    ),
+) -> KeysetPagination:
+    return KeysetPagination(cursor, page_size)
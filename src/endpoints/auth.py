@@ -1,5 +1,4 @@
 from enum import Enum
-from uuid import UUID, uuid4
 from typing import Any
 
 from litestar import post, put, Response, Request
@@ -9,10 +8,13 @@ from sqlalchemy import select, update
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.auth import encrypt, jwt_auth, decrypt
+from src.auth import jwt_auth, invalidate_principal, load_role_ids
 from src.models.users import Users, Tokens
 from src.schemas.auth import UserRegister, UserLogin
-from src.utils import unique_token_generator, send_message
+from src.outbox import enqueue_message
+from src.passwords import hash_password, verify_password
+from src.settings import settings
+from src.utils import get_active_token, issue_token, revoke_recovery_tokens
 
 
 class StatusEnum(Enum):
@@ -20,36 +22,26 @@ class StatusEnum(Enum):
     registered = 1
 
 
-async def get_response_body(session: AsyncSession, user_id: UUID):
-    query = select(Users).where(Users.id == user_id)
-    existing_user = await session.execute(query)
-    existing_user = existing_user.scalar_one()
-    response_body = Users(
-        id=existing_user.id,
-        full_name=existing_user.full_name,
-        created_at=existing_user.created_at,
-        updated_at=existing_user.updated_at,
-    )
-    return response_body
-
-
 @post('/register/{token: str}')
 async def register_handler(data: UserRegister, transaction: AsyncSession, token: str) -> Response[UserLogin]:
-    query = select(Tokens).where(Tokens.token == token)
-    existing_token = await transaction.execute(query)
-    existing_token = existing_token.scalar_one()
-
-    if existing_token.status == StatusEnum.registered.value:
-        raise HTTPException(status_code=401, detail="The account is already registered. Contact technical support")
+    existing_token = await get_active_token(transaction, token)
+    if existing_token is None:
+        query = select(Tokens.id).where(Tokens.token == token, Tokens.status == StatusEnum.registered.value)
+        if (await transaction.execute(query)).first() is not None:
+            raise HTTPException(status_code=401,
+                                detail="The account is already registered. Contact technical support")
+        raise HTTPException(status_code=404, detail="Token not found or expired")
     query = select(Users).where(Users.id == existing_token.user_id)
     existing_user = await transaction.execute(query)
     existing_user = existing_user.scalar_one()
-    existing_user.password = encrypt(data.password)
+    existing_user.password = await hash_password(data.password)
+    invalidate_principal(transaction, existing_user.id)
 
     existing_token.status = StatusEnum.registered.value
     return jwt_auth.login(identifier=str(existing_user.email),
                           token_extras={"full_name": existing_user.full_name, "id": str(existing_user.id),
-                                        "roles": [int(role.id) for role in existing_user.roles],
+                                        "roles": sorted(await load_role_ids(transaction, existing_user.id)),
+                                        "role_version": existing_user.role_version,
                                         "email": existing_user.email},
                           send_token_as_response_body=True)
 
@@ -67,10 +59,14 @@ async def get_user_by_email(email: str, session: AsyncSession) -> Users:
 async def login_handler(data: UserLogin, transaction: AsyncSession) -> Response[UserLogin]:
     user = await get_user_by_email(data.email, transaction)
     try:
-        if decrypt(user.password) == data.password:
+        is_valid, new_hash = await verify_password(data.password, user.password)
+        if is_valid:
+            if new_hash:
+                user.password = new_hash
             return jwt_auth.login(identifier=str(user.email),
                                   token_extras={"full_name": user.full_name, "id": str(user.id),
-                                                "roles": [int(role.id) for role in user.roles], "email": user.email},
+                                                "roles": sorted(await load_role_ids(transaction, user.id)),
+                                                "role_version": user.role_version, "email": user.email},
                                   send_token_as_response_body=True)
         else:
             raise HTTPException(status_code=401, detail="Incorrect email or password")
@@ -90,16 +86,8 @@ async def recovery_password_handler(
     if not existing_user:
         raise HTTPException(status_code=404, detail=f"User with email {email} not found")
 
-    token = await unique_token_generator(transaction)
-    tokens = Tokens(
-        id=uuid4(),
-        user_id=existing_user.id,
-        token=token,
-        created_by=existing_user.id,
-        status=0,
-    )
-    transaction.add(tokens)
-    await transaction.flush()
+    await revoke_recovery_tokens(transaction, existing_user.id)
+    token = await issue_token(transaction, existing_user.id, existing_user.id, settings.recovery_token_ttl)
 
     url = str(request.url.scheme) + '://' + str(request.url.netloc) + f'/new_password/{token}'
 
@@ -112,7 +100,7 @@ async def recovery_password_handler(
         </html>
     '''
 
-    await send_message(str(existing_user.email), html_message)
+    await enqueue_message(transaction, str(existing_user.email), html_message)
 
     return Response(status_code=202, content={
         "message": "A link has been sent to the user to recovery the password", "token": token})
@@ -124,18 +112,13 @@ async def new_password_handler(
     new_password: str,
     transaction: AsyncSession
 ) -> Response:
-    query = select(Tokens).where(Tokens.token == token)
-    existing_token = await transaction.execute(query)
-    existing_token = existing_token.scalar_one()
-
-    if not existing_token:
-        raise HTTPException(status_code=404, detail="Token not found")
-
-    if existing_token.status != 0:
-        raise HTTPException(status_code=400, detail="Invalid token")
+    existing_token = await get_active_token(transaction, token)
+    if existing_token is None:
+        raise HTTPException(status_code=404, detail="Token not found or expired")
 
-    query = update(Users).where(Users.id == existing_token.user_id).values(password=encrypt(new_password))
+    query = update(Users).where(Users.id == existing_token.user_id).values(password=await hash_password(new_password))
     await transaction.execute(query)
+    invalidate_principal(transaction, existing_token.user_id)
 
     existing_token.status = 1
     await transaction.flush()
@@ -0,0 +1,8 @@
+from litestar import get, MediaType
+
+from src.metrics import render_metrics
+
+
+@get('/metrics', media_type=MediaType.TEXT, include_in_schema=False)
+async def metrics_handler() -> str:
+    return render_metrics()
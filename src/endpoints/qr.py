@@ -0,0 +1,34 @@
+from uuid import UUID
+
+from litestar import get, Request
+from litestar.exceptions import HTTPException
+from litestar.params import Parameter
+from litestar.response import File
+from sqlalchemy import select
+
+from src.endpoints.requests import StatusEnum
+from src.models.requests import RequestsDto
+from src.qr import QRFormatEnum, get_request_qr, qr_path
+from src.replica import replica_router
+
+_MEDIA_TYPES = {QRFormatEnum.PNG: 'image/png', QRFormatEnum.SVG: 'image/svg+xml'}
+
+
+@get('/qr/{request_id:uuid}')
+async def get_qr_handler(
+        request: Request,
+        request_id: UUID,
+        image_format: QRFormatEnum = Parameter(query='format', default=QRFormatEnum.PNG, required=False),
+) -> File:
+    path = qr_path(request_id, image_format)
+    # Файл есть только у одобренных заявок: отклонение и завершение удаляют его после коммита
+    if not path.exists():
+        query = select(RequestsDto.status).where(RequestsDto.id == request_id)
+        # Сессия только на промахе, с основной базы, и закрывается до отрисовки кода
+        async with replica_router.session() as session:
+            status = (await session.execute(query)).scalar_one_or_none()
+        if status != StatusEnum.ACCEPTED.value:
+            raise HTTPException(status_code=404, detail="QR code not found")
+        url = str(request.url.scheme) + '://' + str(request.url.netloc) + '/requests/' + str(request_id)
+        path = await get_request_qr(request_id, url, image_format)
+    return File(path=path, media_type=_MEDIA_TYPES[image_format], content_disposition_type='inline')
@@ -1,23 +1,42 @@
-import os
+from datetime import datetime
 from enum import Enum
 from typing import Any, List, Optional
 from uuid import UUID, uuid4
 
-import qrcode
+import msgspec
 from litestar import get, post, Request, Response
 from litestar.channels import ChannelsPlugin
 from litestar.controller import Controller
 from litestar.exceptions import HTTPException
+from litestar.pagination import CursorPagination
+from litestar.params import Parameter
+from litestar.response import Stream
 from litestar.security.jwt import Token
-from sqlalchemy import select
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-
-from src.endpoints.roles import RolesEnum, get_roles
+from sqlalchemy.orm import aliased, with_expression
+
+from src.channels.notifications import REVIEW_CHANNEL, SECURITY_CHANNEL, applicant_channel, publish_after_commit
+from src.endpoints.roles import RolesEnum
+from src.etag import etag_matches, make_etag, not_modified, response_cache, tagged_response
+from src.export import ExportFormatEnum, export_query, export_stream
+from src.guards import requires_role, resolve_roles
+from src.models.loaders import REQUEST_DETAIL, REQUEST_REVIEW
 from src.models.requests import RequestsDto, Guests
 from src.models.users import Users
-from src.schemas.requests import RequestsCreate, RequestsReview, Requests, RequestsDelete, GuestsReview
-from src.utils import send_message
+from src.metrics import observe_phase
+from src.outbox import enqueue_message, enqueue_messages
+from src.pagination import KeysetPagination, decode_cursor, encode_cursor
+from src.qr import discard_qr_after_commit
+from src.schedule import schedule_guests_changed, schedule_request_reviewed
+from src.search import name_matches, name_relevance
+from src.settings import settings
+from src.stats import StatsDelta
+from src.schemas.requests import RequestsCreate, RequestsReview, Requests, GuestsReview, GuestsBatchReview
+from src.utils import iter_csv_rows, iter_json_array
+
+_encoder = msgspec.json.Encoder()
 
 
 class StatusEnum(Enum):
@@ -28,65 +47,301 @@ class StatusEnum(Enum):
     COMPLETED = 5
 
 
+class SortEnum(Enum):
+    DATE = 'date'
+    RELEVANCE = 'relevance'
+
+
 class VisitStatusEnum(Enum):
     PENDING = 1
     ENTERED = 2
     EXITED = 3
 
 
+def request_relevance(dialect_name: str, fullname: Optional[str], appellant: Optional[str]):
+    scores = []
+    if fullname:
+        scores.append(
+            select(func.max(name_relevance(Guests.full_name, fullname, dialect_name)))
+            .where(Guests.request_id == RequestsDto.id, name_matches(Guests.full_name, fullname))
+            .scalar_subquery()
+        )
+    if appellant:
+        scores.append(
+            select(name_relevance(Users.full_name, appellant, dialect_name))
+            .where(Users.id == RequestsDto.appellant_id)
+            .scalar_subquery()
+        )
+    return scores[0] if len(scores) == 1 else scores[0] + scores[1]
+
+
 async def list_requests(
         db_session: AsyncSession,
         request: 'Request[Users, Token, Any]',
         status: Optional[StatusEnum] = None,
         fullname: Optional[str] = None,
-        appellant: Optional[str] = None
+        appellant: Optional[str] = None,
+        appellant_id: Optional[UUID] = None,
+        after: Optional[tuple] = None,
+        limit: Optional[int] = None,
+        sort: SortEnum = SortEnum.DATE
 ) -> List[RequestsDto]:
-    async with (db_session as session):
-        query = select(RequestsDto).options(
-            selectinload(RequestsDto.appellant),
-            selectinload(RequestsDto.confirming),
-            selectinload(RequestsDto.appellant), selectinload(RequestsDto.confirming), selectinload(RequestsDto.guests)
-        ).order_by(RequestsDto.datetime.desc())
+    query = select(RequestsDto).options(*REQUEST_DETAIL)
+    sort_key = [RequestsDto.datetime, RequestsDto.id]
+
+    if status:
+        query = query.where(RequestsDto.status == status.value)
+
+    if appellant_id:
+        query = query.where(RequestsDto.appellant_id == appellant_id)
+
+    if fullname:
+        query = query.where(RequestsDto.guests.any(name_matches(Guests.full_name, fullname)))
+
+    if appellant:
+        query = query.where(RequestsDto.appellant.has(name_matches(Users.full_name, appellant)))
 
-        if status:
-            query = query.where(RequestsDto.status == status.value).distinct()
+    if sort == SortEnum.RELEVANCE and (fullname or appellant):
+        relevance = request_relevance(db_session.bind.dialect.name, fullname, appellant)
+        query = query.options(with_expression(RequestsDto.relevance, relevance))
+        sort_key.insert(0, relevance)
 
-        if fullname:
-            query = query.join(Guests, RequestsDto.guests).where(Guests.full_name.like(f'%{fullname}%')).distinct()
+    query = query.order_by(*(column.desc() for column in sort_key))
 
-        if appellant:
-            query = query.join(Users, RequestsDto.appellant).where(Users.full_name
-                                                                   .like(f'%{appellant}%')).distinct()
+    if after:
+        query = query.where(tuple_(*sort_key) < after)
 
-        result = await session.execute(query)
-        return [it for it in result.scalars()]
+    if limit:
+        query = query.limit(limit)
+
+    result = await db_session.execute(query)
+    return [it for it in result.scalars()]
 
 
 async def get_request_by_id(session: AsyncSession, request_id: UUID) -> RequestsDto:
-    async with session as session:
-        statement = select(RequestsDto).filter(RequestsDto.id == request_id).options(
-            selectinload(RequestsDto.appellant), selectinload(RequestsDto.confirming),
-            selectinload(RequestsDto.guests)
-        )
-        result = await session.execute(statement)
-        obj = result.scalar_one_or_none()
-        if not obj:
-            raise HTTPException(status_code=404, detail="Not found")
-        return obj
+    statement = select(RequestsDto).filter(RequestsDto.id == request_id).options(*REQUEST_DETAIL)
+    result = await session.execute(statement)
+    obj = result.scalar_one_or_none()
+    if not obj:
+        raise HTTPException(status_code=404, detail="Not found")
+    return obj
+
+
+def request_etag(request: RequestsDto) -> str:
+    """ETag of the ``Requests`` body: the request and guest versions plus the role versions of the embedded users."""
+    return make_etag(request.version, sum(guest.version for guest in request.guests), request.appellant.role_version,
+                     request.confirming.role_version if request.confirming else 0)
+
+
+async def get_request_etag(session: AsyncSession, request_id: UUID) -> Optional[str]:
+    """The same tag as ``request_etag`` from a single query over version columns, ``None`` if there is no request."""
+    appellant, confirming = aliased(Users), aliased(Users)
+    guests_version = (select(func.coalesce(func.sum(Guests.version), 0))
+                      .where(Guests.request_id == RequestsDto.id)
+                      .scalar_subquery())
+    query = (select(RequestsDto.version, guests_version, appellant.role_version, confirming.role_version)
+             .join(appellant, appellant.id == RequestsDto.appellant_id)
+             .outerjoin(confirming, confirming.id == RequestsDto.confirming_id)
+             .where(RequestsDto.id == request_id))
+    row = (await session.execute(query)).first()
+    if row is None:
+        return None
+    version, guests_version, appellant_roles, confirming_roles = row
+    return make_etag(version, guests_version, appellant_roles, confirming_roles or 0)
+
+
+def guest_rows(data: RequestsCreate, request_id: UUID) -> list[dict[str, Any]]:
+    return [
+        {
+            'id': uuid4(),
+            'request_id': request_id,
+            'full_name': i.full_name,
+            'email': i.email,
+            'phone_number': i.phone_number,
+            'is_foreign': i.is_foreign,
+            'visit_status': VisitStatusEnum.PENDING.value,
+        }
+        for i in data.guests
+    ]
 
 
 async def create_guests(session: AsyncSession, data: RequestsCreate, request_id: UUID):
-    for i in data.guests:
-        statement = Guests(
-            id=uuid4(),
-            request_id=request_id,
-            full_name=i.full_name,
-            email=i.email,
-            phone_number=i.phone_number,
-            is_foreign=i.is_foreign,
-            visit_status=VisitStatusEnum.PENDING.value
-        )
-        session.add(statement)
+    rows = guest_rows(data, request_id)
+    if rows:
+        await session.execute(insert(Guests), rows)
+
+
+def _validation_errors(exc: ValidationError) -> list[dict[str, Any]]:
+    return [{'loc': list(error['loc']), 'msg': error['msg']} for error in exc.errors()]
+
+
+class BulkRequestsWriter:
+    """Collects validated requests and writes them with multi-row inserts every ``settings.bulk_batch_size`` guests."""
+
+    def __init__(self, session: AsyncSession, appellant_id: UUID) -> None:
+        self.session = session
+        self.appellant_id = appellant_id
+        self.created: list[UUID] = []
+        self.guests = 0
+        self.errors: list[dict[str, Any]] = []
+        self.stats = StatsDelta()
+        self._requests: list[dict[str, Any]] = []
+        self._guests: list[dict[str, Any]] = []
+
+    async def add(self, payload: dict[str, Any], rows: list[int]) -> None:
+        """Validate one request; ``rows[i]`` is the input row of its i-th guest, errors are reported against it."""
+        try:
+            data = RequestsCreate.model_validate(payload)
+        except ValidationError as e:
+            for error in _validation_errors(e):
+                loc = error['loc']
+                guest_index = loc[1] if len(loc) > 1 and loc[0] == 'guests' and isinstance(loc[1], int) else 0
+                self.errors.append({'row': rows[min(guest_index, len(rows) - 1)], **error})
+            return
+        request_id = uuid4()
+        self._requests.append({
+            'id': request_id,
+            'visit_purpose': data.visit_purpose,
+            'place_of_visit': data.place_of_visit,
+            'datetime_of_visit': data.datetime_of_visit,
+            'appellant_id': self.appellant_id,
+            'status': StatusEnum.NEW.value,
+            'confirming_id': None,
+        })
+        self._guests.extend(guest_rows(data, request_id))
+        self.stats.add_request(data.datetime_of_visit, StatusEnum.NEW.value,
+                               [VisitStatusEnum.PENDING.value] * len(data.guests))
+        self.created.append(request_id)
+        self.guests += len(data.guests)
+        if len(self._guests) >= settings.bulk_batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self._requests:
+            await self.session.execute(insert(RequestsDto), self._requests)
+        if self._guests:
+            await self.session.execute(insert(Guests), self._guests)
+        await self.stats.apply(self.session)
+        self._requests, self._guests = [], []
+
+    def publish(self, channels: ChannelsPlugin) -> None:
+        # Одно сводное событие на пакет вместо события на каждую заявку
+        if self.created:
+            publish_after_commit(self.session, channels, 'requests_created',
+                                 {'appellant_id': self.appellant_id, 'count': len(self.created)},
+                                 [REVIEW_CHANNEL, applicant_channel(self.appellant_id)])
+
+    def report(self) -> dict[str, Any]:
+        return {'created': len(self.created), 'guests': self.guests, 'request_ids': self.created,
+                'errors': self.errors}
+
+
+async def update_guests_status(
+        session: AsyncSession,
+        guest_ids: List[UUID],
+        status: int,
+        stats: StatsDelta,
+) -> tuple[list[tuple[UUID, UUID, UUID]], list[UUID]]:
+    """Set ``visit_status`` of the guests and complete every touched request whose guests have all exited.
+
+    Returns the updated ``(guest_id, request_id, appellant_id)`` rows and the ids of the requests that were completed,
+    and records the transitions in ``stats``. On PostgreSQL this is a single statement built from data-modifying CTEs.
+    """
+    guests = Guests.__table__
+    requests = RequestsDto.__table__
+
+    def of_request(column):
+        return select(column).where(requests.c.id == guests.c.request_id).scalar_subquery()
+
+    # Заявка читается до завершения: счётчики гостей переносятся из её прежнего статуса
+    returning = (guests.c.id, guests.c.request_id, of_request(requests.c.appellant_id).label('appellant_id'),
+                 of_request(requests.c.status).label('request_status'),
+                 of_request(requests.c.datetime_of_visit).label('datetime_of_visit'))
+    update_guests = (update(guests).where(guests.c.id.in_(guest_ids))
+                     .values(visit_status=status, version=guests.c.version + 1))
+    postgres = session.bind.dialect.name == 'postgresql'
+    if postgres:
+        # FROM видит строки до обновления, так прежний visit_status приходит в том же RETURNING
+        old_guests = guests.alias('old_guests')
+        update_guests = (update_guests.where(old_guests.c.id == guests.c.id)
+                         .returning(*returning, old_guests.c.visit_status.label('old_status')))
+    else:
+        old_statuses = dict((await session.execute(
+            select(guests.c.id, guests.c.visit_status).where(guests.c.id.in_(guest_ids)))).all())
+        update_guests = update_guests.returning(*returning)
+
+    def complete_requests(request_ids):
+        # Все CTE видят один снимок, поэтому только что обновлённые гости исключаются явно
+        not_exited = (select(guests.c.id)
+                      .where(guests.c.request_id == requests.c.id,
+                             guests.c.id.not_in(guest_ids),
+                             guests.c.visit_status != VisitStatusEnum.EXITED.value)
+                      .exists())
+        return (update(requests)
+                .where(requests.c.id.in_(request_ids), requests.c.status != StatusEnum.COMPLETED.value, ~not_exited)
+                .values(status=StatusEnum.COMPLETED.value, version=requests.c.version + 1)
+                .returning(requests.c.id))
+
+    def guests_count(request_id):
+        return select(func.count()).where(guests.c.request_id == request_id).scalar_subquery()
+
+    def record(updated, completed):
+        visits = {}
+        for row in updated:
+            old_status = row.old_status if postgres else old_statuses[row.id]
+            stats.move_guest(row.datetime_of_visit, row.request_status, old_status, status)
+            visits[row.request_id] = row
+        for request_id, guests_count in completed:
+            row = visits[request_id]
+            stats.move_request(row.datetime_of_visit, row.request_status, StatusEnum.COMPLETED.value,
+                               [VisitStatusEnum.EXITED.value] * guests_count)
+        return [tuple(row[:3]) for row in updated], [request_id for request_id, _ in completed]
+
+    if status != VisitStatusEnum.EXITED.value:
+        return record((await session.execute(update_guests)).all(), [])
+
+    if postgres:
+        updated_cte = update_guests.cte('updated_guests')
+        completed_cte = complete_requests(select(updated_cte.c.request_id)).cte('completed_requests')
+        query = (select(updated_cte, completed_cte.c.id.label('completed_id'),
+                        guests_count(completed_cte.c.id).label('guests'))
+                 .select_from(updated_cte.outerjoin(completed_cte, completed_cte.c.id == updated_cte.c.request_id)))
+        rows = (await session.execute(query)).all()
+        completed = {row.completed_id: row.guests for row in rows if row.completed_id is not None}
+        return record(rows, list(completed.items()))
+
+    updated = (await session.execute(update_guests)).all()
+    if not updated:
+        return [], []
+    completed = list((await session.execute(complete_requests({row.request_id for row in updated}))).scalars())
+    if completed:
+        # В RETURNING SQLite не различает одноимённые столбцы подзапроса, поэтому гости считаются отдельно
+        completed = (await session.execute(
+            select(guests.c.request_id, func.count()).where(guests.c.request_id.in_(completed))
+            .group_by(guests.c.request_id))).all()
+    return record(updated, completed)
+
+
+def publish_guests_status(
+        session: AsyncSession,
+        channels: ChannelsPlugin,
+        updated: list[tuple[UUID, UUID, UUID]],
+        completed: list[UUID],
+        status: int
+) -> None:
+    """Publish one ``guests_status_changed`` event per touched request to the security desk and its applicant."""
+    by_request: dict[UUID, tuple[UUID, list[UUID]]] = {}
+    for guest_id, request_id, appellant_id in updated:
+        by_request.setdefault(request_id, (appellant_id, []))[1].append(guest_id)
+    for request_id, (appellant_id, guest_ids) in by_request.items():
+        publish_after_commit(session, channels, 'guests_status_changed',
+                             {'request_id': request_id, 'guest_ids': guest_ids, 'visit_status': status,
+                              'request_completed': request_id in completed},
+                             [SECURITY_CHANNEL, applicant_channel(appellant_id)])
+
+
+_CSV_REQUEST_FIELDS = ('visit_purpose', 'place_of_visit', 'datetime_of_visit')
+_CSV_GUEST_FIELDS = ('full_name', 'email', 'phone_number', 'is_foreign')
 
 
 class RequestsController(Controller):
@@ -94,39 +349,91 @@ class RequestsController(Controller):
     @get(path="/requests")
     async def get_list_requests(
             self,
-            transaction: AsyncSession,
+            read_session: AsyncSession,
             request: 'Request[Users, Token, Any]',
+            keyset: KeysetPagination,
             status: Optional[StatusEnum] = None,
             full_name: Optional[str] = None,
-            appellant: Optional[str] = None
-    ) -> List[Requests]:
-        if len(request.user.roles) == 1 and RolesEnum.employee.value in await get_roles(transaction, request.user.id):
-            requests = await list_requests(
-                transaction,
-                request,
-                status=status,
-                fullname=full_name,
-                appellant=request.user.full_name
-            )
+            appellant: Optional[str] = None,
+            sort: SortEnum = SortEnum.DATE
+    ) -> CursorPagination[str, Requests]:
+        if await resolve_roles(request) == {RolesEnum.employee.value}:
+            filters = {'appellant_id': request.user.id}
         else:
-            requests = await list_requests(
-                transaction,
-                request,
-                status=status,
-                fullname=full_name,
-                appellant=appellant
-            )
+            filters = {'appellant': appellant}
+        if sort == SortEnum.RELEVANCE and not (full_name or filters.get('appellant')):
+            sort = SortEnum.DATE
+
+        cursor_types = (float, datetime, UUID) if sort == SortEnum.RELEVANCE else (datetime, UUID)
+        after = decode_cursor(keyset.cursor, *cursor_types) if keyset.cursor else None
+        requests = await list_requests(
+            read_session,
+            request,
+            status=status,
+            fullname=full_name,
+            after=after,
+            limit=keyset.limit + 1,
+            sort=sort,
+            **filters
+        )
+        # Связи загружены заранее, соединение возвращается в пул до сериализации
+        await read_session.close()
+
+        page = requests[:keyset.limit]
+        cursor = None
+        if len(requests) > keyset.limit:
+            last = page[-1]
+            key = (last.relevance, last.datetime, last.id) if sort == SortEnum.RELEVANCE else (last.datetime, last.id)
+            cursor = encode_cursor(*key)
+        with observe_phase('serialize'):
+            items = [Requests.from_orm(req) for req in page]
+        return CursorPagination[str, Requests](
+            items=items,
+            results_per_page=keyset.limit,
+            cursor=cursor,
+        )
 
-        return [Requests.from_orm(req) for req in requests]
+    @get(path="/requests/export", guards=[requires_role(RolesEnum.admin, RolesEnum.confirming)])
+    async def export_requests(
+            self,
+            export_format: ExportFormatEnum = Parameter(query='format', default=ExportFormatEnum.NDJSON,
+                                                        required=False),
+            date_from: Optional[datetime] = Parameter(query='from', default=None, required=False),
+            date_to: Optional[datetime] = Parameter(query='to', default=None, required=False),
+            status: Optional[StatusEnum] = None,
+    ) -> Stream:
+        """Requests visiting in ``[from, to)``, streamed in visit order without loading the history into memory."""
+        query = export_query(date_from, date_to, status.value if status else None)
+        if export_format == ExportFormatEnum.CSV:
+            media_type = 'text/csv'
+        else:
+            media_type = 'application/x-ndjson'
+        return Stream(export_stream(export_format, query), media_type=media_type,
+                      headers={'Content-Disposition': f'attachment; filename="requests.{export_format.value}"'})
 
     @get(path="/requests/{request_id:uuid}")
     async def get_request_id(
             self,
-            transaction: AsyncSession,
+            request: Request,
+            read_session: AsyncSession,
             request_id: UUID,
-    ) -> Requests:
-        request = await get_request_by_id(transaction, request_id)
-        return Requests.from_orm(request)
+    ) -> Response[bytes]:
+        """Conditional GET: 304 for a current ``If-None-Match``, otherwise the body from the response cache."""
+        etag = await get_request_etag(read_session, request_id)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        content = response_cache.get((request_id, etag))
+        if content is None:
+            obj = await get_request_by_id(read_session, request_id)
+            await read_session.close()
+            # Тег заново по загруженной заявке: между запросами она могла измениться
+            etag = request_etag(obj)
+            with observe_phase('serialize'):
+                content = _encoder.encode(Requests.from_orm(obj))
+            response_cache.set((request_id, etag), content)
+        return tagged_response(content, etag)
 
     @post(path="/requests/create")
     async def create_request(
@@ -148,15 +455,60 @@ class RequestsController(Controller):
         transaction.add(statement)
 
         await create_guests(transaction, data, statement.id)
-
-        # applicant_channel = f"applicant_{statement.appellant_id}"
-        # await channels.subscribe(applicant_channel)
-        #
-        # channels.publish({'message': 'New request created, waiting for confirmation'}, 'sec')
+        stats = StatsDelta()
+        stats.add_request(statement.datetime_of_visit, statement.status,
+                          [VisitStatusEnum.PENDING.value] * len(data.guests))
+        await stats.apply(transaction)
+
+        publish_after_commit(transaction, channels, 'request_created',
+                             {'request_id': statement.id, 'appellant_id': statement.appellant_id,
+                              'status': statement.status, 'datetime_of_visit': statement.datetime_of_visit},
+                             [REVIEW_CHANNEL, applicant_channel(statement.appellant_id)])
         return Response(status_code=202,
                         content={"message": "Request sent to review", "appellant_id": statement.appellant_id})
 
-    @post(path="/requests/review")
+    @post(path="/requests/bulk")
+    async def create_requests_bulk(
+            self,
+            request: Request[Users, Token, Any],
+            transaction: AsyncSession,
+            channels: ChannelsPlugin,
+    ) -> Response:
+        """A JSON array of ``RequestsCreate`` bodies, parsed from the stream item by item."""
+        writer = BulkRequestsWriter(transaction, request.user.id)
+        async for index, payload in iter_json_array(request.stream()):
+            await writer.add(payload, [index])
+        await writer.flush()
+        writer.publish(channels)
+        return Response(status_code=202, content=writer.report())
+
+    @post(path="/requests/bulk/csv")
+    async def create_requests_csv(
+            self,
+            request: Request[Users, Token, Any],
+            transaction: AsyncSession,
+            channels: ChannelsPlugin,
+    ) -> Response:
+        """Consecutive rows sharing a non-empty ``request`` column form one request; other rows stand alone."""
+        writer = BulkRequestsWriter(transaction, request.user.id)
+        key, payload, rows = None, None, []
+        async for row_number, row in iter_csv_rows(request.stream()):
+            row_key = row.get('request') or None
+            if payload is None or row_key is None or row_key != key:
+                if payload is not None:
+                    await writer.add(payload, rows)
+                key, rows = row_key, []
+                payload = {field: row.get(field) for field in _CSV_REQUEST_FIELDS}
+                payload['guests'] = []
+            payload['guests'].append({field: row.get(field) for field in _CSV_GUEST_FIELDS})
+            rows.append(row_number)
+        if payload is not None:
+            await writer.add(payload, rows)
+        await writer.flush()
+        writer.publish(channels)
+        return Response(status_code=202, content=writer.report())
+
+    @post(path="/requests/review", guards=[requires_role(RolesEnum.confirming)])
     async def request_review(
             self,
             request: Request[Users, Token, Any],
@@ -164,29 +516,20 @@ class RequestsController(Controller):
             data: RequestsReview,
             channels: ChannelsPlugin
     ) -> Response:
-        if RolesEnum.confirming.value not in await get_roles(transaction, request.user.id):
-            raise HTTPException(status_code=403, detail="Forbidden")
-        statement = select(RequestsDto).where(RequestsDto.id == data.request_id)
+        statement = select(RequestsDto).where(RequestsDto.id == data.request_id).options(*REQUEST_REVIEW)
         result = await transaction.execute(statement)
         result = result.scalar_one_or_none()
         if not result:
             raise HTTPException(status_code=404, detail="Request not found")
+        stats = StatsDelta()
+        stats.move_request(result.datetime_of_visit, result.status, data.status,
+                           [guest.visit_status for guest in result.guests])
         result.status = data.status
         result.confirming_id = request.user.id
+        result.version = RequestsDto.version + 1
 
         if data.status == StatusEnum.ACCEPTED.value:
-            url = str(request.url.scheme) + '://' + str(request.url.netloc) + '/requests/' + str(data.request_id)
-            qr_code_image = qrcode.make(url)
-            if not os.path.isdir('qr'):
-                os.mkdir('qr')
-            if not os.path.isdir(f'qr/{result.datetime_of_visit.date()}'):
-                os.mkdir(f'qr/{result.datetime_of_visit.date()}')
-            path = f'qr/{result.datetime_of_visit.date()}/{data.request_id}.png'
-            qr_code_image.save(path)
-
-            message = f'''{result.appellant.full_name} назначил вам встречу.\nМесто встречи: {result.place_of_visit}.\nВремя встречи: {result.datetime_of_visit.date()} {result.datetime_of_visit.hour}:{result.datetime_of_visit.minute}.\nПредъявите данный qr-код охране при входе.'''
-            message = message.split('\n')
-            src = f"{str(request.url.scheme)}://{str(request.url.netloc)}/static/{path[3:]}"
+            src = f"{str(request.url.scheme)}://{str(request.url.netloc)}/qr/{data.request_id}"
             html_message = f'''
                 <html lang="ru">
                 <head>
@@ -196,19 +539,20 @@ class RequestsController(Controller):
                     <link href="<%= BASE_URL %>favicon.ico" rel="icon">
                     <title><%= htmlWebpackPlugin.options.title %></title>
                 </head>
-                <body style="background-color: blue; font-family: 'Inter', sans-serif; justify-content: center; display: flex; padding-top: 50px; padding-bottom: 50px">
-                <div style="text-align:center;background-color:white;width:700px;border-radius:11px;margin:auto;padding-bottom: 22px;padding-top: 22px;">
+                <body style="background-color: blue; font-family: 'Inter', sans-serif; justify-content: center;
+                             display: flex; padding-top: 50px; padding-bottom: 50px">
+                <div style="text-align:center;background-color:white;width:700px;border-radius:11px;margin:auto;
+                            padding-bottom: 22px;padding-top: 22px;">
                     <h1>{result.appellant.full_name} назначил вам встречу</h1>
                     <h2>Место встречи: {result.place_of_visit}</h2>
-                    <h2>Время встречи: {result.datetime_of_visit.date()} {result.datetime_of_visit.hour}:{result.datetime_of_visit.minute}</h2>
+                    <h2>Время встречи: {result.datetime_of_visit.date()}
+                        {result.datetime_of_visit.hour}:{result.datetime_of_visit.minute}</h2>
                     <h2>Предъявите QR-код при входе</h2>
                     <img alt="hh" src={src}>
                 </div>
                 </body>
             '''
-            print(html_message)
-            for guest in result.guests:
-                await send_message(guest.email, html_message)
+            messages = [(guest.email, html_message) for guest in result.guests]
 
             html_message = f'''
             <html>
@@ -217,8 +561,10 @@ class RequestsController(Controller):
                 </body>
             </html>
             '''
-            await send_message(result.appellant.email, html_message)
+            messages.append((result.appellant.email, html_message))
+            await enqueue_messages(transaction, messages)
         else:
+            discard_qr_after_commit(transaction, [result.id])
             html_message = f'''
                         <html>
                             <body>
@@ -226,38 +572,55 @@ class RequestsController(Controller):
                             </body>
                         </html>
                         '''
-            await send_message(result.appellant.email, html_message)
+            await enqueue_message(transaction, result.appellant.email, html_message)
 
-        # channels.publish({'message': 'Your request has been reviewed'}, 'applicant')
+        schedule_request_reviewed(transaction, result)
+        targets = [REVIEW_CHANNEL, applicant_channel(result.appellant_id)]
+        if data.status == StatusEnum.ACCEPTED.value:
+            targets.append(SECURITY_CHANNEL)
+        publish_after_commit(transaction, channels, 'request_reviewed',
+                             {'request_id': result.id, 'appellant_id': result.appellant_id, 'status': data.status},
+                             targets)
+        await stats.apply(transaction)
         return Response(status_code=202,
                         content={"message": "Request reviewed successfully", "appellant_id": result.appellant_id})
 
-    @post(path='/requests/guests/actions')
+    @post(path='/requests/guests/actions', guards=[requires_role(RolesEnum.security)])
     async def request_guests_actions(
             self,
             request: Request[Users, Token, Any],
             transaction: AsyncSession,
             data: GuestsReview,
+            channels: ChannelsPlugin,
     ) -> Response:
-        if RolesEnum.security.value not in await get_roles(transaction, request.user.id):
-            raise HTTPException(status_code=403, detail="Forbidden")
-        statement = select(Guests).where(Guests.id == data.guest_id)
-        result = await transaction.execute(statement)
-        result = result.scalar_one_or_none()
-        if result is None:
+        stats = StatsDelta()
+        updated, completed = await update_guests_status(transaction, [data.guest_id], data.status, stats)
+        if not updated:
             raise HTTPException(status_code=404, detail="Guest not found")
-        result.visit_status = data.status
-
-        request_id = result.request_id
-        statement = select(Guests).where(Guests.request_id == request_id)
-        result = await transaction.execute(statement)
-        result = result.scalars().all()
-
-        if all(guest.visit_status == VisitStatusEnum.EXITED.value for guest in result):
-            statement = select(RequestsDto).where(RequestsDto.id == request_id)
-            result = await transaction.execute(statement)
-            result = result.scalar_one_or_none()
-            if result is None:
-                raise HTTPException(status_code=404, detail="Request not found")
-            result.status = StatusEnum.COMPLETED.value
+        await stats.apply(transaction)
+        publish_guests_status(transaction, channels, updated, completed, data.status)
+        schedule_guests_changed(transaction, updated, completed, data.status)
+        discard_qr_after_commit(transaction, completed)
         return Response(status_code=202, content={'message': 'Guest reviewed successfully'})
+
+    @post(path='/requests/guests/actions/batch', guards=[requires_role(RolesEnum.security)])
+    async def request_guests_actions_batch(
+            self,
+            request: Request[Users, Token, Any],
+            transaction: AsyncSession,
+            data: GuestsBatchReview,
+            channels: ChannelsPlugin,
+    ) -> Response:
+        guest_ids = list(dict.fromkeys(data.guest_ids))
+        stats = StatsDelta()
+        updated, completed = await update_guests_status(transaction, guest_ids, data.status, stats)
+        await stats.apply(transaction)
+        publish_guests_status(transaction, channels, updated, completed, data.status)
+        schedule_guests_changed(transaction, updated, completed, data.status)
+        discard_qr_after_commit(transaction, completed)
+        updated_ids = {guest_id for guest_id, _, _ in updated}
+        return Response(status_code=202, content={
+            'updated': [guest_id for guest_id in guest_ids if guest_id in updated_ids],
+            'not_found': [guest_id for guest_id in guest_ids if guest_id not in updated_ids],
+            'completed_requests': completed,
+        })
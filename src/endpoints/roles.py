@@ -5,11 +5,17 @@ from uuid import UUID
 from litestar import post, Response, Request
 from litestar.exceptions import HTTPException
 from litestar.security.jwt import Token
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.auth import invalidate_principal
+from src.cache import TTLCache
+from src.guards import requires_role
+from src.metrics import register_cache
 from src.models.users import UserRoles, Users
 from src.schemas.roles import AssignRole
+from src.settings import settings
+from src.transactions import on_commit
 
 
 class RolesEnum(Enum):
@@ -19,48 +25,59 @@ class RolesEnum(Enum):
     admin = 4
 
 
-async def get_roles(session: AsyncSession, user_id: UUID) -> [int]:
-    result = []
-    query = select(UserRoles).where(UserRoles.user_id == user_id)
-    existing_user = await session.execute(query)
-    existing_user = existing_user.scalars().all()
-    for user in existing_user:
-        result.append(user.role_id)
-    return result
+# Число пользователей по фильтру роли (None - без фильтра) для totals в GET /users
+users_count_cache: TTLCache[int | None, int] = TTLCache(maxsize=len(RolesEnum) + 1, ttl=settings.users_count_ttl)
+register_cache('users_count', users_count_cache)
 
 
-@post('/role/assign')
+def invalidate_users_count(session: AsyncSession) -> None:
+    # После коммита: иначе параллельный GET /users успеет закэшировать старое число
+    on_commit(session, users_count_cache.clear)
+
+
+async def has_role(session: AsyncSession, user_id: UUID, role_id: int) -> bool:
+    query = select(UserRoles.id).where(UserRoles.user_id == user_id, UserRoles.role_id == role_id).limit(1)
+    result = await session.execute(query)
+    return result.scalar_one_or_none() is not None
+
+
+async def bump_role_version(session: AsyncSession, user_id: UUID) -> None:
+    query = update(Users).where(Users.id == user_id).values(role_version=Users.role_version + 1)
+    await session.execute(query)
+    invalidate_principal(session, user_id)
+    invalidate_users_count(session)
+
+
+@post('/role/assign', guards=[requires_role(RolesEnum.admin)])
 async def assign_role_handler(
         request: "Request[Users, Token, Any]",
         data: AssignRole,
         transaction: AsyncSession
 ) -> Any:
-    if RolesEnum.admin.value not in await get_roles(transaction, request.user.id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if data.role_id in await get_roles(transaction, data.user_id):
+    if await has_role(transaction, data.user_id, data.role_id):
         raise HTTPException(status_code=403, detail="User already has this role")
     user_item = UserRoles(
         user_id=data.user_id,
         role_id=data.role_id,
     )
     transaction.add(user_item)
+    await bump_role_version(transaction, data.user_id)
     # if RolesEnum.confirming.value == data.role_id:
     # channels_plugin.subscribe('sec', user_id=data.user_id)
     return Response(status_code=202, content={"message": "Role added successfully"})
 
 
-@post('/role/remove')
+@post('/role/remove', guards=[requires_role(RolesEnum.admin)])
 async def remove_role_handler(
         request: "Request[Users, Token, Any]",
         data: AssignRole,
         transaction: AsyncSession
 ) -> Any:
-    if RolesEnum.admin.value not in await get_roles(transaction, request.user.id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if data.role_id not in await get_roles(transaction, data.user_id):
+    if not await has_role(transaction, data.user_id, data.role_id):
         raise HTTPException(status_code=403, detail="User does not have this role")
     if data.user_id == request.user.id:
         raise HTTPException(status_code=403, detail="You can't delete your roles")
-    rem = delete(UserRoles).where(UserRoles.user_id == data.user_id and UserRoles.role_id == data.role_id)
+    rem = delete(UserRoles).where(UserRoles.user_id == data.user_id, UserRoles.role_id == data.role_id)
     await transaction.execute(rem)
+    await bump_role_version(transaction, data.user_id)
     return Response(status_code=200, content={"message": "Role removed"})
@@ -0,0 +1,18 @@
+from datetime import date
+from typing import Optional
+
+from litestar import MediaType, Response, get
+from litestar.params import Parameter
+
+from src.endpoints.roles import RolesEnum
+from src.guards import requires_role
+from src.schedule import day_schedule, today
+
+
+@get('/schedule', guards=[requires_role(RolesEnum.security)])
+async def get_schedule_handler(
+        day: Optional[date] = Parameter(query='day', default=None, required=False),
+) -> Response[bytes]:
+    """Accepted requests visiting on ``day`` (today in ``settings.schedule_timezone`` by default) with their guests."""
+    content = await day_schedule.get(day or today())
+    return Response(content=content, media_type=MediaType.JSON)
@@ -0,0 +1,21 @@
+from datetime import date
+from typing import Optional
+
+from litestar import get
+from litestar.params import Parameter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.endpoints.roles import RolesEnum
+from src.guards import requires_role
+from src.schedule import today
+from src.schemas.stats import DayStats
+from src.stats import day_stats
+
+
+@get('/stats', guards=[requires_role(RolesEnum.admin, RolesEnum.security)])
+async def get_stats_handler(
+        read_session: AsyncSession,
+        day: Optional[date] = Parameter(query='day', default=None, required=False),
+) -> DayStats:
+    """Requests per status, guests inside and arrivals still expected on ``day``, from the maintained counters."""
+    return await day_stats(read_session, day or today())
@@ -1,24 +1,46 @@
+from datetime import datetime, timedelta, timezone
 from typing import Any, List, Optional
 from uuid import uuid4, UUID
 
+import msgspec
 from advanced_alchemy.filters import LimitOffset
 from litestar import post, Request, Response, get
 from litestar.exceptions import HTTPException
-from litestar.pagination import OffsetPagination
+from litestar.params import Parameter
 from litestar.security.jwt import Token
-from sqlalchemy import select
+from pydantic import ValidationError
+from sqlalchemy import Select, func, insert, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from src.endpoints.roles import RolesEnum, get_roles
-from src.models.users import Users, UserRoles, Tokens
+from src.endpoints.roles import RolesEnum, invalidate_users_count, users_count_cache
+from src.etag import etag_matches, make_etag, not_modified, response_cache, tagged_response
+from src.guards import requires_role
+from src.metrics import observe_phase
+from src.models.loaders import USER_WITH_ROLES
+from src.models.users import Tokens, Users, UserRoles
+from src.pagination import OffsetCursorPagination, decode_cursor, encode_cursor
 from src.schemas.auth import CreateUser
 from src.schemas.requests import UserSerialize
-from src.utils import unique_token_generator, send_message
-from src.auth import encrypt
+from src.outbox import enqueue_message, enqueue_messages
+from src.settings import settings
+from src.utils import generate_token, issue_token, iter_csv_rows
 
+_encoder = msgspec.json.Encoder()
 
-@post('users/create')
+
+def invitation_message(token: str) -> str:
+    url = 'http://89.204.58.149/register/' + str(token)
+    message = f'Вы были зарегестрированы в системе "Допуск на ТИУ третьих лиц". Перейдите по ссылке чтобы завершить регистрацию: {url}'
+    return f'''
+            <html>
+                <body>
+                    <p>{message}</p>
+                </body>
+            </html>
+            '''
+
+
+@post('users/create', guards=[requires_role(RolesEnum.admin)])
 async def create_user_handler(
         request: 'Request[Users, Token, Any]',
         data: CreateUser,
@@ -28,9 +50,6 @@ async def create_user_handler(
     existing_user = await transaction.execute(query)
     existing_user = existing_user.scalar_one_or_none()
 
-    if RolesEnum.admin.value not in await get_roles(transaction, request.user.id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-
     if existing_user:
         raise HTTPException(status_code=409, detail="A user with this email already exists")
 
@@ -50,57 +69,168 @@ async def create_user_handler(
         )
         transaction.add(user_roles)
     await transaction.flush()
+    invalidate_users_count(transaction)
 
-    token = await unique_token_generator(transaction)
-    tokens = Tokens(
-        id=uuid4(),
-        user_id=user.id,
-        token=token,
-        created_by=request.user.id,
-        status=0,
-    )
-    transaction.add(tokens)
-
-    url = 'http://89.204.58.149/register/' + str(token)
-
-    message = f'Вы были зарегестрированы в системе "Допуск на ТИУ третьих лиц". Перейдите по ссылке чтобы завершить регистрацию: {url}'
-    html_message = f'''
-            <html>
-                <body>
-                    <p>{message}</p>
-                </body>
-            </html>
-            '''
-
-    await send_message(str(user.email), html_message)
+    token = await issue_token(transaction, user.id, request.user.id, settings.registration_token_ttl)
+    await enqueue_message(transaction, str(user.email), invitation_message(token))
 
     return Response(status_code=202,
                     content={"message": "A link has been sent to the user to complete the registration",
                              'token': token})
 
 
+def parse_roles(value: str) -> list[int]:
+    """``"employee; security"`` or ``"1;2"`` -> role ids; unknown roles raise ValueError."""
+    roles = []
+    for item in value.replace(',', ';').split(';'):
+        item = item.strip()
+        if item:
+            roles.append(RolesEnum(int(item)).value if item.isdigit() else RolesEnum[item].value)
+    return roles
+
+
+class BulkUsersWriter:
+    """Creates users from validated rows every ``settings.bulk_batch_size`` rows with multi-row inserts.
+
+    Emails already in the database are found with one ``IN`` query per batch; invitation tokens come from the
+    CSPRNG, a collision would fail the transaction on the unique constraint.
+    """
+
+    def __init__(self, session: AsyncSession, created_by: UUID) -> None:
+        self.session = session
+        self.created_by = created_by
+        self.rows: list[dict[str, Any]] = []
+        self._seen: set[str] = set()
+        self._pending: list[tuple[dict[str, Any], CreateUser]] = []
+
+    async def add(self, row_number: int, row: dict[str, str]) -> None:
+        report = {'row': row_number, 'email': row.get('email'), 'status': 'invalid'}
+        self.rows.append(report)
+        try:
+            data = CreateUser(full_name=row.get('full_name'), email=row.get('email'),
+                              roles=parse_roles(row.get('roles') or ''))
+        except ValidationError as e:
+            report['errors'] = [{'loc': list(error['loc']), 'msg': error['msg']} for error in e.errors()]
+            return
+        except (KeyError, ValueError):
+            report['errors'] = [{'loc': ['roles'], 'msg': f"Unknown role in {row.get('roles')!r}"}]
+            return
+        report['email'] = data.email
+        if data.email in self._seen:
+            report['status'] = 'duplicate'
+            return
+        self._seen.add(data.email)
+        self._pending.append((report, data))
+        if len(self._pending) >= settings.bulk_batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        query = select(Users.email).where(Users.email.in_([data.email for _, data in pending]))
+        existing = set((await self.session.execute(query)).scalars())
+
+        users, roles, tokens, messages = [], [], [], []
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.registration_token_ttl)
+        for report, data in pending:
+            if data.email in existing:
+                report['status'] = 'exists'
+                continue
+            user_id, token = uuid4(), generate_token()
+            users.append({'id': user_id, 'full_name': data.full_name, 'email': data.email, 'password': None})
+            roles.extend({'user_id': user_id, 'role_id': role} for role in data.roles)
+            tokens.append({'id': uuid4(), 'user_id': user_id, 'token': token, 'created_by': self.created_by,
+                           'status': 0, 'expires_at': expires_at})
+            messages.append((data.email, invitation_message(token)))
+            report.update(status='created', user_id=user_id)
+        if users:
+            await self.session.execute(insert(Users), users)
+            if roles:
+                await self.session.execute(insert(UserRoles), roles)
+            await self.session.execute(insert(Tokens), tokens)
+            await enqueue_messages(self.session, messages)
+
+    def report(self) -> dict[str, Any]:
+        created = sum(1 for row in self.rows if row['status'] == 'created')
+        return {'created': created, 'skipped': len(self.rows) - created, 'rows': self.rows}
+
+
+@post('/users/bulk/csv', guards=[requires_role(RolesEnum.admin)])
+async def create_users_csv_handler(
+        request: 'Request[Users, Token, Any]',
+        transaction: AsyncSession,
+) -> Response:
+    """CSV with ``full_name``, ``email`` and ``roles`` (names or ids separated by ``;``) columns.
+
+    Everything is written in the request transaction; rows that are invalid, repeat an earlier email or match an
+    existing user are skipped and reported.
+    """
+    writer = BulkUsersWriter(transaction, request.user.id)
+    async for row_number, row in iter_csv_rows(request.stream()):
+        await writer.add(row_number, row)
+    await writer.flush()
+    report = writer.report()
+    if report['created']:
+        invalidate_users_count(transaction)
+    return Response(status_code=202, content=report)
+
+
+def users_query(role: Optional[RolesEnum] = None) -> Select:
+    query = select(Users)
+    if role:
+        # EXISTS по индексу user_roles(role_id, user_id) вместо join + DISTINCT
+        query = query.where(
+            select(UserRoles.id).where(UserRoles.user_id == Users.id, UserRoles.role_id == role.value).exists()
+        )
+    return query
+
+
+async def count_users(session: AsyncSession, role: Optional[RolesEnum] = None) -> int:
+    key = role.value if role else None
+    total = users_count_cache.get(key)
+    if total is None:
+        result = await session.execute(users_query(role).with_only_columns(func.count()))
+        total = result.scalar_one()
+        users_count_cache.set(key, total)
+    return total
+
+
 async def list_users(
         session: AsyncSession,
         role: Optional[RolesEnum] = None,
         limit: int = 10,
-        offset: int = 0
-) -> List[Users]:
-    query = select(Users).options(selectinload(Users.roles)).order_by(Users.created_at.desc())
+        offset: int = 0,
+        after: Optional[tuple] = None
+) -> tuple[List[Users], int]:
+    """Return up to ``limit + 1`` users newest first, and the total number of users matching ``role``.
 
-    if role:
-        query = query.join(UserRoles, Users.id == UserRoles.user_id).where(
-            UserRoles.role_id == role.value
-        ).distinct()
+    The total comes from a cache with a ``settings.users_count_ttl`` freshness bound; on a miss the first page
+    computes it with a window count in the same query instead of a separate scan.
+    """
+    total = users_count_cache.get(role.value if role else None)
+    query = users_query(role).options(*USER_WITH_ROLES).order_by(Users.created_at.desc(), Users.id.desc())
+    windowed = total is None and after is None
+    if windowed:
+        query = query.add_columns(func.count().over())
+
+    if after:
+        query = query.where(tuple_(Users.created_at, Users.id) < after)
+    else:
+        query = query.offset(offset)
 
-    query = query.offset(offset).limit(limit)
-    result = await session.execute(query)
-    return [it for it in result.scalars()]
+    rows = (await session.execute(query.limit(limit + 1))).all()
+    users = [row[0] for row in rows]
+    if windowed and rows:
+        total = rows[0][1]
+        users_count_cache.set(role.value if role else None, total)
+    elif total is None:
+        total = await count_users(session, role)
+    return users, total
 
 
 async def get_user_by_id(session: AsyncSession, user_id: UUID) -> Users:
-    statement = select(Users).filter(Users.id == user_id).options(
-        selectinload(Users.roles)
-    )
+    statement = select(Users).filter(Users.id == user_id).options(*USER_WITH_ROLES)
     result = await session.execute(statement)
     obj = result.scalar_one_or_none()
     if not obj:
@@ -108,28 +238,55 @@ async def get_user_by_id(session: AsyncSession, user_id: UUID) -> Users:
     return obj
 
 
+def user_etag(role_version: int, updated_at: Optional[datetime]) -> str:
+    # Роли в ответе меняются только вместе с role_version, остальные поля - вместе с updated_at
+    return make_etag(role_version, int(updated_at.timestamp() * 1_000_000) if updated_at else 0)
+
+
 @get(path='/users')
 async def get_list_users(
-        transaction: AsyncSession,
+        read_session: AsyncSession,
         limit_offset: LimitOffset,
-        role: Optional[RolesEnum]
-) -> OffsetPagination[UserSerialize]:
-    users = await list_users(transaction, role, limit_offset.limit, limit_offset.offset)
-    pydantic_users = [UserSerialize.from_orm(usr) for usr in users]
-    total = len(pydantic_users)
-    return OffsetPagination[UserSerialize](
-        items=pydantic_users,
+        role: Optional[RolesEnum],
+        cursor: Optional[str] = Parameter(query='cursor', default=None, required=False),
+) -> OffsetCursorPagination[UserSerialize]:
+    after = decode_cursor(cursor, datetime, UUID) if cursor else None
+    users, total = await list_users(read_session, role, limit_offset.limit, limit_offset.offset, after)
+    # Роли загружены заранее, соединение возвращается в пул до сериализации
+    await read_session.close()
+    page = users[:limit_offset.limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(users) > limit_offset.limit else None
+    with observe_phase('serialize'):
+        items = [UserSerialize.from_orm(usr) for usr in page]
+    return OffsetCursorPagination[UserSerialize](
+        items=items,
         total=total,
         limit=limit_offset.limit,
         offset=limit_offset.offset,
+        cursor=next_cursor,
     )
 
 
 @get(path="/users/{user_id:uuid}")
 async def get_user_id(
-        transaction: AsyncSession,
+        request: Request,
+        read_session: AsyncSession,
         user_id: UUID,
-) -> UserSerialize:
-    request = await get_user_by_id(transaction, user_id)
-    return UserSerialize.from_orm(request)
+) -> Response[bytes]:
+    """Conditional GET, as for ``GET /requests/{request_id}``."""
+    row = (await read_session.execute(select(Users.role_version, Users.updated_at).where(Users.id == user_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    etag = user_etag(*row)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    content = response_cache.get((user_id, etag))
+    if content is None:
+        user = await get_user_by_id(read_session, user_id)
+        await read_session.close()
+        etag = user_etag(user.role_version, user.updated_at)
+        with observe_phase('serialize'):
+            content = _encoder.encode(UserSerialize.from_orm(user))
+        response_cache.set((user_id, etag), content)
+    return tagged_response(content, etag)
 
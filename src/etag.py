@@ -0,0 +1,43 @@
+"""Strong ETags and conditional GET for the detail endpoints.
+
+A tag is built from version counters that every write to the represented rows increments, so a client holding the
+current tag gets a 304 after one small query. Encoded bodies are cached per ``(id, tag)``; a changed row gets a new
+tag, and its old entry is never read again and ages out of the LRU.
+"""
+from typing import Any
+from uuid import UUID
+
+from litestar import MediaType, Request, Response
+
+from src.cache import TTLCache
+from src.metrics import register_cache
+from src.settings import settings
+
+response_cache: TTLCache[tuple[UUID, str], bytes] = TTLCache(maxsize=settings.response_cache_size,
+                                                             ttl=settings.response_cache_ttl)
+register_cache('response', response_cache)
+
+# Ответы зависят от пользователя, поэтому private; no-cache - браузер каждый раз переспрашивает с If-None-Match
+_CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts: Any) -> str:
+    return '"' + '.'.join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    # If-None-Match сравнивается слабо: префикс W/ не учитывается
+    candidates = {candidate.strip().removeprefix('W/') for candidate in header.split(',')}
+    return etag in candidates or '*' in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(content=b'', status_code=304, headers={'ETag': etag, 'Cache-Control': _CACHE_CONTROL})
+
+
+def tagged_response(content: bytes, etag: str) -> Response[bytes]:
+    return Response(content=content, media_type=MediaType.JSON,
+                    headers={'ETag': etag, 'Cache-Control': _CACHE_CONTROL})
@@ -0,0 +1,112 @@
+"""Streaming export of request history as NDJSON or CSV.
+
+Rows come from a server-side cursor in batches of ``settings.export_batch_size`` and are written out batch by
+batch, so memory does not depend on how many requests match.
+"""
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Optional, Sequence
+
+import msgspec
+from sqlalchemy import Row, Select, select
+from sqlalchemy.orm import aliased
+
+from src.db import db_config
+from src.models.requests import Guests, RequestsDto
+from src.models.users import Users
+from src.schemas.export import ExportAppellant, ExportRequest
+from src.schemas.requests import GuestSerialize
+from src.settings import settings
+
+
+class ExportFormatEnum(Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+
+CSV_COLUMNS = (
+    'request_id', 'datetime', 'datetime_of_visit', 'status', 'visit_purpose', 'place_of_visit', 'appellant_id',
+    'appellant_full_name', 'appellant_email', 'confirming_id', 'comment', 'guest_id', 'guest_full_name',
+    'guest_email', 'guest_phone_number', 'guest_is_foreign', 'guest_visit_status',
+)
+
+
+def export_query(
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        status: Optional[int] = None,
+) -> Select:
+    """One row per guest (requests without guests get one row of NULLs), rows of a request are adjacent."""
+    appellant = aliased(Users)
+    query = (
+        select(RequestsDto.id, RequestsDto.datetime, RequestsDto.datetime_of_visit, RequestsDto.status,
+               RequestsDto.visit_purpose, RequestsDto.place_of_visit, RequestsDto.appellant_id, appellant.full_name,
+               appellant.email, RequestsDto.confirming_id, RequestsDto.comment, Guests.id, Guests.full_name,
+               Guests.email, Guests.phone_number, Guests.is_foreign, Guests.visit_status)
+        .join(appellant, appellant.id == RequestsDto.appellant_id)
+        .outerjoin(Guests, Guests.request_id == RequestsDto.id)
+        .order_by(RequestsDto.datetime_of_visit, RequestsDto.id)
+    )
+    if date_from:
+        query = query.where(RequestsDto.datetime_of_visit >= date_from)
+    if date_to:
+        query = query.where(RequestsDto.datetime_of_visit < date_to)
+    if status:
+        query = query.where(RequestsDto.status == status)
+    return query
+
+
+async def stream_rows(query: Select) -> AsyncIterator[Sequence[Row]]:
+    # Своя сессия: тело ответа отдаётся уже после выхода из обработчика и закрытия сессии запроса
+    async with db_config.get_session() as session:
+        result = await session.stream(query.execution_options(yield_per=settings.export_batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+
+def _request_from_row(row: Row) -> ExportRequest:
+    return ExportRequest(id=row[0], datetime=row[1], datetime_of_visit=row[2], status=row[3], visit_purpose=row[4],
+                         place_of_visit=row[5], appellant=ExportAppellant(id=row[6], full_name=row[7], email=row[8]),
+                         confirming_id=row[9], comment=row[10], guests=[])
+
+
+async def iter_ndjson(query: Select) -> AsyncIterator[bytes]:
+    """One JSON object per request with its guests nested; a request split across batches is held until complete."""
+    encoder = msgspec.json.Encoder()
+    current: ExportRequest | None = None
+    async for partition in stream_rows(query):
+        buffer = bytearray()
+        for row in partition:
+            if current is None or current.id != row[0]:
+                if current is not None:
+                    encoder.encode_into(current, buffer, -1)
+                    buffer.extend(b'\n')
+                current = _request_from_row(row)
+            if row[11] is not None:
+                current.guests.append(GuestSerialize(id=row[11], full_name=row[12], email=row[13],
+                                                     phone_number=row[14], is_foreign=row[15],
+                                                     visit_status=row[16]))
+        if buffer:
+            yield bytes(buffer)
+    if current is not None:
+        yield encoder.encode(current) + b'\n'
+
+
+async def iter_csv(query: Select) -> AsyncIterator[bytes]:
+    """Flat rows, one per guest, with the request columns repeated."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    # BOM, чтобы Excel открыл кириллицу в UTF-8
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    async for partition in stream_rows(query):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(partition)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def export_stream(export_format: ExportFormatEnum, query: Select) -> AsyncIterator[bytes]:
+    return iter_csv(query) if export_format == ExportFormatEnum.CSV else iter_ndjson(query)
@@ -0,0 +1,57 @@
+from typing import TYPE_CHECKING, Any
+
+from litestar.connection import ASGIConnection
+from litestar.exceptions import HTTPException
+from litestar.handlers.base import BaseRouteHandler
+from litestar.types import Guard
+
+from src.auth import load_role_ids, role_cache
+from src.db import db_config
+from src.metrics import observe_phase
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from src.endpoints.roles import RolesEnum
+
+_ROLES_STATE_KEY = 'roles'
+
+
+def _roles_from_token(connection: "ASGIConnection[Any, Any, Any, Any]") -> frozenset[int] | None:
+    # Роли из подписанного JWT принимаются, только если версия ролей в токене совпадает с текущей
+    if not settings.trust_token_roles:
+        return None
+    extras = connection.auth.extras
+    if 'roles' not in extras or extras.get('role_version') != connection.user.role_version:
+        return None
+    return frozenset(int(role) for role in extras['roles'])
+
+
+async def _roles_from_db(connection: "ASGIConnection[Any, Any, Any, Any]") -> frozenset[int]:
+    key = (connection.user.id, connection.user.role_version)
+    roles = role_cache.get(key)
+    if roles is None:
+        with observe_phase('roles_lookup'):
+            async with db_config.get_session() as session:
+                roles = await load_role_ids(session, connection.user.id)
+        role_cache.set(key, roles)
+    return roles
+
+
+async def resolve_roles(connection: "ASGIConnection[Any, Any, Any, Any]") -> frozenset[int]:
+    roles = connection.state.get(_ROLES_STATE_KEY)
+    if roles is None:
+        roles = _roles_from_token(connection)
+        if roles is None:
+            roles = await _roles_from_db(connection)
+        connection.state[_ROLES_STATE_KEY] = roles
+    return roles
+
+
+def requires_role(*roles: "RolesEnum") -> Guard:
+    allowed = frozenset(role.value for role in roles)
+
+    async def guard(connection: "ASGIConnection[Any, Any, Any, Any]", _: BaseRouteHandler) -> None:
+        if not allowed & await resolve_roles(connection):
+            raise HTTPException(status_code=403, detail="Forbidden")
+
+    return guard
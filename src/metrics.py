@@ -0,0 +1,240 @@
+"""In-process metrics in the Prometheus text format.
+
+Everything is recorded on the event loop thread, so the collectors are plain dicts without locks. Each worker
+process keeps its own numbers; scrape every worker or aggregate in Prometheus.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from litestar.config.app import AppConfig
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.cache import TTLCache
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        registry.append(self)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}', *self._samples()]
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f'{self.name}{_format_labels(self.labels, labels)} {value}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # Счётчики по корзинам хранятся без накопления, кумулятивные суммы считаются только при выводе
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        item = self._values.get(labels)
+        if item is None:
+            item = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        item[0][bisect_left(self.buckets, value)] += 1
+        item[1][0] += value
+
+    def _samples(self) -> Iterator[str]:
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, labels)} {total[0]}'
+            yield f'{self.name}_count{_format_labels(self.labels, labels)} {cumulative}'
+
+
+class CacheMetric(_Metric):
+    """One field of ``TTLCache.stats()`` for every registered cache, read when the metrics are rendered."""
+
+    def __init__(self, name: str, documentation: str, kind: str, field: str) -> None:
+        super().__init__(name, documentation, ('cache',))
+        self.kind = kind
+        self.field = field
+
+    def _samples(self) -> Iterator[str]:
+        for cache_name, cache in caches.items():
+            yield f'{self.name}{_format_labels(self.labels, (cache_name,))} {cache.stats()[self.field]}'
+
+
+registry: list[_Metric] = []
+caches: dict[str, TTLCache] = {}
+
+http_requests = Counter('http_requests_total', 'HTTP requests by route and status.', ('method', 'route', 'status'))
+http_duration = Histogram('http_request_duration_seconds', 'HTTP request latency.', ('method', 'route'))
+http_in_flight = Gauge('http_requests_in_flight', 'HTTP requests being served.', ('method', 'route'))
+http_db_duration = Histogram('http_request_db_seconds', 'Time spent in SQL statements per HTTP request.',
+                             ('method', 'route'))
+http_queries = Histogram('http_request_queries', 'SQL statements per HTTP request.', ('method', 'route'),
+                         buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55))
+db_queries = Counter('db_queries_total', 'SQL statements executed, including background workers.')
+db_duration = Histogram('db_query_duration_seconds', 'SQL statement latency.')
+db_pool_wait = Histogram('db_pool_wait_seconds', 'Time to get a connection from the pool for a request.')
+read_sessions = Counter('db_read_sessions_total', 'Sessions opened for read-only handlers by database.', ('target',))
+replica_lag = Gauge('db_replica_lag_seconds', 'Replication lag of the read replica at the last check.')
+phase_duration = Histogram('app_phase_duration_seconds', 'Time spent in instrumented phases of request handling.',
+                           ('phase',))
+cache_hits = CacheMetric('cache_hits_total', 'In-process cache lookups that found a live entry.', 'counter', 'hits')
+cache_misses = CacheMetric('cache_misses_total', 'In-process cache lookups that found nothing or an expired entry.',
+                           'counter', 'misses')
+cache_size = CacheMetric('cache_entries', 'Entries held by an in-process cache, expired ones included.', 'gauge',
+                         'size')
+cache_maxsize = CacheMetric('cache_max_entries', 'Capacity of an in-process cache.', 'gauge', 'maxsize')
+startup_duration = Gauge('app_startup_seconds', 'Time from importing the app to the end of startup hooks.',
+                         ('stage',))
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+_current: ContextVar[RequestStats | None] = ContextVar('request_metrics', default=None)
+
+
+@contextmanager
+def observe_phase(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_duration.observe(time.perf_counter() - started, name)
+
+
+def record_pool_wait(seconds: float) -> None:
+    db_pool_wait.observe(seconds)
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                           executemany: bool) -> None:
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                          executemany: bool) -> None:
+    elapsed = time.perf_counter() - context._metrics_started
+    db_queries.inc()
+    db_duration.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(sync_engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(sync_engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _route_label(scope: Scope) -> str:
+    # Значения параметров пути заменяются именами, чтобы число рядов не росло с каждым id
+    path = scope['path']
+    for name, value in scope.get('path_params', {}).items():
+        path = path.replace(str(value), '{' + name + '}', 1)
+    return path
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        labels = (scope['method'], _route_label(scope))
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        http_in_flight.inc(*labels)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_duration.observe(time.perf_counter() - started, *labels)
+            http_requests.inc(*labels, str(status))
+            http_db_duration.observe(stats.db_seconds, *labels)
+            http_queries.observe(stats.queries, *labels)
+            http_in_flight.dec(*labels)
+            _current.reset(token)
+
+
+def register_cache(name: str, cache: TTLCache) -> None:
+    caches[name] = cache
+
+
+def render_metrics() -> str:
+    return '\n'.join(metric.render() for metric in registry) + '\n'
+
+
+def on_app_init(app_config: AppConfig) -> AppConfig:
+    # Вставляется первым после jwt_auth.on_app_init, чтобы время поиска пользователя попадало в замер
+    app_config.middleware.insert(0, MetricsMiddleware)
+    return app_config
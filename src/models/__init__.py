@@ -1,5 +1,13 @@
+from sqlalchemy import DDL, event
 from sqlalchemy.orm import DeclarativeBase
 
 
 class Base(DeclarativeBase):
     ...
+
+
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
@@ -0,0 +1,34 @@
+"""Named loader profiles.
+
+Every relationship is ``lazy='raise'``, so a query loads only what its profile asks for and touching anything
+else fails loudly instead of issuing one more query per row.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from src.models.requests import RequestsDto
+from src.models.users import Users
+
+# Пользователь без связей: аутентификация и проверки по id/email
+USER_PRINCIPAL = ()
+
+# UserSerialize: пользователь и его роли
+USER_WITH_ROLES = (selectinload(Users.roles),)
+
+# Requests: заявитель и подтвердивший с ролями одним JOIN, гости и роли - по одному SELECT ... IN
+REQUEST_DETAIL = (
+    joinedload(RequestsDto.appellant).selectinload(Users.roles),
+    joinedload(RequestsDto.confirming).selectinload(Users.roles),
+    selectinload(RequestsDto.guests),
+)
+
+# Рассмотрение заявки: письма заявителю и гостям
+REQUEST_REVIEW = (
+    joinedload(RequestsDto.appellant),
+    selectinload(RequestsDto.guests),
+)
+
+# Расписание дня: заявитель для подписи и гости со статусами
+REQUEST_SCHEDULE = (
+    joinedload(RequestsDto.appellant),
+    selectinload(RequestsDto.guests),
+)
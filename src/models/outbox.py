@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+from sqlalchemy import DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models import Base
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class OutboxMessages(Base):
+    __tablename__ = "outbox"
+
+    id: Mapped[UUID] = mapped_column(default=uuid4, primary_key=True)
+    recipient: Mapped[str]
+    subject: Mapped[str] = mapped_column(default='')
+    body: Mapped[str]
+    status: Mapped[int] = mapped_column(default=0)
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+    last_error: Mapped[str | None] = mapped_column(default=None)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+
+    __table_args__ = (
+        Index('ix_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from uuid import UUID, uuid4
 
-from sqlalchemy import ForeignKey, DateTime
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship, query_expression
 
 from src.models import Base
 
@@ -20,23 +20,52 @@ class RequestsDto(Base):
     status: Mapped[int]
     confirming_id: Mapped[UUID | None] = mapped_column(ForeignKey('users.id'), default=None)
     comment: Mapped[str | None]
+    # Растёт при каждом изменении заявки, из него строится ETag
+    version: Mapped[int] = mapped_column(default=1, server_default='1')
+    relevance: Mapped[float | None] = query_expression()
 
     appellant = relationship("Users", back_populates="requests_appellant", foreign_keys=[appellant_id],
-                             lazy='selectin')
+                             lazy='raise')
     confirming = relationship("Users", back_populates="requests_confirming", foreign_keys=[confirming_id],
-                              lazy='selectin')
+                              lazy='raise')
 
-    guests = relationship('Guests', back_populates="request", lazy='selectin')
+    guests = relationship('Guests', back_populates="request", lazy='raise')
+
+    __table_args__ = (
+        Index('ix_requests_datetime_id', 'datetime', 'id'),
+        Index('ix_requests_appellant_id_datetime_id', 'appellant_id', 'datetime', 'id'),
+        Index('ix_requests_status_datetime_id', 'status', 'datetime', 'id'),
+        # расписание дня для охраны: диапазон по времени визита
+        Index('ix_requests_datetime_of_visit', 'datetime_of_visit'),
+    )
 
 
 class Guests(Base):
     __tablename__ = "guests"
     id: Mapped[UUID] = mapped_column(default=uuid4, primary_key=True)
-    request_id: Mapped[UUID] = mapped_column(ForeignKey('requests.id'))
+    request_id: Mapped[UUID] = mapped_column(ForeignKey('requests.id'), index=True)
     full_name: Mapped[str]
     email: Mapped[str]
     phone_number: Mapped[str]
     is_foreign: Mapped[bool]
     visit_status: Mapped[int]
+    version: Mapped[int] = mapped_column(default=1, server_default='1')
+
+    request = relationship("RequestsDto", back_populates="guests", foreign_keys=[request_id], lazy='raise')
+
+    __table_args__ = (
+        Index('ix_guests_full_name_trgm', 'full_name', postgresql_using='gin',
+              postgresql_ops={'full_name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+
 
-    request = relationship("RequestsDto", back_populates="guests", foreign_keys=[request_id])
+class RequestStats(Base):
+    """Counters per visit day (in ``settings.schedule_timezone``) and request status, maintained by ``src.stats``."""
+    __tablename__ = "request_stats"
+    day: Mapped[date] = mapped_column(primary_key=True)
+    status: Mapped[int] = mapped_column(primary_key=True)
+    requests: Mapped[int] = mapped_column(default=0, server_default='0')
+    # гости заявок дня с этим статусом по visit_status: ещё не пришли, в здании, вышли
+    guests_pending: Mapped[int] = mapped_column(default=0, server_default='0')
+    guests_inside: Mapped[int] = mapped_column(default=0, server_default='0')
+    guests_exited: Mapped[int] = mapped_column(default=0, server_default='0')
@@ -1,7 +1,7 @@
 from datetime import datetime
 from uuid import UUID, uuid4
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import ForeignKey, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql.sqltypes import (
     DateTime,
@@ -15,23 +15,34 @@ class Tokens(Base):
     __tablename__ = "tokens"
 
     id: Mapped[UUID] = mapped_column(default=uuid4, primary_key=True)
-    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), index=True)
     token: Mapped[str] = mapped_column(unique=True)
     created_at: Mapped[datetime] = mapped_column(default=datetime.now, server_default=func.now())
     created_by: Mapped[UUID] = mapped_column(ForeignKey('users.id'))
     status: Mapped[int]
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
 
-    creator = relationship('Users', back_populates="created_tokens", foreign_keys=[created_by], lazy='selectin')
-    created_user = relationship('Users', back_populates="token", foreign_keys=[user_id], lazy='selectin')
+    creator = relationship('Users', back_populates="created_tokens", foreign_keys=[created_by], lazy='raise')
+    created_user = relationship('Users', back_populates="token", foreign_keys=[user_id], lazy='raise')
+
+    __table_args__ = (
+        # Только неиспользованные токены: поиск по ссылке не проходит по истории
+        Index('ix_tokens_active_token', 'token', 'expires_at', postgresql_where=text('status = 0'),
+              sqlite_where=text('status = 0')),
+    )
 
 
 class UserRoles(Base):
     __tablename__ = 'user_roles'
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    user_id: Mapped[UUID] = mapped_column(ForeignKey('users.id'), nullable=False)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey('users.id'), nullable=False, index=True)
     role_id: Mapped[int] = mapped_column(ForeignKey('roles.id'), nullable=False)
 
+    __table_args__ = (
+        Index('ix_user_roles_role_id_user_id', 'role_id', 'user_id'),
+    )
+
 
 class Roles(Base):
     __tablename__ = "roles"
@@ -39,7 +50,7 @@ class Roles(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
 
-    users = relationship('Users', secondary='user_roles', back_populates='roles', lazy='selectin')
+    users = relationship('Users', secondary='user_roles', back_populates='roles', lazy='raise')
 
 
 class Users(Base):
@@ -52,11 +63,18 @@ class Users(Base):
     password: Mapped[str | None] = mapped_column(default=None)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    role_version: Mapped[int] = mapped_column(default=0, server_default='0')
 
-    roles = relationship('Roles', secondary='user_roles', back_populates='users', lazy='selectin')
+    roles = relationship('Roles', secondary='user_roles', back_populates='users', lazy='raise')
     requests_appellant = relationship("RequestsDto", back_populates="appellant",
-                                      foreign_keys=[RequestsDto.appellant_id])
+                                      foreign_keys=[RequestsDto.appellant_id], lazy='raise')
     requests_confirming = relationship("RequestsDto", back_populates="confirming",
-                                       foreign_keys=[RequestsDto.confirming_id])
-    created_tokens = relationship("Tokens", back_populates="creator", foreign_keys=[Tokens.created_by], lazy='selectin')
-    token = relationship('Tokens', back_populates="created_user", foreign_keys=[Tokens.user_id], lazy='selectin')
+                                       foreign_keys=[RequestsDto.confirming_id], lazy='raise')
+    created_tokens = relationship("Tokens", back_populates="creator", foreign_keys=[Tokens.created_by], lazy='raise')
+    token = relationship('Tokens', back_populates="created_user", foreign_keys=[Tokens.user_id], lazy='raise')
+
+    __table_args__ = (
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+        Index('ix_users_full_name_trgm', 'full_name', postgresql_using='gin',
+              postgresql_ops={'full_name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
@@ -0,0 +1,202 @@
+import asyncio
+import contextlib
+import logging
+import smtplib
+from datetime import timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from enum import Enum
+
+import anyio
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db import db_config
+from src.metrics import observe_phase
+from src.models.outbox import OutboxMessages, utc_now
+from src.settings import settings
+from src.transactions import on_commit
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxStatusEnum(Enum):
+    PENDING = 0
+    SENT = 1
+    DEAD = 2
+    # Захвачено воркером; next_attempt_at - конец аренды, после него письмо снова берётся в работу
+    SENDING = 3
+
+
+async def enqueue_messages(session: AsyncSession, messages: list[tuple[str, str]], subject: str = '') -> None:
+    if not messages:
+        return
+    await session.execute(
+        insert(OutboxMessages),
+        [{'recipient': email, 'subject': subject, 'body': message} for email, message in messages],
+    )
+    on_commit(session, lambda: outbox_worker.wake())
+
+
+async def enqueue_message(session: AsyncSession, email: str, message: str, subject: str = '') -> None:
+    await enqueue_messages(session, [(email, message)], subject)
+
+
+class SMTPUnavailable(Exception):
+    """Connecting, logging in or starting the transaction failed: the server is at fault, not the message."""
+
+
+def _is_permanent(exc: Exception) -> bool:
+    # Окончательные только отказы 5xx на RCPT и DATA; отказ на RCPT приходит и с кодами 4xx
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return isinstance(exc, smtplib.SMTPDataError) and exc.smtp_code >= 500
+
+
+class SMTPSender:
+    """Keeps one authenticated SMTP connection open between batches. Blocking, call from a worker thread."""
+
+    def __init__(self) -> None:
+        self._smtp: smtplib.SMTP | None = None
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout)
+        if settings.smtp_starttls:
+            smtp.starttls()
+        if settings.smtp_login:
+            smtp.login(settings.admin_email, settings.admin_email_password)
+        return smtp
+
+    def _send(self, recipient: str, subject: str, body: str) -> None:
+        msg = MIMEMultipart()
+        msg["From"] = settings.admin_email
+        msg["To"] = recipient
+        msg["Subject"] = subject
+        msg.attach(MIMEText(body, "html"))
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Сервер закрыл простаивающее соединение - переподключаемся один раз
+            self._smtp = self._connect()
+            self._smtp.send_message(msg)
+
+    def send_batch(self, messages: list[tuple[str, str, str]]) -> list[Exception | None]:
+        results: list[Exception | None] = []
+        for index, (recipient, subject, body) in enumerate(messages):
+            try:
+                self._send(recipient, subject, body)
+                results.append(None)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                results.append(e)
+            except (smtplib.SMTPException, OSError) as e:
+                # Подключение, вход, MAIL FROM или обрыв: остальные письма пакета тоже не уйдут
+                self.close()
+                error = SMTPUnavailable(f'{type(e).__name__}: {e}')
+                results.extend([error] * (len(messages) - index))
+                break
+        return results
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            with contextlib.suppress(smtplib.SMTPException, OSError):
+                self._smtp.quit()
+            self._smtp = None
+
+
+class OutboxWorker:
+    """Drains the outbox table in batches, retrying with exponential backoff and dead-lettering failures.
+
+    A batch is claimed for ``settings.outbox_lease`` seconds; if the worker dies mid-batch, the rows are picked up
+    again once the lease runs out, so a message can be sent twice but is never lost.
+    """
+
+    def __init__(self, sender: SMTPSender) -> None:
+        self.sender = sender
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await anyio.to_thread.run_sync(self.sender.close)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.drain_once()
+            except Exception:
+                logger.exception("Outbox drain failed")
+                processed = 0
+            if processed < settings.outbox_batch_size:
+                self._wakeup.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), settings.outbox_poll_interval)
+
+    async def drain_once(self) -> int:
+        """Claim a batch, send it outside any transaction and record the results; returns the batch size."""
+        messages = await self._claim()
+        if not messages:
+            return 0
+        with observe_phase('smtp_send'):
+            results = await anyio.to_thread.run_sync(
+                self.sender.send_batch, [(recipient, subject, body) for _, recipient, subject, body, _ in messages]
+            )
+        await self._record(messages, results)
+        return len(messages)
+
+    async def _claim(self) -> list[tuple]:
+        # Короткая транзакция: строки помечаются арендой и сразу освобождаются, SMTP идёт уже без блокировок
+        async with db_config.get_session() as session, session.begin():
+            now = utc_now()
+            query = (
+                select(OutboxMessages)
+                .where(OutboxMessages.status.in_((OutboxStatusEnum.PENDING.value, OutboxStatusEnum.SENDING.value)),
+                       OutboxMessages.next_attempt_at <= now)
+                .order_by(OutboxMessages.next_attempt_at)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            messages = (await session.execute(query)).scalars().all()
+            lease_until = now + timedelta(seconds=settings.outbox_lease)
+            for message in messages:
+                message.status = OutboxStatusEnum.SENDING.value
+                message.next_attempt_at = lease_until
+            return [(m.id, m.recipient, m.subject, m.body, m.attempts) for m in messages]
+
+    async def _record(self, messages: list[tuple], results: list[Exception | None]) -> None:
+        now = utc_now()
+        rows = []
+        for (message_id, recipient, _, _, attempts), error in zip(messages, results):
+            if error is None:
+                rows.append({'id': message_id, 'status': OutboxStatusEnum.SENT.value, 'sent_at': now})
+            elif isinstance(error, SMTPUnavailable):
+                # Попытка не засчитывается: неверный пароль или недоступный сервер не должны хоронить письма
+                rows.append({'id': message_id, 'status': OutboxStatusEnum.PENDING.value, 'last_error': str(error),
+                             'next_attempt_at': now + timedelta(seconds=settings.outbox_retry_backoff)})
+            elif _is_permanent(error) or attempts + 1 >= settings.outbox_max_attempts:
+                logger.warning("Outbox message %s to %s dead-lettered: %s", message_id, recipient, error)
+                rows.append({'id': message_id, 'status': OutboxStatusEnum.DEAD.value, 'attempts': attempts + 1,
+                             'last_error': str(error)})
+            else:
+                delay = settings.outbox_retry_backoff * 2 ** attempts
+                rows.append({'id': message_id, 'status': OutboxStatusEnum.PENDING.value, 'attempts': attempts + 1,
+                             'last_error': str(error), 'next_attempt_at': now + timedelta(seconds=delay)})
+        unavailable = next((error for error in results if isinstance(error, SMTPUnavailable)), None)
+        if unavailable is not None:
+            logger.warning("SMTP server unavailable, outbox batch postponed: %s", unavailable)
+        async with db_config.get_session() as session, session.begin():
+            await session.execute(update(OutboxMessages), rows)
+
+
+outbox_worker = OutboxWorker(SMTPSender())
@@ -0,0 +1,52 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, TypeVar
+from uuid import UUID
+
+from litestar.exceptions import HTTPException
+from litestar.pagination import OffsetPagination
+
+T = TypeVar('T')
+
+
+@dataclass
+class KeysetPagination:
+    cursor: str | None
+    limit: int
+
+
+@dataclass
+class OffsetCursorPagination(OffsetPagination[T]):
+    """Offset page that also carries an opaque ``cursor``; passing it back continues with keyset paging."""
+
+    cursor: str | None = None
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple[Any, ...]:
+    """Decode an opaque cursor produced by ``encode_cursor`` into values of the given types."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for type_, value in zip(types, values)
+        )
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import hmac
+import secrets
+from functools import lru_cache
+from typing import Protocol
+
+import anyio
+from cryptography.fernet import Fernet, InvalidToken
+
+from src.metrics import observe_phase
+from src.settings import settings
+
+try:
+    import argon2
+except ImportError:  # argon2-cffi необязателен, по умолчанию используется scrypt из стандартной библиотеки
+    argon2 = None
+
+
+class PasswordHasher(Protocol):
+    prefix: str
+
+    def hash(self, password: str) -> str: ...
+
+    def verify(self, password: str, encoded: str) -> bool: ...
+
+    def needs_rehash(self, encoded: str) -> bool: ...
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class ScryptHasher:
+    prefix = '$scrypt$'
+
+    def __init__(self, n: int, r: int, p: int) -> None:
+        self.n, self.r, self.p = n, r, p
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 2 ** 20,
+                              dklen=32)
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f'{self.prefix}n={self.n},r={self.r},p={self.p}${_b64encode(salt)}${_b64encode(digest)}'
+
+    def _parse(self, encoded: str) -> tuple[dict[str, int], bytes, bytes]:
+        params, salt, digest = encoded[len(self.prefix):].split('$')
+        return ({key: int(value) for key, value in (item.split('=') for item in params.split(','))},
+                _b64decode(salt), _b64decode(digest))
+
+    def verify(self, password: str, encoded: str) -> bool:
+        # Испорченный хеш в базе - неверный пароль, а не 500
+        try:
+            params, salt, digest = self._parse(encoded)
+            derived = self._derive(password, salt, params['n'], params['r'], params['p'])
+        except (ValueError, KeyError):
+            return False
+        return hmac.compare_digest(derived, digest)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        params, _, _ = self._parse(encoded)
+        return params != {'n': self.n, 'r': self.r, 'p': self.p}
+
+
+class Argon2Hasher:
+    prefix = '$argon2'
+
+    def __init__(self) -> None:
+        self._hasher = argon2.PasswordHasher()
+
+    def hash(self, password: str) -> str:
+        return self._hasher.hash(password)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        try:
+            return self._hasher.verify(encoded, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+            return False
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return self._hasher.check_needs_rehash(encoded)
+
+
+@lru_cache(maxsize=1)
+def _fernet() -> Fernet:
+    return Fernet(base64.urlsafe_b64encode(settings.crypt_token.encode("utf-8").ljust(32)[:32]))
+
+
+class FernetHasher:
+    """Legacy scheme: the password is stored reversibly encrypted with ``settings.crypt_token``."""
+
+    prefix = ''
+
+    def hash(self, password: str) -> str:
+        return _fernet().encrypt(password.encode("utf-8")).decode('utf-8')
+
+    def verify(self, password: str, encoded: str) -> bool:
+        try:
+            decrypted = _fernet().decrypt(encoded.encode("utf-8"))
+        except InvalidToken:
+            return False
+        return hmac.compare_digest(decrypted, password.encode('utf-8'))
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return True
+
+
+@lru_cache(maxsize=1)
+def get_hasher() -> PasswordHasher:
+    if settings.password_hasher == 'argon2':
+        if argon2 is None:
+            raise RuntimeError("password_hasher='argon2' requires the argon2-cffi package")
+        return Argon2Hasher()
+    return ScryptHasher(settings.scrypt_n, settings.scrypt_r, settings.scrypt_p)
+
+
+def identify_hasher(encoded: str) -> PasswordHasher:
+    current = get_hasher()
+    if encoded.startswith(current.prefix):
+        return current
+    if encoded.startswith(ScryptHasher.prefix):
+        return ScryptHasher(settings.scrypt_n, settings.scrypt_r, settings.scrypt_p)
+    if encoded.startswith(Argon2Hasher.prefix) and argon2 is not None:
+        return Argon2Hasher()
+    return FernetHasher()
+
+
+def _verify(password: str, encoded: str) -> tuple[bool, str | None]:
+    hasher = identify_hasher(encoded)
+    if not hasher.verify(password, encoded):
+        return False, None
+    current = get_hasher()
+    if hasher.prefix != current.prefix or current.needs_rehash(encoded):
+        return True, current.hash(password)
+    return True, None
+
+
+_limiter: anyio.CapacityLimiter | None = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(settings.password_hash_workers)
+    return _limiter
+
+
+async def hash_password(password: str) -> str:
+    with observe_phase('password_hash'):
+        return await anyio.to_thread.run_sync(get_hasher().hash, password, limiter=_get_limiter())
+
+
+async def verify_password(password: str, encoded: str | None) -> tuple[bool, str | None]:
+    """Check ``password`` off the event loop; the second item is a new hash to store when the old one is outdated."""
+    if not encoded:
+        return False, None
+    with observe_phase('password_verify'):
+        return await anyio.to_thread.run_sync(_verify, password, encoded, limiter=_get_limiter())
@@ -0,0 +1,107 @@
+import asyncio
+import io
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from enum import Enum
+from pathlib import Path
+from typing import Iterable
+from uuid import UUID
+
+import qrcode
+from qrcode.image.pure import PyPNGImage
+from qrcode.image.svg import SvgPathImage
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.metrics import observe_phase
+from src.settings import settings
+from src.transactions import on_commit
+
+
+class QRFormatEnum(Enum):
+    PNG = 'png'
+    SVG = 'svg'
+
+
+_IMAGE_FACTORIES = {QRFormatEnum.PNG: PyPNGImage, QRFormatEnum.SVG: SvgPathImage}
+
+_executor: Executor | None = None
+_pending: dict[Path, asyncio.Task] = {}
+
+
+def render_qr(data: str, image_format: QRFormatEnum = QRFormatEnum.PNG) -> bytes:
+    # PyPNGImage пишет 1-битный PNG, SvgPathImage - один <path> без растра
+    qr = qrcode.QRCode(box_size=settings.qr_box_size, border=settings.qr_border,
+                       image_factory=_IMAGE_FACTORIES[image_format])
+    qr.add_data(data)
+    buffer = io.BytesIO()
+    qr.make_image().save(buffer)
+    return buffer.getvalue()
+
+
+def get_executor() -> Executor | None:
+    global _executor
+    if _executor is None and settings.qr_workers > 0:
+        _executor = ProcessPoolExecutor(max_workers=settings.qr_workers)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def render_qr_async(data: str, image_format: QRFormatEnum = QRFormatEnum.PNG) -> bytes:
+    # Без процессов (qr_workers = 0) рендер уходит в пул потоков по умолчанию
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), render_qr, data, image_format)
+
+
+def qr_path(request_id: UUID, image_format: QRFormatEnum) -> Path:
+    return Path(settings.qr_directory) / f'{request_id}.{image_format.value}'
+
+
+def _write_atomically(path: Path, content: bytes) -> None:
+    tmp_path = path.with_suffix(f'{path.suffix}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+async def _render_to_file(path: Path, url: str, image_format: QRFormatEnum) -> None:
+    with observe_phase('qr_render'):
+        content = await render_qr_async(url, image_format)
+    await asyncio.to_thread(_write_atomically, path, content)
+
+
+async def get_request_qr(request_id: UUID, url: str, image_format: QRFormatEnum) -> Path:
+    path = qr_path(request_id, image_format)
+    if path.exists():
+        return path
+    # Одновременные запросы одного и того же кода ждут один общий рендер
+    task = _pending.get(path)
+    if task is None:
+        task = asyncio.create_task(_render_to_file(path, url, image_format))
+        _pending[path] = task
+        task.add_done_callback(lambda _: _pending.pop(path, None))
+    await asyncio.shield(task)
+    return path
+
+
+def discard_request_qr(request_id: UUID) -> None:
+    for image_format in QRFormatEnum:
+        qr_path(request_id, image_format).unlink(missing_ok=True)
+
+
+def discard_qr_after_commit(session: AsyncSession, request_ids: Iterable[UUID]) -> None:
+    """Delete the cached codes of requests that stop being ACCEPTED once the transaction commits.
+
+    Deleting earlier would let a concurrent GET /qr, which still sees the request as accepted, render the file again.
+    """
+    request_ids = list(request_ids)
+
+    def discard() -> None:
+        for request_id in request_ids:
+            discard_request_qr(request_id)
+
+    on_commit(session, discard)
@@ -0,0 +1,167 @@
+"""Read-only sessions and their routing to the optional replica at ``settings.db_replica_url``.
+
+Read-only handlers and auth lookups use the replica while a background check finds it reachable with a lag under
+``settings.replica_max_lag``, and the primary otherwise. A successful write marks its user in this process and sets a
+short-lived cookie, so the client's reads stay on the primary for ``settings.replica_sticky_seconds`` whichever
+worker serves them.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+from litestar.config.app import AppConfig
+from litestar.connection import ASGIConnection
+from litestar.datastructures import Cookie
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import TTLCache
+from src.db import db_config, replica_config
+from src.metrics import read_sessions, record_pool_wait, replica_lag
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = 'db-primary'
+_SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+_READ_ONLY = {'isolation_level': 'AUTOCOMMIT'}
+
+# На основной базе pg_last_wal_receive_lsn() возвращает NULL, и отставание считается нулевым: так роль реплики
+# может играть любая вторая база, например при локальной проверке
+_PG_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    def __init__(self) -> None:
+        self.available = False
+        self.recent_writers: TTLCache[UUID, bool] = TTLCache(maxsize=settings.principal_cache_size,
+                                                             ttl=settings.replica_sticky_seconds)
+        self.sticky_header = Cookie(key=STICKY_COOKIE, value='1', max_age=int(settings.replica_sticky_seconds),
+                                    httponly=True, samesite='lax').to_encoded_header()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if replica_config is not None:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if replica_config is not None:
+            await replica_config.get_engine().dispose()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.replica_check_interval)
+            await self.check()
+
+    async def check(self) -> None:
+        try:
+            lag = await asyncio.wait_for(self._measure_lag(), settings.replica_max_lag)
+        except Exception as exc:
+            if self.available:
+                logger.warning("Replica is unavailable, reading from the primary: %s", exc)
+            self.available = False
+            return
+        replica_lag.set(lag)
+        available = lag <= settings.replica_max_lag
+        if available != self.available:
+            logger.warning("Replica lag is %.1fs, reading from the %s", lag, 'replica' if available else 'primary')
+        self.available = available
+
+    async def _measure_lag(self) -> float:
+        async with replica_config.get_engine().connect() as connection:
+            if connection.dialect.name != 'postgresql':
+                await connection.execute(text('SELECT 1'))
+                return 0.0
+            return float((await connection.execute(_PG_LAG)).scalar_one())
+
+    def wrote_recently(self, connection: "ASGIConnection[Any, Any, Any, Any]") -> bool:
+        if STICKY_COOKIE in connection.cookies:
+            return True
+        user = connection.scope.get('user')
+        return user is not None and self.recent_writers.get(user.id) is not None
+
+    def use_replica(self, connection: "ASGIConnection[Any, Any, Any, Any]") -> bool:
+        return self.available and not self.wrote_recently(connection)
+
+    @contextlib.asynccontextmanager
+    async def session(
+            self,
+            connection: "ASGIConnection[Any, Any, Any, Any] | None" = None,
+    ) -> AsyncIterator[AsyncSession]:
+        """A connected read-only session: on the replica when it can serve ``connection``, on the primary otherwise.
+
+        Without ``connection`` the session is always on the primary, for reads that must see the latest commits.
+
+        The connection runs in autocommit mode, so reads cost no BEGIN/COMMIT round trips and closing the session
+        returns the connection to the pool without a rollback. Statements do not share a snapshot.
+        """
+        use_replica = connection is not None and self.use_replica(connection)
+        session = (replica_config if use_replica else db_config).session_maker(autoflush=False)
+        try:
+            started = time.perf_counter()
+            try:
+                await session.connection(execution_options=_READ_ONLY)
+            except (OSError, DBAPIError) as exc:
+                if not use_replica:
+                    raise
+                # Не дожидаясь следующей проверки: этот и последующие запросы читают с основной базы
+                logger.warning("Replica connection failed, reading from the primary: %s", exc)
+                self.available = use_replica = False
+                await session.close()
+                session = db_config.session_maker(autoflush=False)
+                await session.connection(execution_options=_READ_ONLY)
+            record_pool_wait(time.perf_counter() - started)
+            read_sessions.inc('replica' if use_replica else 'primary')
+            yield session
+        finally:
+            await session.close()
+
+    def mark_write(self, scope: Scope) -> None:
+        user = scope.get('user')
+        if user is not None:
+            self.recent_writers.set(user.id, True)
+
+
+replica_router = ReplicaRouter()
+
+
+class ReadYourWritesMiddleware:
+    """Keeps clients on the primary for a while after a successful unsafe request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] in _SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            # Ответ уходит после коммита (autocommit_before_send_handler), так что запись уже видна на основной базе
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                replica_router.mark_write(scope)
+                message = {**message, 'headers': [*message.get('headers', ()), replica_router.sticky_header]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def on_app_init(app_config: AppConfig) -> AppConfig:
+    # Добавляется последним, внутрь jwt-мидлвари, чтобы в scope уже был пользователь
+    if replica_config is not None:
+        app_config.middleware.append(ReadYourWritesMiddleware)
+    return app_config
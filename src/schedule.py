@@ -0,0 +1,160 @@
+"""In-memory per-day snapshots of the accepted visits for the security desk.
+
+A day is loaded from the database once per ``settings.schedule_ttl`` and kept current in between by the review and
+guest action handlers of this process, after their transactions commit. Changes made by other workers show up on
+the next reload.
+"""
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+import msgspec
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import TTLCache
+from src.metrics import observe_phase, register_cache
+from src.models.loaders import REQUEST_SCHEDULE
+from src.models.requests import RequestsDto
+from src.replica import replica_router
+from src.schemas.requests import GuestSerialize, StatusEnum
+from src.schemas.schedule import DaySchedule, ScheduleRequest
+from src.settings import settings
+from src.transactions import on_commit
+
+# Заявки, гости которых ожидаются или уже приходили
+SCHEDULED_STATUSES = (StatusEnum.Одобрена, StatusEnum.Завершена)
+
+zone = ZoneInfo(settings.schedule_timezone)
+_encoder = msgspec.json.Encoder()
+
+
+def today() -> date:
+    return datetime.now(zone).date()
+
+
+def visit_day(value: datetime) -> date:
+    # SQLite возвращает время без зоны, в базе оно хранится в UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(zone).date()
+
+
+class DaySnapshot:
+    def __init__(self, day: date, requests: Iterable[ScheduleRequest]) -> None:
+        self.day = day
+        self.requests: dict[UUID, ScheduleRequest] = {}
+        self.guests: dict[UUID, GuestSerialize] = {}
+        self._encoded: bytes | None = None
+        for request in requests:
+            self.put(request)
+
+    def put(self, request: ScheduleRequest) -> None:
+        self.discard(request.id)
+        self.requests[request.id] = request
+        self.guests.update((guest.id, guest) for guest in request.guests)
+        self._encoded = None
+
+    def discard(self, request_id: UUID) -> None:
+        request = self.requests.pop(request_id, None)
+        if request is not None:
+            for guest in request.guests:
+                self.guests.pop(guest.id, None)
+            self._encoded = None
+
+    def set_guest_status(self, guest_id: UUID, status: int) -> None:
+        guest = self.guests.get(guest_id)
+        if guest is not None:
+            guest.visit_status = status
+            self._encoded = None
+
+    def set_request_status(self, request_id: UUID, status: StatusEnum) -> None:
+        request = self.requests.get(request_id)
+        if request is not None:
+            request.status = status
+            self._encoded = None
+
+    def encode(self) -> bytes:
+        # JSON собирается заново только после изменений, повторные обновления экрана отдают готовые байты
+        if self._encoded is None:
+            requests = sorted(self.requests.values(), key=lambda request: (request.datetime_of_visit, request.id))
+            self._encoded = _encoder.encode(DaySchedule(day=self.day, requests=requests))
+        return self._encoded
+
+
+async def load_day(session: AsyncSession, day: date) -> list[ScheduleRequest]:
+    start = datetime.combine(day, time.min, tzinfo=zone).astimezone(timezone.utc)
+    query = (select(RequestsDto)
+             .where(RequestsDto.datetime_of_visit >= start,
+                    RequestsDto.datetime_of_visit < start + timedelta(days=1),
+                    RequestsDto.status.in_(SCHEDULED_STATUSES))
+             .options(*REQUEST_SCHEDULE))
+    result = await session.execute(query)
+    return [ScheduleRequest.from_orm(request) for request in result.scalars()]
+
+
+class ScheduleCache:
+    def __init__(self) -> None:
+        self._snapshots: TTLCache[date, DaySnapshot] = TTLCache(maxsize=settings.schedule_days,
+                                                                ttl=settings.schedule_ttl)
+        # Растёт с каждым применённым изменением; снимок, во время загрузки которого что-то поменялось, не кэшируется
+        self._generation = 0
+        # Одновременные промахи ждут одну загрузку вместо того, чтобы читать день каждый сам
+        self._load_lock = asyncio.Lock()
+
+    async def get(self, day: date) -> bytes:
+        snapshot = self._snapshots.get(day)
+        if snapshot is None:
+            async with self._load_lock:
+                snapshot = self._snapshots.get(day)
+                if snapshot is None:
+                    generation = self._generation
+                    # С основной базы: изменения, применённые до загрузки, на реплике могли ещё не появиться
+                    with observe_phase('schedule_load'):
+                        async with replica_router.session() as session:
+                            snapshot = DaySnapshot(day, await load_day(session, day))
+                    if generation == self._generation:
+                        self._snapshots.set(day, snapshot)
+        return snapshot.encode()
+
+    def request_reviewed(self, request: ScheduleRequest) -> None:
+        self._generation += 1
+        for snapshot in self._snapshots.values():
+            snapshot.discard(request.id)
+        if request.status in SCHEDULED_STATUSES:
+            snapshot = self._snapshots.get(visit_day(request.datetime_of_visit))
+            if snapshot is not None:
+                snapshot.put(request)
+
+    def guests_changed(self, guest_ids: list[UUID], completed: list[UUID], status: int) -> None:
+        self._generation += 1
+        for snapshot in self._snapshots.values():
+            for guest_id in guest_ids:
+                snapshot.set_guest_status(guest_id, status)
+            for request_id in completed:
+                snapshot.set_request_status(request_id, StatusEnum.Завершена)
+
+    def clear(self) -> None:
+        self._snapshots.clear()
+
+
+day_schedule = ScheduleCache()
+register_cache('schedule', day_schedule._snapshots)
+
+
+def schedule_request_reviewed(session: AsyncSession, request: RequestsDto) -> None:
+    """Apply a review to the snapshots once the transaction commits; ``request`` needs REQUEST_SCHEDULE loaded."""
+    item = ScheduleRequest.from_orm(request)
+    on_commit(session, lambda: day_schedule.request_reviewed(item))
+
+
+def schedule_guests_changed(
+        session: AsyncSession,
+        updated: list[tuple[UUID, UUID, UUID]],
+        completed: list[UUID],
+        status: int
+) -> None:
+    guest_ids = [guest_id for guest_id, _, _ in updated]
+    on_commit(session, lambda: day_schedule.guests_changed(guest_ids, completed, status))
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+import msgspec
+
+from src.schemas.requests import GuestSerialize, StatusEnum
+
+
+class ExportAppellant(msgspec.Struct):
+    id: UUID
+    full_name: str
+    email: str
+
+
+class ExportRequest(msgspec.Struct):
+    id: UUID
+    datetime: datetime
+    datetime_of_visit: datetime
+    status: StatusEnum
+    visit_purpose: str
+    place_of_visit: str
+    appellant: ExportAppellant
+    confirming_id: Optional[UUID]
+    comment: Optional[str]
+    guests: list[GuestSerialize]
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import IntEnum
-from typing import Optional, List
+from typing import Any, Optional, List
 from uuid import UUID
 
+import msgspec
 from pydantic import BaseModel
 from pydantic import EmailStr
 from pydantic_extra_types.phone_numbers import PhoneNumber
@@ -24,56 +25,70 @@ class GuestsStatusEnum(IntEnum):
     Вышел = 3
 
 
-class Requests(BaseModel):
-    id: UUID
-    visit_purpose: str
-    place_of_visit: str
-    datetime_of_visit: datetime
-    guests: list[GuestSerialize]
-    appellant_id: UUID
-    appellant: UserSerialize
-    datetime: datetime
-    status: StatusEnum
-    confirming_id: Optional[UUID]
-    confirming: Optional[UserSerialize]
-
-    class Config:
-        orm_mode = True
-        from_attributes = True
-
-
-class RoleSerialize(BaseModel):
+# Ответы собираются из строк своей же БД, поэтому это msgspec Struct без повторной валидации
+class RoleSerialize(msgspec.Struct):
     name: str
 
-    class Config:
-        orm_mode = True
-        from_attributes = True
+    @classmethod
+    def from_orm(cls, role: Any) -> RoleSerialize:
+        return cls(name=role.name)
 
 
-class UserSerialize(BaseModel):
+class UserSerialize(msgspec.Struct):
     id: UUID
     full_name: str
-    email: EmailStr
+    email: str
     created_at: datetime
-    updated_at: datetime
+    updated_at: Optional[datetime]
     roles: List[RoleSerialize]
 
-    class Config:
-        orm_mode = True
-        from_attributes = True
+    @classmethod
+    def from_orm(cls, user: Any) -> UserSerialize:
+        return cls(id=user.id, full_name=user.full_name, email=user.email, created_at=user.created_at,
+                   updated_at=user.updated_at, roles=[RoleSerialize.from_orm(role) for role in user.roles])
 
 
-class GuestSerialize(BaseModel):
+class GuestSerialize(msgspec.Struct):
     id: UUID
     full_name: str
-    email: EmailStr
-    phone_number: PhoneNumber
+    email: str
+    phone_number: str
     is_foreign: bool
     visit_status: int
 
-    class Config:
-        orm_mode = True
-        from_attributes = True
+    @classmethod
+    def from_orm(cls, guest: Any) -> GuestSerialize:
+        return cls(id=guest.id, full_name=guest.full_name, email=guest.email, phone_number=guest.phone_number,
+                   is_foreign=guest.is_foreign, visit_status=guest.visit_status)
+
+
+class Requests(msgspec.Struct):
+    id: UUID
+    visit_purpose: str
+    place_of_visit: str
+    datetime_of_visit: datetime
+    guests: list[GuestSerialize]
+    appellant_id: UUID
+    appellant: UserSerialize
+    datetime: datetime
+    status: StatusEnum
+    confirming_id: Optional[UUID]
+    confirming: Optional[UserSerialize]
+
+    @classmethod
+    def from_orm(cls, request: Any) -> Requests:
+        return cls(id=request.id, visit_purpose=request.visit_purpose, place_of_visit=request.place_of_visit,
+                   datetime_of_visit=request.datetime_of_visit,
+                   guests=[GuestSerialize.from_orm(guest) for guest in request.guests],
+                   appellant_id=request.appellant_id, appellant=UserSerialize.from_orm(request.appellant),
+                   datetime=request.datetime, status=StatusEnum(request.status), confirming_id=request.confirming_id,
+                   confirming=UserSerialize.from_orm(request.confirming) if request.confirming else None)
+
+
+class E164PhoneNumber(PhoneNumber):
+    """Phone number validated on input and stored in E.164, so responses can return it as is."""
+
+    phone_format = 'E164'
 
 
 class RequestsCreate(BaseModel):
@@ -86,7 +101,7 @@ class RequestsCreate(BaseModel):
 class GuestsCreate(BaseModel):
     full_name: str
     email: EmailStr
-    phone_number: PhoneNumber
+    phone_number: E164PhoneNumber
     is_foreign: bool
 
     class Config:
@@ -107,3 +122,8 @@ class RequestsDelete(BaseModel):
 class GuestsReview(BaseModel):
     guest_id: UUID
     status: GuestsStatusEnum
+
+
+class GuestsBatchReview(BaseModel):
+    guest_ids: List[UUID]
+    status: GuestsStatusEnum
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any
+from uuid import UUID
+
+import msgspec
+
+from src.schemas.requests import GuestSerialize, StatusEnum
+
+
+class ScheduleAppellant(msgspec.Struct):
+    id: UUID
+    full_name: str
+
+
+class ScheduleRequest(msgspec.Struct):
+    id: UUID
+    visit_purpose: str
+    place_of_visit: str
+    datetime_of_visit: datetime
+    status: StatusEnum
+    appellant: ScheduleAppellant
+    guests: list[GuestSerialize]
+
+    @classmethod
+    def from_orm(cls, request: Any) -> ScheduleRequest:
+        return cls(id=request.id, visit_purpose=request.visit_purpose, place_of_visit=request.place_of_visit,
+                   datetime_of_visit=request.datetime_of_visit, status=request.status,
+                   appellant=ScheduleAppellant(id=request.appellant.id, full_name=request.appellant.full_name),
+                   guests=[GuestSerialize.from_orm(guest) for guest in request.guests])
+
+
+class DaySchedule(msgspec.Struct):
+    day: date
+    requests: list[ScheduleRequest]
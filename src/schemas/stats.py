@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from datetime import date
+
+import msgspec
+
+from src.schemas.requests import StatusEnum
+
+
+class StatusStats(msgspec.Struct):
+    status: StatusEnum
+    requests: int
+    guests_pending: int
+    guests_inside: int
+    guests_exited: int
+
+
+class DayStats(msgspec.Struct):
+    day: date
+    statuses: list[StatusStats]
+    guests_inside: int
+    expected_arrivals: int
@@ -0,0 +1,23 @@
+from sqlalchemy import ColumnElement, case, func, literal
+
+_ESCAPE = '\\'
+
+
+def _escape_like(term: str) -> str:
+    return term.replace(_ESCAPE, _ESCAPE * 2).replace('%', _ESCAPE + '%').replace('_', _ESCAPE + '_')
+
+
+def name_matches(column: ColumnElement[str], term: str) -> ColumnElement[bool]:
+    # ILIKE '%...%' использует trigram GIN индекс в PostgreSQL, в SQLite это lower(..) LIKE lower(..)
+    return column.ilike(f'%{_escape_like(term)}%', escape=_ESCAPE)
+
+
+def name_relevance(column: ColumnElement[str], term: str, dialect_name: str) -> ColumnElement[float]:
+    if dialect_name == 'postgresql':
+        return func.similarity(column, term)
+    # SQLite: точное совпадение выше совпадения с начала строки, а оно выше совпадения в середине
+    return case(
+        (func.lower(column) == term.lower(), literal(1.0)),
+        (column.ilike(f'{_escape_like(term)}%', escape=_ESCAPE), literal(0.5)),
+        else_=literal(0.25),
+    )
@@ -0,0 +1,46 @@
+"""Production entry point: ``python -m src.serve``.
+
+Runs ``app:app`` under uvicorn with ``settings.workers`` processes on uvloop and httptools. On SIGTERM every worker
+stops accepting connections and waits up to ``settings.graceful_timeout`` seconds for in-flight requests before the
+shutdown hooks run and the pool is disposed.
+
+Each worker has its own connection pool, principal and schedule caches and in-memory notification channels, so
+WebSocket/SSE subscribers only see events published by the worker they are connected to, and cache invalidations
+stay within one worker until the TTL runs out. ``settings.workers`` therefore defaults to 1; see README, "Running".
+"""
+import logging
+
+import uvicorn
+
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def check_pool_budget() -> None:
+    per_worker = settings.db_pool_size + settings.db_max_overflow
+    total = settings.workers * per_worker
+    if settings.db_max_connections is not None and total > settings.db_max_connections:
+        logger.warning("%d workers x %d connections = %d exceeds db_max_connections=%d; lower db_pool_size or "
+                       "db_max_overflow", settings.workers, per_worker, total, settings.db_max_connections)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    check_pool_budget()
+    uvicorn.run(
+        'app:app',
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        loop='uvloop',
+        http='httptools',
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.forwarded_allow_ips,
+        access_log=False,
+    )
+
+
+if __name__ == '__main__':
+    main()
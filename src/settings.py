@@ -9,8 +9,68 @@ class _Settings(BaseSettings):
     db_ip: str = 'database'
     db_port: str = '5432'
     db_name: str = 'postgres'
+    db_url: str | None = None
+    # Пул на каждый процесс: всего соединений до workers * (db_pool_size + db_max_overflow)
+    db_pool_size: int = 10
+    db_max_overflow: int = 5
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Кэш подготовленных запросов asyncpg; 0 за pgbouncer в режиме transaction
+    db_statement_cache_size: int = 100
+    db_max_connections: int | None = None
+    # Необязательная реплика для GET-обработчиков и поиска пользователя по токену
+    db_replica_url: str | None = None
+    replica_max_lag: float = 5
+    replica_check_interval: float = 2
+    # Сколько секунд после записи клиент читает с основной базы
+    replica_sticky_seconds: float = 10
     admin_email: str = 'example@mail.com'
     admin_email_password: str
+    smtp_host: str = 'smtp.yandex.ru'
+    smtp_port: int = 587
+    smtp_starttls: bool = True
+    smtp_login: bool = True
+    smtp_timeout: float = 30
+    outbox_batch_size: int = 50
+    outbox_poll_interval: float = 5
+    outbox_max_attempts: int = 8
+    outbox_retry_backoff: float = 30
+    # Должна перекрывать отправку пакета: outbox_batch_size * smtp_timeout в худшем случае
+    outbox_lease: float = 1800
+    principal_cache_size: int = 1024
+    principal_cache_ttl: float = 60
+    trust_token_roles: bool = False
+    password_hasher: str = 'scrypt'
+    password_hash_workers: int = 4
+    scrypt_n: int = 2 ** 14
+    scrypt_r: int = 8
+    scrypt_p: int = 1
+    requests_page_size: int = 20
+    requests_max_page_size: int = 100
+    bulk_batch_size: int = 1000
+    qr_directory: str = 'qr'
+    qr_workers: int = 1
+    qr_box_size: int = 10
+    qr_border: int = 4
+    channels_max_backlog: int = 100
+    users_count_ttl: float = 30
+    registration_token_ttl: float = 7 * 24 * 3600
+    recovery_token_ttl: float = 3600
+    schedule_timezone: str = 'Asia/Yekaterinburg'
+    schedule_ttl: float = 300
+    schedule_days: int = 7
+    export_batch_size: int = 1000
+    response_cache_size: int = 1024
+    response_cache_ttl: float = 300
+    stats_reconcile_interval: float = 3600
+    # Периодический пересчёт затрагивает дни начиная с этого числа дней назад; всю историю - python -m src.stats
+    stats_reconcile_days: int = 1
+    host: str = '0.0.0.0'
+    port: int = 3000
+    workers: int = 1
+    graceful_timeout: int = 30
+    forwarded_allow_ips: str = '127.0.0.1'
     model_config = SettingsConfigDict(env_file='.env')
 
 
@@ -0,0 +1,7 @@
+"""Import start time for the ``app_startup_seconds`` metric.
+
+``app.py`` imports this module before Litestar and the rest of the app, so the stamp is taken before the heavy imports.
+"""
+import time
+
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,213 @@
+"""Request and guest counters per visit day and request status.
+
+Handlers that create requests or change request or guest statuses collect their deltas in a ``StatsDelta`` and
+apply them with one upsert in their own transaction, so ``GET /stats`` reads a few rows whatever the history size.
+Deltas are computed from values read without row locks, so concurrent changes to the same guest can make the
+counters drift. ``rebuild_stats`` recomputes them with one aggregate query: every ``settings.stats_reconcile_interval``
+seconds for the days from ``settings.stats_reconcile_days`` ago onwards, in one process only, and for the whole
+history on demand with ``python -m src.stats``.
+"""
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import Date, Insert, case, cast, delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.db import db_config
+from src.metrics import observe_phase
+from src.models.requests import Guests, RequestStats, RequestsDto
+from src.schedule import today, visit_day, zone
+from src.schemas.requests import StatusEnum
+from src.schemas.stats import DayStats, StatusStats
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# visit_status гостя -> столбец счётчика
+GUEST_COLUMNS = {1: 'guests_pending', 2: 'guests_inside', 3: 'guests_exited'}
+COLUMNS = ('requests', *GUEST_COLUMNS.values())
+
+
+class StatsDelta:
+    def __init__(self) -> None:
+        self._deltas: dict[tuple[date, int], dict[str, int]] = defaultdict(lambda: dict.fromkeys(COLUMNS, 0))
+
+    def add_request(self, visit_at: datetime, status: int, guest_statuses: Iterable[int], sign: int = 1) -> None:
+        delta = self._deltas[visit_day(visit_at), status]
+        delta['requests'] += sign
+        for guest_status in guest_statuses:
+            delta[GUEST_COLUMNS[guest_status]] += sign
+
+    def move_request(self, visit_at: datetime, old_status: int, new_status: int,
+                     guest_statuses: Iterable[int]) -> None:
+        if old_status != new_status:
+            guest_statuses = list(guest_statuses)
+            self.add_request(visit_at, old_status, guest_statuses, sign=-1)
+            self.add_request(visit_at, new_status, guest_statuses)
+
+    def move_guest(self, visit_at: datetime, request_status: int, old_status: int, new_status: int) -> None:
+        if old_status != new_status:
+            delta = self._deltas[visit_day(visit_at), request_status]
+            delta[GUEST_COLUMNS[old_status]] -= 1
+            delta[GUEST_COLUMNS[new_status]] += 1
+
+    async def apply(self, session: AsyncSession) -> None:
+        """Add the collected deltas to ``request_stats`` with one multi-row upsert; call after the handler's writes."""
+        # Ключи по порядку: параллельные транзакции блокируют строки счётчиков в одном и том же порядке
+        rows = [{'day': day, 'status': status, **delta}
+                for (day, status), delta in sorted(self._deltas.items()) if any(delta.values())]
+        self._deltas.clear()
+        if not rows:
+            return
+        dialect_insert = postgresql.insert if session.bind.dialect.name == 'postgresql' else sqlite.insert
+        statement = dialect_insert(RequestStats).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[RequestStats.day, RequestStats.status],
+            set_={column: getattr(RequestStats, column) + getattr(statement.excluded, column) for column in COLUMNS},
+        )
+        await session.execute(statement)
+
+
+async def day_stats(session: AsyncSession, day: date) -> DayStats:
+    """At most one row per request status, whatever the number of requests on ``day``."""
+    rows = (await session.execute(
+        select(RequestStats).where(RequestStats.day == day).order_by(RequestStats.status))).scalars().all()
+    # Строки, обнулённые переходами, остаются в таблице до пересчёта
+    statuses = [StatusStats(status=StatusEnum(row.status), requests=row.requests, guests_pending=row.guests_pending,
+                            guests_inside=row.guests_inside, guests_exited=row.guests_exited)
+                for row in rows if any(getattr(row, column) for column in COLUMNS)]
+    # Ожидаются только гости одобренных заявок, ещё не прошедшие на территорию
+    return DayStats(day=day, statuses=statuses, guests_inside=sum(row.guests_inside for row in statuses),
+                    expected_arrivals=sum(row.guests_pending for row in statuses
+                                          if row.status == StatusEnum.Одобрена))
+
+
+def _visit_day_expression(dialect_name: str):
+    if dialect_name == 'postgresql':
+        return cast(func.timezone(settings.schedule_timezone, RequestsDto.datetime_of_visit), Date)
+    # В SQLite нет часовых поясов: берётся текущее смещение зоны, для зон без перехода на летнее время это точно
+    offset = int(datetime.now(zone).utcoffset().total_seconds())
+    return func.date(RequestsDto.datetime_of_visit, f'{offset:+d} seconds')
+
+
+def rebuild_query(dialect_name: str, since: date | None = None) -> Insert:
+    """INSERT ... SELECT of the counters from ``since`` on (all days by default) from a single aggregate."""
+    # День считается в подзапросе: иначе параметр зоны попадает в SELECT и GROUP BY двумя разными параметрами,
+    # и PostgreSQL не признаёт выражения одинаковыми
+    visits = (select(_visit_day_expression(dialect_name).label('day'), RequestsDto.id, RequestsDto.status,
+                     Guests.visit_status)
+              .select_from(RequestsDto)
+              .outerjoin(Guests, Guests.request_id == RequestsDto.id))
+    if since is not None:
+        visits = visits.where(RequestsDto.datetime_of_visit >= _day_start(since))
+    visits = visits.subquery('visits')
+
+    def guests_with(visit_status: int):
+        return func.coalesce(func.sum(case((visits.c.visit_status == visit_status, 1), else_=0)), 0)
+
+    query = (select(visits.c.day, visits.c.status, func.count(func.distinct(visits.c.id)),
+                    *(guests_with(visit_status) for visit_status in GUEST_COLUMNS))
+             .group_by(visits.c.day, visits.c.status))
+    return insert(RequestStats).from_select(['day', 'status', *COLUMNS], query)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=zone).astimezone(timezone.utc)
+
+
+async def rebuild_stats(session: AsyncSession, since: date | None = None) -> None:
+    """Recompute the counters of the days from ``since`` on, or of all days."""
+    dialect_name = session.bind.dialect.name
+    if dialect_name == 'postgresql':
+        # Пишущие счётчики транзакции ждут конца пересчёта; их ещё не закоммиченные изменения в агрегат не попадут,
+        # а их дельты прибавятся после
+        await session.execute(text('LOCK TABLE request_stats IN EXCLUSIVE MODE'))
+    statement = delete(RequestStats)
+    if since is not None:
+        statement = statement.where(RequestStats.day >= since)
+    await session.execute(statement)
+    await session.execute(rebuild_query(dialect_name, since))
+
+
+# Ключ pg_advisory_lock, по которому выбирается единственный процесс, выполняющий пересчёт
+_RECONCILER_LOCK = 0x5354415453
+
+
+class StatsReconciler:
+    """Periodically rebuilds the recent counters to undo any drift; disabled when the interval is 0.
+
+    On PostgreSQL only the worker holding a session-level advisory lock rebuilds; the lock lives on a dedicated
+    autocommit connection and passes to another worker when that connection or its process goes away.
+    """
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._lock_connection: AsyncConnection | None = None
+
+    async def start(self) -> None:
+        if settings.stats_reconcile_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self._release()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.stats_reconcile_interval)
+            try:
+                if await self._is_leader():
+                    await self.reconcile_once(today() - timedelta(days=settings.stats_reconcile_days))
+            except Exception:
+                logger.exception("Stats reconciliation failed")
+                await self._release()
+
+    async def _is_leader(self) -> bool:
+        engine = db_config.get_engine()
+        if engine.dialect.name != 'postgresql':
+            return True
+        if self._lock_connection is not None:
+            # Соединение с блокировкой могло оборваться: тогда блокировку уже может держать другой процесс
+            await self._lock_connection.execute(text('SELECT 1'))
+            return True
+        connection = await engine.connect()
+        try:
+            connection = await connection.execution_options(isolation_level='AUTOCOMMIT')
+            acquired = (await connection.execute(text('SELECT pg_try_advisory_lock(:key)'),
+                                                 {'key': _RECONCILER_LOCK})).scalar_one()
+        except BaseException:
+            await connection.close()
+            raise
+        if not acquired:
+            await connection.close()
+            return False
+        self._lock_connection = connection
+        return True
+
+    async def _release(self) -> None:
+        if self._lock_connection is not None:
+            # Соединение не возвращается в пул, где блокировка осталась бы на нём: закрытие сессии её снимает
+            with contextlib.suppress(Exception):
+                await self._lock_connection.invalidate()
+            self._lock_connection = None
+
+    async def reconcile_once(self, since: date | None = None) -> None:
+        with observe_phase('stats_rebuild'):
+            async with db_config.get_session() as session, session.begin():
+                await rebuild_stats(session, since)
+
+
+stats_reconciler = StatsReconciler()
+
+
+if __name__ == '__main__':
+    asyncio.run(stats_reconciler.reconcile_once())
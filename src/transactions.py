@@ -0,0 +1,30 @@
+"""Side effects held back until the session's transaction commits: cache invalidation, channel events, QR cleanup."""
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+_CALLBACKS_KEY = 'on_commit'
+
+
+def on_commit(session: AsyncSession | Session, callback: Callable[[], None]) -> None:
+    """Run ``callback`` after the outermost transaction of ``session`` commits; a rollback drops it."""
+    session.info.setdefault(_CALLBACKS_KEY, []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit(session: Session) -> None:
+    # SQLAlchemy шлёт after_commit и при освобождении SAVEPOINT; внешняя транзакция ещё может откатиться
+    if session.in_nested_transaction():
+        return
+    for callback in session.info.pop(_CALLBACKS_KEY, ()):
+        callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_after_rollback(session: Session) -> None:
+    # Откат SAVEPOINT не отменяет внешнюю транзакцию: колбэки ждут её исхода
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_CALLBACKS_KEY, None)
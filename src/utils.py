@@ -1,51 +1,157 @@
-import random
-import smtplib
-import string
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import codecs
+import csv
+import io
+import json
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
+from uuid import UUID, uuid4
 
-from sqlalchemy import select
+from litestar.exceptions import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.users import Tokens
-from src.settings import settings
 
+TOKEN_ATTEMPTS = 3
 
-async def unique_token_generator(transaction):
-    letters = string.ascii_letters
 
+def generate_token() -> str:
+    # 48 байт из CSPRNG дают 64 символа base64url; совпадение практически невозможно, его ловит UNIQUE
+    return secrets.token_urlsafe(48)
+
+
+async def issue_token(transaction: AsyncSession, user_id: UUID, created_by: UUID, ttl: float) -> str:
+    """Store a new one-time token for ``user_id`` valid for ``ttl`` seconds and return it.
+
+    Uniqueness is left to the constraint on ``tokens.token``: a conflict rolls back only the savepoint and a
+    new token is drawn.
+    """
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+    for attempt in range(TOKEN_ATTEMPTS):
+        token = generate_token()
+        try:
+            async with transaction.begin_nested():
+                transaction.add(Tokens(id=uuid4(), user_id=user_id, token=token, created_by=created_by, status=0,
+                                       expires_at=expires_at))
+        except IntegrityError:
+            if attempt == TOKEN_ATTEMPTS - 1:
+                raise
+            continue
+        return token
+
+
+async def revoke_recovery_tokens(transaction: AsyncSession, user_id: UUID) -> None:
+    """Drop the user's unused recovery tokens, so only the latest link works and old ones do not accumulate."""
+    # Восстановление пароля пользователь запрашивает сам; приглашение на регистрацию выдаёт администратор и остаётся
+    await transaction.execute(delete(Tokens).where(Tokens.user_id == user_id, Tokens.created_by == user_id,
+                                                   Tokens.status == 0))
+
+
+async def get_active_token(transaction: AsyncSession, token: str) -> Tokens | None:
+    # Условие status = 0 совпадает с частичным индексом ix_tokens_active_token; строка блокируется до конца
+    # транзакции, чтобы токен нельзя было использовать дважды параллельными запросами
+    query = select(Tokens).where(
+        Tokens.token == token,
+        Tokens.status == 0,
+        Tokens.expires_at > datetime.now(timezone.utc),
+    ).with_for_update()
+    return (await transaction.execute(query)).scalar_one_or_none()
+
+
+def _split_complete_records(text: str) -> tuple[str, str]:
+    # Запись закончена, если перевод строки стоит вне кавычек (чётное число кавычек до него)
+    end = pos = quotes = 0
+    while (newline := text.find('\n', pos)) != -1:
+        quotes += text.count('"', pos, newline)
+        pos = newline + 1
+        if quotes % 2 == 0:
+            end = pos
+    return text[:end], text[end:]
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict[str, str]]]:
+    """Parse a streamed UTF-8 CSV body with a header row, yielding ``(row_number, row)`` without buffering it whole."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    header: list[str] | None = None
+    row_number = 0
+    pending = ''
+    final = False
+    while not final:
+        try:
+            chunk = await anext(chunks)
+        except StopAsyncIteration:
+            chunk, final = b'', True
+        try:
+            text = pending + decoder.decode(chunk, final=final)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Request body is not valid UTF-8")
+        complete, pending = (text, '') if final else _split_complete_records(text)
+        for values in csv.reader(io.StringIO(complete)):
+            if not values:
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            yield row_number, dict(zip(header, values))
+
+
+_json_decoder = json.JSONDecoder()
+_JSON_WHITESPACE = ' \t\n\r'
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Any]]:
+    """Parse a streamed UTF-8 JSON array, yielding ``(index, item)`` as soon as each item is complete.
+
+    Only the item being read is buffered; a malformed body raises a 400 once the parser reaches the broken part.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    text = ''
+    pos = index = 0
+    final = opened = separator = closed = False
     while True:
-        generated_token = ''.join(random.choice(letters) for i in range(64))
-
-        query = select(Tokens).where(Tokens.token == generated_token)
-        existing_token = await transaction.execute(query)
-        existing_token = existing_token.scalar_one_or_none()
-
-        if existing_token is None:
-            return generated_token
-
-
-# async def send_message(email: str, message: str):
-#     smtp_obj = smtplib.SMTP('smtp.yandex.ru', 587)
-#     smtp_obj.starttls()
-#     smtp_obj.login(settings.admin_email, settings.admin_email_password)
-#
-#     msg = MIMEMultipart()
-#     msg["From"] = settings.admin_email
-#     msg["To"] = email
-#     msg["Subject"] = ""
-#     msg.attach(MIMEText(message, "plain"))
-#
-#     smtp_obj.send_message(msg)
-
-async def send_message(email: str, message: str):
-    smtp_obj = smtplib.SMTP('smtp.yandex.ru', 587)
-    smtp_obj.starttls()
-    smtp_obj.login(settings.admin_email, settings.admin_email_password)
-
-    msg = MIMEMultipart()
-    msg["From"] = settings.admin_email
-    msg["To"] = email
-    msg["Subject"] = ""
-    msg.attach(MIMEText(message, "html"))
-
-    smtp_obj.send_message(msg)
+        while pos < len(text) and text[pos] in _JSON_WHITESPACE:
+            pos += 1
+        if pos < len(text):
+            char = text[pos]
+            if closed:
+                # После закрывающей скобки допустимы только пробельные символы
+                raise HTTPException(status_code=400, detail="Unexpected data after the JSON array")
+            if not opened:
+                if char != '[':
+                    raise HTTPException(status_code=400, detail="Expected a JSON array")
+                opened, pos = True, pos + 1
+                continue
+            if separator or (char == ']' and index == 0):
+                # После элемента - запятая или конец массива
+                if char == ']':
+                    closed, separator, pos = True, False, pos + 1
+                    continue
+                if char != ',':
+                    raise HTTPException(status_code=400, detail=f"Invalid JSON after item {index - 1}")
+                separator, pos = False, pos + 1
+                continue
+            try:
+                item, end = _json_decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                end = None
+            # Элемент готов, только если за ним уже есть текст: иначе число могло оборваться на границе куска
+            if end is not None and (end < len(text) or final):
+                yield index, item
+                index, separator = index + 1, True
+                text, pos = text[end:], 0
+                continue
+        if final:
+            if closed:
+                return
+            raise HTTPException(status_code=400, detail=f"Invalid or truncated JSON at item {index}")
+        try:
+            chunk = await anext(chunks)
+        except StopAsyncIteration:
+            chunk, final = b'', True
+        try:
+            text, pos = text[pos:] + decoder.decode(chunk, final=final), 0
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Request body is not valid UTF-8")
@@ -0,0 +1,96 @@
+"""Tests run the app in-process against a throwaway SQLite database migrated to head."""
+import os
+import socket
+import tempfile
+
+# Настройки читаются при импорте src, поэтому окружение задаётся до него
+_directory = tempfile.mkdtemp(prefix='access-control-tests-')
+with socket.socket() as _socket:
+    _socket.bind(('127.0.0.1', 0))
+    _smtp_port = _socket.getsockname()[1]
+os.environ.update({
+    'CRYPT_TOKEN': 'test-crypt-token',
+    'JWT_SECRET': 'test-jwt-secret',
+    'ADMIN_EMAIL_PASSWORD': 'test',
+    'DB_URL': f'sqlite+aiosqlite:///{_directory}/db.sqlite3',
+    'QR_DIRECTORY': f'{_directory}/qr',
+    # Свободный порт: пока test_outbox не поднял на нём SMTP-заглушку, отправка откладывается
+    'SMTP_HOST': '127.0.0.1',
+    'SMTP_PORT': str(_smtp_port),
+    'SMTP_STARTTLS': 'false',
+    'SMTP_LOGIN': 'false',
+    'OUTBOX_POLL_INTERVAL': '3600',
+    # Фоновый пересчёт выключен, чтобы не поправлять счётчики за тестами
+    'STATS_RECONCILE_INTERVAL': '0',
+})
+
+from datetime import datetime, timedelta  # noqa: E402
+from typing import AsyncIterator  # noqa: E402
+from uuid import uuid4  # noqa: E402
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from benchmarks.common import app_client, create_schema, ensure_admin, login  # noqa: E402
+from src.db import db_config  # noqa: E402
+from src.models.requests import RequestsDto  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def anyio_backend() -> str:
+    return 'asyncio'
+
+
+@pytest.fixture(scope='session')
+async def admin_id():
+    await create_schema()
+    return await ensure_admin()
+
+
+@pytest.fixture(scope='session')
+async def client(admin_id) -> AsyncIterator[httpx.AsyncClient]:
+    async with app_client() as client:
+        yield client
+
+
+@pytest.fixture(scope='session')
+async def headers(client: httpx.AsyncClient) -> dict[str, str]:
+    # У администратора из ensure_admin все роли, включая охрану и согласующего
+    return await login(client)
+
+
+def _request_payload(purpose: str, guests: int = 3, days: int = 1) -> dict:
+    return {
+        'visit_purpose': purpose, 'place_of_visit': 'Lobby',
+        'datetime_of_visit': (datetime.now() + timedelta(days=days)).isoformat(),
+        'guests': [{'full_name': f'Guest {i}', 'email': f'guest{i}@example.com',
+                    'phone_number': '+79991234567', 'is_foreign': False} for i in range(guests)],
+    }
+
+
+@pytest.fixture(scope='session')
+def request_payload():
+    """Body of ``POST /requests/create`` with ``guests`` guests visiting ``days`` days from now."""
+    return _request_payload
+
+
+@pytest.fixture(scope='session')
+def create_request(client: httpx.AsyncClient, headers: dict[str, str]):
+    """Create a request through the API, optionally approve it, and return it as ``GET /requests/{id}`` shows it."""
+    async def create(guests: int = 3, accept: bool = True, days: int = 1) -> dict:
+        # Ответ на создание не содержит id, заявка находится по уникальной цели визита
+        purpose = f'Test {uuid4()}'
+        response = await client.post('/requests/create', headers=headers, json=_request_payload(purpose, guests, days))
+        response.raise_for_status()
+        async with db_config.get_session() as session:
+            request_id = (await session.execute(
+                select(RequestsDto.id).where(RequestsDto.visit_purpose == purpose))).scalar_one()
+        if accept:
+            review = {'request_id': str(request_id), 'status': 2, 'comment': None}
+            (await client.post('/requests/review', headers=headers, json=review)).raise_for_status()
+        response = await client.get(f'/requests/{request_id}', headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    return create
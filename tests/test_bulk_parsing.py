@@ -0,0 +1,71 @@
+"""Streaming parsers behind the bulk import endpoints, fed chunk by chunk."""
+from collections.abc import AsyncIterator
+
+import pytest
+from litestar.exceptions import HTTPException
+
+from src.utils import iter_csv_rows, iter_json_array
+
+pytestmark = pytest.mark.anyio
+
+
+async def chunked(body: bytes, size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def collect(parser, body: bytes, size: int = 3) -> list:
+    return [item async for item in parser(chunked(body, size))]
+
+
+@pytest.mark.parametrize('size', [1, 3, 1024])
+async def test_json_array_items(size):
+    body = '[{"name": "Иван"}, 12345, "a,b" ]  \n'.encode()
+
+    assert await collect(iter_json_array, body, size) == [(0, {'name': 'Иван'}), (1, 12345), (2, 'a,b')]
+
+
+@pytest.mark.parametrize('body', [b'[1, 2] 3', b'[1, 2]]', b'[]x', b'[1]\n,'])
+@pytest.mark.parametrize('size', [1, 1024])
+async def test_json_array_rejects_trailing_data(body, size):
+    with pytest.raises(HTTPException) as error:
+        await collect(iter_json_array, body, size)
+
+    assert error.value.status_code == 400
+    assert 'after the JSON array' in error.value.detail
+
+
+@pytest.mark.parametrize('body', [b'[1, 2', b'[1 2]', b'{"a": 1}', b'[1, \xff]', '[1, "ы'.encode()[:-1]])
+async def test_json_array_rejects_malformed_body(body):
+    with pytest.raises(HTTPException) as error:
+        await collect(iter_json_array, body)
+
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize('size', [1, 3, 1024])
+async def test_csv_rows(size):
+    body = '\ufeffname,comment\nИван,"line\nbreak"\n\nПётр,ok'.encode()
+
+    assert await collect(iter_csv_rows, body, size) == [
+        (1, {'name': 'Иван', 'comment': 'line\nbreak'}),
+        (2, {'name': 'Пётр', 'comment': 'ok'}),
+    ]
+
+
+@pytest.mark.parametrize('body', ['name\nИван\n'.encode('cp1251'), 'name\nИван'.encode()[:-1]])
+@pytest.mark.parametrize('size', [1, 1024])
+async def test_csv_rejects_invalid_utf8(body, size):
+    with pytest.raises(HTTPException) as error:
+        await collect(iter_csv_rows, body, size)
+
+    assert error.value.status_code == 400
+    assert 'UTF-8' in error.value.detail
+
+
+async def test_non_utf8_csv_upload_is_a_bad_request(client, headers):
+    body = 'full_name,email\nИван,ivan@example.com\n'.encode('cp1251')
+
+    response = await client.post('/users/bulk/csv', headers=headers, content=body)
+
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+"""Guard-desk scans: ``update_guests_status`` through ``/requests/guests/actions`` and its batch variant."""
+from uuid import uuid4
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+ENTERED, EXITED = 2, 3
+ACCEPTED, COMPLETED = 2, 5
+
+
+async def get_request(client, headers, request_id: str) -> dict:
+    response = await client.get(f'/requests/{request_id}', headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def scan(client, headers, guest_id: str, status: int):
+    return await client.post('/requests/guests/actions', headers=headers, json={'guest_id': guest_id, 'status': status})
+
+
+async def scan_batch(client, headers, guest_ids: list[str], status: int) -> dict:
+    response = await client.post('/requests/guests/actions/batch', headers=headers,
+                                 json={'guest_ids': guest_ids, 'status': status})
+    assert response.status_code == 202
+    return response.json()
+
+
+async def test_entry_updates_only_the_scanned_guest(client, headers, create_request):
+    request = await create_request()
+    first, *others = request['guests']
+
+    assert (await scan(client, headers, first['id'], ENTERED)).status_code == 202
+
+    request = await get_request(client, headers, request['id'])
+    statuses = {guest['id']: guest['visit_status'] for guest in request['guests']}
+    assert statuses[first['id']] == ENTERED
+    assert all(statuses[guest['id']] == 1 for guest in others)
+    assert request['status'] == ACCEPTED
+
+
+async def test_unknown_guest_is_not_found(client, headers):
+    response = await scan(client, headers, str(uuid4()), ENTERED)
+    assert response.status_code == 404
+
+
+async def test_request_completes_when_the_last_guest_exits(client, headers, create_request):
+    request = await create_request(guests=2)
+    first, last = (guest['id'] for guest in request['guests'])
+
+    await scan(client, headers, first, EXITED)
+    assert (await get_request(client, headers, request['id']))['status'] == ACCEPTED
+
+    await scan(client, headers, last, EXITED)
+    assert (await get_request(client, headers, request['id']))['status'] == COMPLETED
+
+
+async def test_entry_does_not_complete_the_request(client, headers, create_request):
+    request = await create_request(guests=1)
+    guest_id = request['guests'][0]['id']
+
+    result = await scan_batch(client, headers, [guest_id], ENTERED)
+
+    assert result['completed_requests'] == []
+    assert (await get_request(client, headers, request['id']))['status'] == ACCEPTED
+
+
+async def test_batch_completes_only_fully_exited_requests(client, headers, create_request):
+    done = await create_request(guests=2)
+    partial = await create_request(guests=2)
+    missing = str(uuid4())
+    guest_ids = [guest['id'] for guest in done['guests']] + [partial['guests'][0]['id'], missing]
+
+    result = await scan_batch(client, headers, guest_ids, EXITED)
+
+    assert result['updated'] == guest_ids[:3]
+    assert result['not_found'] == [missing]
+    assert result['completed_requests'] == [done['id']]
+    assert (await get_request(client, headers, done['id']))['status'] == COMPLETED
+    partial = await get_request(client, headers, partial['id'])
+    assert partial['status'] == ACCEPTED
+    assert [guest['visit_status'] for guest in partial['guests']].count(EXITED) == 1
+
+
+async def test_completed_request_is_not_completed_again(client, headers, create_request):
+    request = await create_request(guests=1)
+    guest_id = request['guests'][0]['id']
+    assert (await scan_batch(client, headers, [guest_id], EXITED))['completed_requests'] == [request['id']]
+
+    # Повторный выход обновляет гостя, но заявка уже завершена
+    result = await scan_batch(client, headers, [guest_id], EXITED)
+
+    assert result['updated'] == [guest_id]
+    assert result['completed_requests'] == []
+
+
+async def test_scan_changes_the_request_etag(client, headers, create_request):
+    request = await create_request(guests=1)
+    etag = (await client.get(f"/requests/{request['id']}", headers=headers)).headers['etag']
+
+    await scan(client, headers, request['guests'][0]['id'], ENTERED)
+
+    response = await client.get(f"/requests/{request['id']}", headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['guests'][0]['visit_status'] == ENTERED
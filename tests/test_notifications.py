@@ -0,0 +1,107 @@
+"""Subscribing to notifications the way browsers do, with the JWT in the query string.
+
+httpx waits for the whole response body, so the endless WebSocket and SSE streams are driven at the ASGI level.
+"""
+import asyncio
+from typing import Any
+
+import pytest
+from litestar.channels import ChannelsPlugin
+
+from app import app
+from src.channels.notifications import SECURITY_CHANNEL
+
+pytestmark = pytest.mark.anyio
+
+
+async def asgi_call(scope: dict[str, Any], first: dict[str, Any], until: str) -> list[dict[str, Any]]:
+    """Run ``app`` for ``scope`` and collect what it sends up to a message of type ``until``, then disconnect."""
+    received: asyncio.Queue = asyncio.Queue()
+    await received.put(first)
+    sent: list[dict[str, Any]] = []
+    done = asyncio.Event()
+    disconnect = {'type': scope['type'] + '.disconnect', 'code': 1000}
+
+    async def receive() -> dict[str, Any]:
+        return await received.get()
+
+    async def send(message: dict[str, Any]) -> None:
+        sent.append(message)
+        # Отказ приходит закрытием сокета или ответом с кодом ошибки
+        if message['type'] in (until, 'websocket.close') or message.get('status', 200) >= 400:
+            done.set()
+
+    task = asyncio.create_task(app(scope, receive, send))
+    try:
+        await asyncio.wait_for(done.wait(), 5)
+    finally:
+        await received.put(disconnect)
+        try:
+            await asyncio.wait_for(task, 5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            task.cancel()
+    return sent
+
+
+def scope(kind: str, path: str, query: str = '') -> dict[str, Any]:
+    value = {'type': kind, 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http', 'path': path,
+             'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+             'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 1), 'server': ('testserver', 80)}
+    # У WebSocket нет метода: Litestar выбирает обработчик по нему, если он задан
+    value.update({'method': 'GET'} if kind == 'http' else {'subprotocols': []})
+    return value
+
+
+@pytest.fixture
+def token(headers) -> str:
+    return headers['Authorization'].partition(' ')[2]
+
+
+async def test_websocket_accepts_query_token(client, token):
+    sent = await asgi_call(scope('websocket', '/notifications', f'token={token}'), {'type': 'websocket.connect'},
+                           until='websocket.accept')
+    assert sent[-1]['type'] == 'websocket.accept'
+
+
+async def test_websocket_without_token_is_refused(client):
+    sent = await asgi_call(scope('websocket', '/notifications'), {'type': 'websocket.connect'},
+                           until='websocket.accept')
+    assert [message['type'] for message in sent] == ['websocket.close']
+    assert 'JWT' in sent[0]['reason']
+
+
+async def test_websocket_receives_events(client, token):
+    channels = app.plugins.get(ChannelsPlugin)
+    received: asyncio.Queue = asyncio.Queue()
+    await received.put({'type': 'websocket.connect'})
+    events = []
+
+    async def send(message: dict[str, Any]) -> None:
+        if message['type'] == 'websocket.accept':
+            # Подписка оформляется сразу после accept, даём ей запуститься
+            await asyncio.sleep(0.05)
+            channels.publish({'event': 'ping'}, [SECURITY_CHANNEL])
+        elif message['type'] == 'websocket.send':
+            events.append(message)
+            await received.put({'type': 'websocket.disconnect', 'code': 1000})
+
+    task = asyncio.create_task(app(scope('websocket', '/notifications', f'token={token}'), received.get, send))
+    await asyncio.wait_for(task, 5)
+    assert events and 'ping' in (events[0].get('text') or events[0].get('bytes').decode())
+
+
+async def test_sse_accepts_query_token(client, token):
+    sent = await asgi_call(scope('http', '/notifications/sse', f'token={token}'),
+                           {'type': 'http.request', 'body': b'', 'more_body': False}, until='http.response.start')
+    assert sent[0]['status'] == 200
+
+
+async def test_sse_without_token_is_refused(client):
+    sent = await asgi_call(scope('http', '/notifications/sse'),
+                           {'type': 'http.request', 'body': b'', 'more_body': False}, until='http.response.start')
+    assert sent[0]['status'] == 401
+
+
+async def test_query_token_is_ignored_elsewhere(client, token):
+    response = await client.get('/users', params={'token': token})
+    assert response.status_code == 401
@@ -0,0 +1,162 @@
+"""The outbox worker against a local SMTP stand-in listening on ``SMTP_HOST``/``SMTP_PORT``.
+
+Recipients starting with ``busy`` are refused with 450 at RCPT and ``gone`` with 550; everything else is accepted.
+"""
+import socketserver
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from src.db import db_config
+from src.models.outbox import OutboxMessages, utc_now
+from src.outbox import OutboxStatusEnum, outbox_worker
+from src.settings import settings
+
+pytestmark = pytest.mark.anyio
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__((settings.smtp_host, settings.smtp_port), SMTPHandler)
+        self.connections = 0
+        self.delivered: list[str] = []
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    server: SMTPStandIn
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        self.reply('220 stand-in ready')
+        recipients = []
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250 stand-in')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip('<> ')
+                if recipient.startswith('busy'):
+                    self.reply('450 mailbox busy')
+                elif recipient.startswith('gone'):
+                    self.reply('550 no such user')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 ok')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                while self.rfile.readline() != b'.\r\n':
+                    pass
+                self.server.delivered.extend(recipients)
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                # MAIL, RSET, NOOP
+                recipients = [] if verb in ('MAIL', 'RSET') else recipients
+                self.reply('250 ok')
+
+
+@pytest.fixture(scope='module')
+async def smtp(client):
+    # Фоновый воркер приложения останавливается, чтобы пакеты забирали только тесты
+    await outbox_worker.stop()
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    await outbox_worker.stop()
+    server.shutdown()
+    server.server_close()
+    await outbox_worker.start()
+
+
+@pytest.fixture
+async def outbox(smtp):
+    """An empty outbox table and fresh stand-in counters."""
+    async with db_config.get_session() as session, session.begin():
+        await session.execute(delete(OutboxMessages))
+    smtp.connections = 0
+    smtp.delivered.clear()
+    return smtp
+
+
+async def add_messages(*recipients: str, **values) -> None:
+    async with db_config.get_session() as session, session.begin():
+        await session.execute(insert(OutboxMessages),
+                              [{'recipient': recipient, 'body': 'Hello', **values} for recipient in recipients])
+
+
+async def messages() -> dict[str, OutboxMessages]:
+    async with db_config.get_session() as session:
+        return {row.recipient: row for row in (await session.execute(select(OutboxMessages))).scalars()}
+
+
+def aware(value: datetime) -> datetime:
+    # SQLite возвращает время без зоны, хранится UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def test_batch_reuses_one_connection(outbox):
+    await add_messages('a@example.com', 'b@example.com', 'c@example.com')
+
+    assert await outbox_worker.drain_once() == 3
+    await add_messages('d@example.com')
+    assert await outbox_worker.drain_once() == 1
+
+    assert outbox.connections == 1
+    assert sorted(outbox.delivered) == ['a@example.com', 'b@example.com', 'c@example.com', 'd@example.com']
+    assert {row.status for row in (await messages()).values()} == {OutboxStatusEnum.SENT.value}
+
+
+async def test_temporary_refusal_is_retried_with_backoff(outbox):
+    await add_messages('busy@example.com', 'ok@example.com')
+    started = utc_now()
+
+    await outbox_worker.drain_once()
+
+    rows = await messages()
+    busy = rows['busy@example.com']
+    assert busy.status == OutboxStatusEnum.PENDING.value
+    assert busy.attempts == 1
+    assert aware(busy.next_attempt_at) >= started + timedelta(seconds=settings.outbox_retry_backoff)
+    assert '450' in busy.last_error
+    # Отказ одному получателю не мешает остальным письмам пакета
+    assert rows['ok@example.com'].status == OutboxStatusEnum.SENT.value
+    # До конца паузы письмо не берётся снова
+    assert await outbox_worker.drain_once() == 0
+
+
+async def test_permanent_refusal_is_dead_lettered(outbox):
+    await add_messages('gone@example.com')
+
+    await outbox_worker.drain_once()
+
+    gone = (await messages())['gone@example.com']
+    assert gone.status == OutboxStatusEnum.DEAD.value
+    assert gone.attempts == 1
+    assert '550' in gone.last_error
+    assert outbox.delivered == []
+
+
+async def test_expired_lease_is_picked_up_again(outbox):
+    await add_messages('stale@example.com', status=OutboxStatusEnum.SENDING.value,
+                       next_attempt_at=utc_now() - timedelta(seconds=1))
+    await add_messages('leased@example.com', status=OutboxStatusEnum.SENDING.value,
+                       next_attempt_at=utc_now() + timedelta(seconds=settings.outbox_lease))
+
+    assert await outbox_worker.drain_once() == 1
+
+    rows = await messages()
+    assert rows['stale@example.com'].status == OutboxStatusEnum.SENT.value
+    assert rows['leased@example.com'].status == OutboxStatusEnum.SENDING.value
+    assert outbox.delivered == ['stale@example.com']
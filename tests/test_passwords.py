@@ -0,0 +1,64 @@
+"""Login against stored hashes of every scheme, including the legacy Fernet one rewritten on first login."""
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+
+from src.db import db_config
+from src.models.users import Users
+from src.passwords import FernetHasher, ScryptHasher, get_hasher
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_user(password: str | None) -> str:
+    email = f'{uuid4()}@example.com'
+    async with db_config.get_session() as session, session.begin():
+        session.add(Users(id=uuid4(), full_name='Password Test', email=email, password=password))
+    return email
+
+
+async def stored_password(email: str) -> str | None:
+    async with db_config.get_session() as session:
+        return (await session.execute(select(Users.password).where(Users.email == email))).scalar_one()
+
+
+async def login(client, email: str, password: str):
+    return await client.post('/login', json={'email': email, 'password': password})
+
+
+async def test_fernet_login_rewrites_the_hash(client):
+    email = await add_user(FernetHasher().hash('secret'))
+
+    response = await login(client, email, 'secret')
+
+    assert response.status_code == 201
+    stored = await stored_password(email)
+    assert stored.startswith(ScryptHasher.prefix)
+    assert get_hasher().verify('secret', stored)
+    assert (await login(client, email, 'secret')).status_code == 201
+
+
+async def test_wrong_password_is_rejected(client):
+    encoded = FernetHasher().hash('secret')
+    email = await add_user(encoded)
+
+    response = await login(client, email, 'wrong')
+
+    assert response.status_code == 401
+    assert await stored_password(email) == encoded
+
+
+async def test_user_without_password_is_rejected(client):
+    # Приглашённый, но ещё не зарегистрированный пользователь
+    email = await add_user(None)
+
+    assert (await login(client, email, '')).status_code == 401
+    assert (await login(client, email, 'anything')).status_code == 401
+
+
+@pytest.mark.parametrize('encoded', ['$scrypt$garbage', '$scrypt$n=3,r=8,p=1$AAAA$AAAA', '$scrypt$n=16384$$'])
+async def test_malformed_hash_is_a_failed_check(client, encoded):
+    email = await add_user(encoded)
+
+    assert (await login(client, email, 'secret')).status_code == 401
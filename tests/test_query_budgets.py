@@ -0,0 +1,69 @@
+"""SQL statements per endpoint, so an N+1 or an unplanned relationship load fails the suite.
+
+Counts are taken on the second call of every endpoint, with the principal and role caches warm, over enough
+rows that a per-row query shows up as a budget overrun.
+"""
+import pytest
+
+from benchmarks.common import ADMIN_EMAIL, ADMIN_PASSWORD, QueryCounter
+
+# (method, path, budget); {request_id}, {guest_id} and {user_id} are filled in from seeded data
+BUDGETS = [
+    ('GET', '/requests', 4),
+    # второй вызов: запрос версий, тело из кэша ответов (первый - ещё 4 и 2 запроса на загрузку)
+    ('GET', '/requests/{request_id}', 1),
+    ('GET', '/users', 3),
+    ('GET', '/users/{user_id}', 1),
+    # переходы статусов прибавляют к счётчикам request_stats одним upsert
+    ('POST', '/requests/create', 3),
+    ('POST', '/requests/review', 5),
+    # PostgreSQL: обновление и upsert; SQLite: чтение прежних статусов и обновление, статус не меняется - без upsert
+    ('POST', '/requests/guests/actions', 2),
+    ('POST', '/login', 2),
+    # снимок дня загружается при первом вызове, дальше отдаётся из памяти
+    ('GET', '/schedule', 0),
+    ('GET', '/stats', 1),
+]
+
+
+@pytest.fixture(scope='module')
+async def seeded(client, headers, request_payload):
+    """Twenty requests of three guests, ten of them approved; returns the page and the unreviewed request ids."""
+    for index in range(20):
+        response = await client.post('/requests/create', headers=headers, json=request_payload(f'Query budget {index}'))
+        response.raise_for_status()
+    page = (await client.get('/requests', headers=headers, params={'pageSize': 100})).json()['items']
+    # Другие модули тестов создают свои заявки в той же базе
+    page = [item for item in page if item['visit_purpose'].startswith('Query budget')]
+    request_ids = [item['id'] for item in page]
+    for request_id in request_ids[:10]:
+        review = {'request_id': request_id, 'status': 2, 'comment': None}
+        (await client.post('/requests/review', headers=headers, json=review)).raise_for_status()
+    return page, request_ids[10:]
+
+
+@pytest.fixture(scope='session')
+def counter(client) -> QueryCounter:
+    return QueryCounter()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(('method', 'template', 'budget'), BUDGETS, ids=[f'{m} {t}' for m, t, _ in BUDGETS])
+async def test_query_budget(client, headers, admin_id, seeded, counter, request_payload, method, template, budget):
+    page, unreviewed = seeded
+    guest_id = page[0]['guests'][0]['id']
+    bodies = {
+        '/requests/create': lambda: request_payload('Query budget'),
+        '/requests/review': lambda: {'request_id': unreviewed.pop(), 'status': 2, 'comment': None},
+        '/requests/guests/actions': lambda: {'guest_id': guest_id, 'status': 2},
+        '/login': lambda: {'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD},
+    }
+    path = template.format(request_id=page[0]['id'], guest_id=guest_id, user_id=admin_id)
+    counter.activate()
+    for _ in range(2):
+        counter.count = 0
+        body = bodies[template]() if method == 'POST' else None
+        response = await client.request(method, path, headers=headers, json=body,
+                                        params={'pageSize': 20} if method == 'GET' else None)
+        response.raise_for_status()
+    assert counter.count <= budget
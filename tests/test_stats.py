@@ -0,0 +1,86 @@
+"""``request_stats`` counters kept by the handlers against the ones ``rebuild_stats`` computes from the requests."""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from src.db import db_config
+from src.models.requests import RequestStats
+from src.schedule import visit_day
+from src.stats import COLUMNS, rebuild_stats
+
+pytestmark = pytest.mark.anyio
+
+ENTERED, EXITED = 2, 3
+
+
+async def counters() -> dict[tuple[date, int], tuple[int, ...]]:
+    # Обнулённые переходами строки остаются до пересчёта, который их не создаёт
+    async with db_config.get_session() as session:
+        rows = (await session.execute(select(RequestStats))).scalars().all()
+    return {(row.day, row.status): values for row in rows
+            if any(values := tuple(getattr(row, column) for column in COLUMNS))}
+
+
+async def rebuild(since: date | None = None) -> None:
+    async with db_config.get_session() as session, session.begin():
+        await rebuild_stats(session, since)
+
+
+def day_of(request: dict) -> date:
+    return visit_day(datetime.fromisoformat(request['datetime_of_visit']))
+
+
+async def test_incremental_counters_match_rebuild(client, headers, create_request, request_payload):
+    await create_request(guests=2, accept=False)
+    rejected = await create_request(guests=1, accept=False)
+    review = {'request_id': rejected['id'], 'status': 3, 'comment': 'No'}
+    (await client.post('/requests/review', headers=headers, json=review)).raise_for_status()
+    entered = await create_request(guests=3)
+    await client.post('/requests/guests/actions', headers=headers,
+                      json={'guest_id': entered['guests'][0]['id'], 'status': ENTERED})
+    completed = await create_request(guests=2, days=2)
+    await client.post('/requests/guests/actions/batch', headers=headers,
+                      json={'guest_ids': [guest['id'] for guest in completed['guests']], 'status': EXITED})
+    bulk = [request_payload(f'Stats bulk {index}', guests=index + 1, days=3) for index in range(3)]
+    response = await client.post('/requests/bulk', headers=headers, json=bulk)
+    assert response.json()['created'] == 3
+
+    incremental = await counters()
+    await rebuild()
+
+    assert incremental == await counters()
+
+
+async def test_rebuild_since_keeps_earlier_days(create_request):
+    earlier = day_of(await create_request(guests=1, days=4))
+    later = day_of(await create_request(guests=1, days=6))
+    expected = await counters()
+    async with db_config.get_session() as session, session.begin():
+        await session.execute(update(RequestStats).where(RequestStats.day.in_([earlier, later]))
+                              .values(requests=RequestStats.requests + 100))
+
+    await rebuild(later - timedelta(days=1))
+
+    drifted = await counters()
+    assert all(drifted[key] == values for key, values in expected.items() if key[0] != earlier)
+    assert all(drifted[key][0] == values[0] + 100 for key, values in expected.items() if key[0] == earlier)
+    await rebuild()
+    assert await counters() == expected
+
+
+async def test_day_stats(client, headers, create_request):
+    request = await create_request(guests=3, days=9)
+    guest_ids = [guest['id'] for guest in request['guests']]
+    await client.post('/requests/guests/actions/batch', headers=headers, json={'guest_ids': guest_ids[:2], 'status': 2})
+    await client.post('/requests/guests/actions', headers=headers, json={'guest_id': guest_ids[0], 'status': EXITED})
+
+    response = await client.get('/stats', headers=headers, params={'day': day_of(request).isoformat()})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        'day': day_of(request).isoformat(),
+        'statuses': [{'status': 2, 'requests': 1, 'guests_pending': 1, 'guests_inside': 1, 'guests_exited': 1}],
+        'guests_inside': 1,
+        'expected_arrivals': 1,
+    }
@@ -0,0 +1,82 @@
+"""One-time registration and password recovery links."""
+from datetime import timedelta
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import select
+
+from src.db import db_config
+from src.models.outbox import utc_now
+from src.models.users import Tokens, Users
+from src.utils import generate_token
+
+pytestmark = pytest.mark.anyio
+
+
+async def invite(client, headers) -> tuple[str, str]:
+    """Create a user through the admin endpoint and return its email and registration token."""
+    email = f'{uuid4()}@example.com'
+    response = await client.post('/users/create', headers=headers,
+                                 json={'full_name': 'Invited', 'email': email, 'roles': [1]})
+    assert response.status_code == 202
+    return email, response.json()['token']
+
+
+async def recover(client, headers, email: str) -> str:
+    response = await client.post('/recovery_password', headers=headers, params={'email': email})
+    assert response.status_code == 202
+    return response.json()['token']
+
+
+async def register(client, token: str, password: str = 'secret'):
+    return await client.post(f'/register/{token}', json={'password': password})
+
+
+async def new_password(client, headers, token: str, password: str = 'changed'):
+    # Оба маршрута не исключены из JWT-проверки
+    return await client.put(f'/new_password/{token}', headers=headers, params={'new_password': password})
+
+
+async def add_token(email: str, **values) -> str:
+    token = generate_token()
+    async with db_config.get_session() as session, session.begin():
+        user_id: UUID = (await session.execute(select(Users.id).where(Users.email == email))).scalar_one()
+        session.add(Tokens(user_id=user_id, token=token, created_by=user_id,
+                           **{'status': 0, 'expires_at': utc_now() + timedelta(hours=1), **values}))
+    return token
+
+
+async def test_recovery_keeps_the_registration_invite(client, headers):
+    email, token = await invite(client, headers)
+
+    await recover(client, headers, email)
+
+    assert (await register(client, token)).status_code == 201
+
+
+async def test_recovery_revokes_earlier_recovery_links(client, headers):
+    email, token = await invite(client, headers)
+    (await register(client, token)).raise_for_status()
+    first = await recover(client, headers, email)
+    second = await recover(client, headers, email)
+
+    assert (await new_password(client, headers, first)).status_code == 404
+    assert (await new_password(client, headers, second)).status_code == 200
+
+
+async def test_used_tokens_are_rejected(client, headers):
+    email, token = await invite(client, headers)
+    assert (await register(client, token)).status_code == 201
+    recovery = await recover(client, headers, email)
+    assert (await new_password(client, headers, recovery)).status_code == 200
+
+    assert (await register(client, token)).status_code == 401
+    assert (await new_password(client, headers, recovery)).status_code == 404
+
+
+async def test_expired_tokens_are_rejected(client, headers):
+    email, _ = await invite(client, headers)
+    expired = utc_now() - timedelta(seconds=1)
+
+    assert (await register(client, await add_token(email, expires_at=expired))).status_code == 404
+    assert (await new_password(client, headers, await add_token(email, expires_at=expired))).status_code == 404
@@ -0,0 +1,50 @@
+"""``on_commit`` waits for the outermost transaction, whatever SAVEPOINTs do in between."""
+import pytest
+from sqlalchemy import text
+
+from src.db import db_config
+from src.transactions import on_commit
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_runs_after_commit(admin_id):
+    calls = []
+    async with db_config.get_session() as session:
+        async with session.begin():
+            await session.execute(text('SELECT 1'))
+            on_commit(session, lambda: calls.append('done'))
+            assert calls == []
+    assert calls == ['done']
+
+
+async def test_dropped_on_rollback(admin_id):
+    calls = []
+    async with db_config.get_session() as session:
+        await session.execute(text('SELECT 1'))
+        on_commit(session, lambda: calls.append('done'))
+        await session.rollback()
+        await session.commit()
+    assert calls == []
+
+
+async def test_savepoint_release_does_not_run_callbacks(admin_id):
+    calls = []
+    async with db_config.get_session() as session:
+        async with session.begin():
+            on_commit(session, lambda: calls.append('outer'))
+            async with session.begin_nested():
+                await session.execute(text('SELECT 1'))
+            assert calls == []
+    assert calls == ['outer']
+
+
+async def test_savepoint_rollback_keeps_callbacks(admin_id):
+    calls = []
+    async with db_config.get_session() as session:
+        async with session.begin():
+            on_commit(session, lambda: calls.append('outer'))
+            nested = await session.begin_nested()
+            await session.execute(text('SELECT 1'))
+            await nested.rollback()
+    assert calls == ['outer']
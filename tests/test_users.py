@@ -0,0 +1,35 @@
+"""The cached ``GET /users`` total and its invalidation."""
+from uuid import uuid4
+
+import pytest
+
+from src.db import db_config
+from src.endpoints.roles import invalidate_users_count, users_count_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def total(client, headers) -> int:
+    response = await client.get('/users', headers=headers)
+    response.raise_for_status()
+    return response.json()['total']
+
+
+async def test_created_user_is_counted(client, headers):
+    before = await total(client, headers)
+
+    response = await client.post('/users/create', headers=headers,
+                                 json={'full_name': 'Counted', 'email': f'{uuid4()}@example.com', 'roles': [1]})
+
+    assert response.status_code == 202
+    assert await total(client, headers) == before + 1
+
+
+async def test_count_is_cleared_only_after_commit(admin_id):
+    async with db_config.get_session() as session:
+        async with session.begin():
+            users_count_cache.set(None, 1)
+            invalidate_users_count(session)
+            # До коммита параллельный запрос всё ещё видит прежних пользователей, кэш совпадает с ними
+            assert users_count_cache.get(None) == 1
+        assert users_count_cache.get(None) is None